@@ -0,0 +1,703 @@
+## Benchmark de los motores de ruteo del Metro CDMX
+# Uso:
+#   python benchmark_metro.py                          # reporte en pantalla
+#   python benchmark_metro.py --guardar benchmarks/linea_base.json
+#   python benchmark_metro.py --comparar benchmarks/linea_base.json
+#   python benchmark_metro.py --dependiente-tiempo        # estatico vs dependiente del tiempo
+#   python benchmark_metro.py --heuristicas               # costo por consulta y por expansion
+#   python benchmark_metro.py --asignacion                # matriz origen-destino completa
+#   python benchmark_metro.py --nombres                   # busqueda de estaciones por nombre
+#   python benchmark_metro.py --coordenadas               # cercanas y rutas entre puntos
+#   python benchmark_metro.py --pool                      # lote repartido entre procesos
+# Redes: la red CDMX y redes sinteticas (N lineas x M estaciones) creadas con
+# agregar_estacion/agregar_conexion. La carga de consultas es fija (semilla).
+import argparse
+import json
+import math
+import random
+import sys
+import time
+import tracemalloc
+
+import metro_cdmx
+
+# tolerancias para marcar una regresion contra la linea base
+TOLERANCIA_LATENCIA = 0.25  # +25% en p50/p95
+TOLERANCIA_NODOS = 0.0      # cualquier aumento de nodos explorados
+
+# redes grandes para medir el costo por expansion de las heuristicas
+REDES_HEURISTICA = [(20, 100), (40, 100)]
+# red de la asignacion origen-destino (10 lineas x 20 da 175 estaciones)
+RED_ASIGNACION = (10, 20)
+# red, consultas y estaciones de acceso por punto para las rutas entre coordenadas;
+# en la red sintetica las estaciones estan a 10 unidades (unos 1 km: 12 min caminando)
+RED_COORDENADAS = (40, 100)
+CONSULTAS_COORDENADAS = 200
+ACCESOS_COORDENADAS = 4
+MINUTOS_CAMINANDO_SINTETICA = 1.2
+# red y consultas del lote repartido entre procesos
+RED_POOL = (40, 100)
+CONSULTAS_POOL = 2000
+# nombres de estacion para el indice (del orden de un GTFS grande) y consultas por tipo
+NUM_NOMBRES = 10000
+CONSULTAS_NOMBRES = 2000
+# nombres: una palabra comun (o ninguna) y de 1 a 3 nombres propios inventados
+PALABRAS_COMUNES = ["San", "Santa", "Villa", "Puerto", "Colonia", "Avenida", "Parque", "Ciudad",
+                    "Jardín", "Héroes", "Niños", "Ángel", "Peñón", "Nueva", "Vieja", "Mercado",
+                    "Estadio", "Hospital", "Norte", "Sur", "Oriente", "Poniente", "Centro", "Lomas"]
+SILABAS_NOMBRES = ["ta", "co", "pe", "tla", "xo", "mi", "chi", "hua", "que", "za", "lo", "na",
+                   "ca", "te", "pa", "ro", "ma", "ña", "yo", "tzin", "gua", "al", "ri", "do",
+                   "be", "sal", "cue", "ji", "mo", "ne", "la", "xi", "zo", "ha", "ve", "nú"]
+
+ESCENARIOS = {
+    "cdmx": {"red": "cdmx", "consultas": 1000},
+    "sintetica_12x40": {"red": "sintetica", "num_lineas": 12, "estaciones_por_linea": 40,
+                        "densidad_transbordo": 0.1, "consultas": 500},
+}
+
+
+# RED SINTETICA
+
+def crear_red_sintetica(num_lineas, estaciones_por_linea, densidad_transbordo=0.1, semilla=0):
+    # cada linea es una caminata aleatoria; con probabilidad densidad_transbordo
+    # la siguiente estacion es una estacion existente de otra linea (transbordo)
+    azar = random.Random(semilla)
+    metro = metro_cdmx.crear_grafo()
+    lado = 10 * estaciones_por_linea
+    for linea in range(1, num_lineas + 1):
+        x = azar.uniform(0, lado)
+        y = azar.uniform(0, lado)
+        angulo = azar.uniform(0, 2 * math.pi)
+        anterior = None
+        en_linea = set()
+        for j in range(estaciones_por_linea):
+            candidatas = [nombre for nombre in metro["estaciones"] if nombre not in en_linea]
+            if anterior is not None and candidatas and azar.random() < densidad_transbordo:
+                nombre = azar.choice(candidatas)
+                estacion = metro["estaciones"][nombre]
+                metro_cdmx.agregar_estacion(metro, nombre, estacion["lineas"] + [linea], estacion["coords"])
+                x, y = estacion["coords"]
+            else:
+                nombre = f"L{linea}-{j}"
+                angulo = angulo + azar.uniform(-0.5, 0.5)
+                x = x + 10 * math.cos(angulo)
+                y = y + 10 * math.sin(angulo)
+                metro_cdmx.agregar_estacion(metro, nombre, [linea], (x, y))
+            if anterior is not None:
+                metro_cdmx.agregar_conexion(metro, anterior, nombre, 2, linea)
+            en_linea.add(nombre)
+            anterior = nombre
+    return metro
+
+def crear_carga(metro, num_consultas, semilla=1):
+    # consultas fijas (inicio, destino, hora, prisa, accesibilidad)
+    azar = random.Random(semilla)
+    nombres = list(metro["estaciones"])
+    return [(azar.choice(nombres), azar.choice(nombres), azar.randrange(24),
+             azar.random() < 0.3, azar.random() < 0.1)
+            for _ in range(num_consultas)]
+
+
+# MOTORES
+
+def preparar_motores(metro):
+    # nombre -> funcion(inicio, destino, perfil) -> (camino, estadisticas)
+    # el preprocesamiento (compilar, jerarquia, raptor) se mide aparte
+    preparacion = {}
+    inicio = time.perf_counter()
+    comp = metro_cdmx.compilar_grafo(metro)
+    preparacion["compilar"] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    jer = metro_cdmx.preprocesar_jerarquia(comp)
+    preparacion["jerarquia"] = time.perf_counter() - inicio
+    inicio = time.perf_counter()
+    raptor = metro_cdmx.preparar_raptor(comp)
+    preparacion["raptor"] = time.perf_counter() - inicio
+
+    motores = {
+        "a_star": lambda o, d, p: metro_cdmx.a_star(metro, o, d, perfil=p),
+        "compilado_euclidiana": lambda o, d, p: metro_cdmx.a_star_compilado(
+            comp, o, d, perfil=p, heuristica=metro_cdmx.heuristica_euclidiana_compilada),
+        "compilado_calibrada": lambda o, d, p: metro_cdmx.a_star_compilado(
+            comp, o, d, perfil=p, heuristica=metro_cdmx.heuristica_calibrada),
+        "compilado_alt": lambda o, d, p: metro_cdmx.a_star_compilado(
+            comp, o, d, perfil=p, heuristica=metro_cdmx.heuristica_alt),
+        "bidireccional": lambda o, d, p: metro_cdmx.a_star_compilado(
+            comp, o, d, perfil=p, bidireccional=True),
+        "jerarquico": lambda o, d, p: metro_cdmx.ruta_jerarquica(jer, o, d, perfil=p),
+        # todo el conjunto de Pareto (tiempo vs transbordos); nodos = estaciones marcadas
+        "raptor_pareto": lambda o, d, p: metro_cdmx.rutas_pareto(raptor, o, d, perfil=p),
+    }
+    return comp, motores, preparacion
+
+
+# MEDICION
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+def medir_motor(motor, carga, perfiles):
+    # primera pasada: latencias y nodos; segunda: memoria pico con tracemalloc
+    latencias = []
+    nodos = 0
+    inicio_total = time.perf_counter()
+    for consulta in carga:
+        inicio = time.perf_counter()
+        _, estadisticas = motor(consulta[0], consulta[1], perfiles[consulta])
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        nodos = nodos + estadisticas.get("nodos_explorados", 0)
+    total = time.perf_counter() - inicio_total
+
+    tracemalloc.start()
+    for consulta in carga[:100]:
+        motor(consulta[0], consulta[1], perfiles[consulta])
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": percentil(latencias, 50),
+        "p95_ms": percentil(latencias, 95),
+        "p99_ms": percentil(latencias, 99),
+        "nodos_explorados_medio": nodos / len(carga),
+        "memoria_pico_kb": pico / 1024,
+        "consultas_por_segundo": len(carga) / total if total > 0 else 0.0
+    }
+
+def correr_escenario(config, motores_elegidos=None, dependiente_tiempo=False):
+    if config["red"] == "cdmx":
+        metro = metro_cdmx.crear_metro_cdmx_completo()
+    else:
+        metro = crear_red_sintetica(config["num_lineas"], config["estaciones_por_linea"],
+                                    config["densidad_transbordo"], config.get("semilla", 0))
+    carga = crear_carga(metro, config["consultas"])
+    perfiles = {}
+    for consulta in carga:
+        contexto = metro_cdmx.contexto_precalculado(*consulta[2:])
+        perfiles[consulta] = metro_cdmx.crear_perfil_costos(metro["costos"], contexto)
+
+    comp, motores, preparacion = preparar_motores(metro)
+    resultado = {
+        "estaciones": len(comp["nombres"]),
+        "estados": len(comp["estado_estacion"]),
+        "consultas": len(carga),
+        "preparacion_s": preparacion,
+        "motores": {}
+    }
+    for nombre, motor in motores.items():
+        if motores_elegidos and nombre not in motores_elegidos:
+            continue
+        resultado["motores"][nombre] = medir_motor(motor, carga, perfiles)
+    if dependiente_tiempo:
+        resultado["dependiente_tiempo"] = {
+            f"{minutos}min": medir_dependiente_tiempo(metro, carga, minutos) for minutos in (60, 15)
+        }
+    return resultado
+
+def correr_benchmark(escenarios=None, motores_elegidos=None, dependiente_tiempo=False):
+    if escenarios is None:
+        escenarios = list(ESCENARIOS)
+    return {
+        "version_python": sys.version.split()[0],
+        "escenarios": {nombre: correr_escenario(ESCENARIOS[nombre], motores_elegidos, dependiente_tiempo)
+                       for nombre in escenarios}
+    }
+
+
+# DEPENDIENTE DEL TIEMPO
+
+def medir_dependiente_tiempo(metro, carga, minutos_intervalo=60, semilla=2):
+    # misma carga con salida a un minuto al azar de la hora: el modo estatico
+    # cobra toda la ruta con la hora de salida, el dependiente con la de cada tramo
+    comp = metro_cdmx.compilar_grafo(metro)
+    azar = random.Random(semilla)
+    perfiles = {}
+    argumentos = {}
+    for consulta in carga:
+        if consulta in argumentos:
+            continue
+        hora, prisa, accesibilidad = consulta[2:]
+        contexto = metro_cdmx.contexto_precalculado(hora, prisa, accesibilidad)
+        perfiles[consulta] = metro_cdmx.crear_perfil_costos(metro["costos"], contexto)
+        argumentos[consulta] = (hora + azar.randrange(60) / 60, prisa, accesibilidad)
+
+    estatico = lambda o, d, p: metro_cdmx.a_star_compilado(
+        comp, o, d, perfil=p, heuristica=metro_cdmx.heuristica_calibrada)
+    dependiente = lambda o, d, a: metro_cdmx.a_star_dependiente_tiempo(
+        comp, o, d, *a, minutos_intervalo=minutos_intervalo)
+    resultado = {
+        "minutos_intervalo": minutos_intervalo,
+        "motores": {
+            "estatico": medir_motor(estatico, carga, perfiles),
+            "dependiente_tiempo": medir_motor(dependiente, carga, argumentos)
+        }
+    }
+
+    # cuantas consultas cambian de costo o de ruta al cobrar cada tramo en su hora
+    costo_distinto = 0
+    ruta_distinta = 0
+    for consulta in carga:
+        ruta_e, est_e = estatico(consulta[0], consulta[1], perfiles[consulta])
+        ruta_d, est_d = dependiente(consulta[0], consulta[1], argumentos[consulta])
+        if ruta_e is None:
+            continue
+        if abs(est_e["costo_total"] - est_d["costo_total"]) > 1e-9:
+            costo_distinto = costo_distinto + 1
+        if ruta_e != ruta_d:
+            ruta_distinta = ruta_distinta + 1
+    resultado["costo_distinto"] = costo_distinto / len(carga)
+    resultado["ruta_distinta"] = ruta_distinta / len(carga)
+    return resultado
+
+
+# HEURISTICAS
+
+def vaciar_cotas(comp):
+    # olvida las cotas por destino de heuristica_calibrada_vectorizada
+    datos = metro_cdmx.datos_numpy(comp)
+    if datos is not None:
+        datos["distancias"].clear()
+
+def medir_heuristicas(num_lineas, estaciones_por_linea, num_consultas=300, semilla=1, num_destinos=10):
+    # misma carga con a_star (diccionarios) y a_star_compilado con cada heuristica,
+    # en pares al azar, en pares de estaciones vecinas (busquedas muy cortas) y en
+    # un lote con pocos destinos repetidos (donde la vectorizada reusa sus cotas);
+    # la preparacion es crear h al iniciar cada consulta. Las cotas vectorizadas se
+    # vacian antes de la preparacion y antes de las consultas, asi cada columna
+    # paga el calculo de cada destino distinto
+    metro = crear_red_sintetica(num_lineas, estaciones_por_linea)
+    comp = metro_cdmx.compilar_grafo(metro)
+    azar = random.Random(semilla)
+    nombres = list(metro["estaciones"])
+    destinos = azar.sample(nombres, num_destinos)
+    cargas = {
+        "azar": [consulta[:2] for consulta in crear_carga(metro, num_consultas, semilla)],
+        "vecinas": [(o, azar.choice(metro["conexiones"][o])[0])
+                    for o in azar.choices([e for e in nombres if metro["conexiones"].get(e)],
+                                          k=num_consultas)],
+        f"{num_destinos}_destinos": [(azar.choice(nombres), azar.choice(destinos)) for _ in range(num_consultas)]
+    }
+    heuristicas = {
+        "euclidiana": metro_cdmx.heuristica_euclidiana_compilada,
+        "calibrada": metro_cdmx.heuristica_calibrada,
+        "calibrada_vectorizada": metro_cdmx.heuristica_calibrada_vectorizada,
+        "alt": metro_cdmx.heuristica_alt
+    }
+    metro_cdmx.preparar_landmarks(comp)
+    motores = {"a_star": (None, lambda o, d, h: metro_cdmx.a_star(metro, o, d))}
+    for nombre, heuristica in heuristicas.items():
+        motores[f"compilado_{nombre}"] = (heuristica, lambda o, d, h: metro_cdmx.a_star_compilado(
+            comp, o, d, heuristica=h))
+    resultado = {"estaciones": len(comp["nombres"]), "estados": len(comp["estado_estacion"]),
+                 "cargas": {}}
+    for nombre_carga, carga in cargas.items():
+        medidas = resultado["cargas"][nombre_carga] = {}
+        for nombre, (heuristica, motor) in motores.items():
+            preparacion = 0.0
+            if heuristica is not None:
+                vaciar_cotas(comp)
+                inicio = time.perf_counter()
+                for _, destino in carga:
+                    heuristica(comp, comp["indice"][destino], None)
+                preparacion = time.perf_counter() - inicio
+            vaciar_cotas(comp)
+            nodos = 0
+            inicio = time.perf_counter()
+            for o, d in carga:
+                _, estadisticas = motor(o, d, heuristica)
+                nodos = nodos + estadisticas.get("nodos_explorados", 0)
+            total = time.perf_counter() - inicio
+            medidas[nombre] = {
+                "preparacion_us": preparacion / len(carga) * 1e6,
+                "consulta_us": total / len(carga) * 1e6,
+                "us_por_expansion": total / nodos * 1e6 if nodos else 0.0,
+                "nodos_explorados_medio": nodos / len(carga)
+            }
+    return resultado
+
+def imprimir_heuristicas(resultados):
+    for red in resultados:
+        print(f"\nheuristicas: {red['estaciones']} estaciones, {red['estados']} estados")
+        for nombre_carga, medidas in red["cargas"].items():
+            print(f"  pares {nombre_carga}")
+            print(f"  {'motor':<30}{'prep us':>10}{'cons us':>10}{'us/exp':>9}{'nodos':>9}")
+            for nombre, m in medidas.items():
+                print(f"  {nombre:<30}{m['preparacion_us']:>10.1f}{m['consulta_us']:>10.1f}"
+                      f"{m['us_por_expansion']:>9.2f}{m['nodos_explorados_medio']:>9.1f}")
+
+
+# ASIGNACION ORIGEN-DESTINO
+
+def crear_matriz_od(metro, semilla=3):
+    # todos los pares (origen, destino) con una demanda al azar
+    azar = random.Random(semilla)
+    nombres = list(metro["estaciones"])
+    return [(o, d, round(azar.expovariate(1 / 20), 1)) for o in nombres for d in nombres if o != d]
+
+def medir_asignacion(num_lineas, estaciones_por_linea, semilla=3):
+    # matriz completa: asignacion en lote (arbol por origen) con NumPy y sin el,
+    # contra una busqueda a_star_compilado por par sumando la carga de su ruta
+    metro = crear_red_sintetica(num_lineas, estaciones_por_linea)
+    comp = metro_cdmx.compilar_grafo(metro)
+    matriz = crear_matriz_od(metro, semilla)
+    resultado = {"estaciones": len(comp["nombres"]), "pares": len(matriz), "tiempos_s": {}}
+    for modo, con_numpy in (("lote_numpy", True), ("lote_python", False)):
+        metro_cdmx.usar_numpy = con_numpy
+        comp.pop("numpy", None)
+        inicio = time.perf_counter()
+        asignacion = metro_cdmx.asignar_demanda(comp, matriz)
+        resultado["tiempos_s"][modo] = time.perf_counter() - inicio
+    metro_cdmx.usar_numpy = True
+    comp.pop("numpy", None)
+
+    inicio = time.perf_counter()
+    cargas = {}
+    for o, d, pasajeros in matriz:
+        ruta, _ = metro_cdmx.a_star_compilado(comp, o, d, heuristica=metro_cdmx.heuristica_calibrada)
+        if ruta is None:
+            # la red sintetica puede quedar desconectada
+            continue
+        for a, b in zip(ruta, ruta[1:]):
+            cargas[(a, b)] = cargas.get((a, b), 0.0) + pasajeros
+    resultado["tiempos_s"]["por_par"] = time.perf_counter() - inicio
+
+    resultado["conexiones_con_carga"] = len(asignacion["conexiones"])
+    resultado["estaciones_con_transbordos"] = len(asignacion["transbordos"])
+    resultado["pasajeros"] = asignacion["pasajeros"]
+    # las rutas empatadas pueden repartirse distinto; el total de pasajeros-minuto no
+    resultado["pasajeros_minuto"] = asignacion["pasajeros_minuto"]
+
+    # 24 matrices horarias: un arbol por origen y perfil, no por hora
+    matrices = {hora: matriz for hora in range(24)}
+    inicio = time.perf_counter()
+    _, estadisticas = metro_cdmx.asignar_matrices_horarias(matrices, comp=comp)
+    resultado["tiempos_s"]["por_matriz_en_24_horas"] = (time.perf_counter() - inicio) / 24
+    resultado["perfiles_24_horas"] = estadisticas["perfiles"]
+    return resultado
+
+def imprimir_asignacion(resultado):
+    tiempos = resultado["tiempos_s"]
+    print(f"\nasignacion origen-destino: {resultado['estaciones']} estaciones, "
+          f"{resultado['pares']} pares, {resultado['pasajeros']:.0f} pasajeros")
+    print(f"  {'modo':<22}{'s':>9}{'vs por par':>12}")
+    for modo, segundos in tiempos.items():
+        print(f"  {modo:<22}{segundos:>9.3f}{tiempos['por_par'] / segundos:>11.1f}x")
+    print(f"  conexiones con carga: {resultado['conexiones_con_carga']}, "
+          f"estaciones con transbordos: {resultado['estaciones_con_transbordos']}, "
+          f"perfiles en 24 horas: {resultado['perfiles_24_horas']}")
+
+# INDICE DE NOMBRES
+
+def crear_nombres(num_nombres, semilla=4):
+    # grafo minimo (solo estaciones con sus lineas), como el de un GTFS grande
+    azar = random.Random(semilla)
+    propios = sorted({"".join(azar.choices(SILABAS_NOMBRES, k=azar.randint(2, 4))).capitalize()
+                      for _ in range(num_nombres // 2)})
+    estaciones = {}
+    while len(estaciones) < num_nombres:
+        palabras = azar.sample(propios, azar.randint(1, 3))
+        if azar.random() < 0.5:
+            palabras.insert(0, azar.choice(PALABRAS_COMUNES))
+        estaciones[" ".join(palabras)] = {"lineas": azar.sample(range(1, 41), azar.choice((1, 1, 1, 2, 3)))}
+    return {"estaciones": estaciones, "version": 0}
+
+def con_error(texto, azar):
+    # un error de dedo: letra cambiada, faltante o intercambiada con la vecina
+    i = azar.randrange(1, len(texto) - 1)
+    error = azar.randrange(3)
+    if error == 0:
+        return texto[:i] + azar.choice("aeiourstln") + texto[i + 1:]
+    if error == 1:
+        return texto[:i] + texto[i + 1:]
+    return texto[:i - 1] + texto[i] + texto[i - 1] + texto[i + 1:]
+
+def medir_nombres(num_nombres=NUM_NOMBRES, num_consultas=CONSULTAS_NOMBRES, semilla=4):
+    grafo = crear_nombres(num_nombres, semilla)
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    indice = metro_cdmx.crear_indice_nombres(grafo)
+    construccion = time.perf_counter() - inicio
+    memoria = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    azar = random.Random(semilla)
+    nombres = azar.sample(list(grafo["estaciones"]), num_consultas)
+    # sin acentos y en minusculas, prefijos de 3 a 8 letras y un error de dedo
+    consultas = {
+        "exacta": [metro_cdmx.normalizar_nombre(nombre) for nombre in nombres],
+        "prefijo": [nombre[:azar.randint(3, 8)] for nombre in nombres],
+        "aproximada": [con_error(nombre, azar) for nombre in nombres],
+        "por_linea": [nombre[:azar.randint(3, 8)] for nombre in nombres]
+    }
+    resultado = {"nombres": num_nombres, "construccion_s": construccion,
+                 "memoria_kb": memoria / 1024, "tipos": {}}
+    for tipo, textos in consultas.items():
+        tiempos = []
+        encontradas = 0
+        for nombre, texto in zip(nombres, textos):
+            linea = grafo["estaciones"][nombre]["lineas"][0] if tipo == "por_linea" else None
+            inicio = time.perf_counter()
+            resultados = metro_cdmx.buscar_estaciones(indice, texto, 10, linea)
+            tiempos.append(time.perf_counter() - inicio)
+            encontradas += any(r["nombre"] == nombre for r in resultados)
+        tiempos.sort()
+        resultado["tipos"][tipo] = {
+            "p50_ms": percentil(tiempos, 50) * 1000,
+            "p99_ms": percentil(tiempos, 99) * 1000,
+            "max_ms": tiempos[-1] * 1000,
+            # la estacion buscada esta entre los 10 resultados
+            "encontrada": encontradas / len(textos)
+        }
+    return resultado
+
+def imprimir_nombres(resultado):
+    print(f"\nindice de nombres: {resultado['nombres']} estaciones, "
+          f"construccion {resultado['construccion_s']:.2f} s, {resultado['memoria_kb']:.0f} kb")
+    print(f"  {'consulta':<14}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'en top 10':>11}")
+    for tipo, m in resultado["tipos"].items():
+        print(f"  {tipo:<14}{m['p50_ms']:>9.3f}{m['p99_ms']:>9.3f}{m['max_ms']:>9.3f}"
+              f"{m['encontrada']:>11.1%}")
+
+# CERCANAS Y RUTAS ENTRE COORDENADAS
+
+def medir_coordenadas(num_lineas, estaciones_por_linea, num_consultas=CONSULTAS_COORDENADAS,
+                      k=ACCESOS_COORDENADAS, semilla=5):
+    # k mas cercanas con la reticula contra revisar todas las estaciones, y una
+    # busqueda con varias salidas y llegadas contra k x k a_star_compilado
+    metro = crear_red_sintetica(num_lineas, estaciones_por_linea)
+    comp = metro_cdmx.compilar_grafo(metro)
+    inicio = time.perf_counter()
+    indice = metro_cdmx.crear_indice_espacial(comp)
+    construccion = time.perf_counter() - inicio
+    azar = random.Random(semilla)
+    x0, x1, y0, y1 = min(comp["x"]), max(comp["x"]), min(comp["y"]), max(comp["y"])
+    puntos = [((azar.uniform(x0, x1), azar.uniform(y0, y1)), (azar.uniform(x0, x1), azar.uniform(y0, y1)))
+              for _ in range(num_consultas)]
+    resultado = {"estaciones": len(comp["nombres"]), "consultas": num_consultas, "k": k,
+                 "construccion_ms": construccion * 1000, "tiempos_ms": {}}
+
+    inicio = time.perf_counter()
+    for origen, _ in puntos:
+        metro_cdmx.buscar_cercanas(indice, origen[0], origen[1], k)
+    resultado["tiempos_ms"]["cercanas_reticula"] = (time.perf_counter() - inicio) / num_consultas * 1000
+    inicio = time.perf_counter()
+    for (px, py), _ in puntos:
+        sorted((((x - px) ** 2 + (y - py) ** 2) ** 0.5, e)
+               for e, (x, y) in enumerate(zip(comp["x"], comp["y"])))[:k]
+    resultado["tiempos_ms"]["cercanas_todas"] = (time.perf_counter() - inicio) / num_consultas * 1000
+
+    costos = []
+    nodos = 0
+    inicio = time.perf_counter()
+    for origen, destino in puntos:
+        _, estadisticas = metro_cdmx.ruta_entre_coordenadas(
+            indice, origen, destino, k=k, minutos_por_unidad=MINUTOS_CAMINANDO_SINTETICA)
+        costos.append(estadisticas["costo_total"])
+        nodos = nodos + estadisticas["nodos_explorados"]
+    resultado["tiempos_ms"]["ruta_multiorigen"] = (time.perf_counter() - inicio) / num_consultas * 1000
+    resultado["nodos_multiorigen"] = nodos / num_consultas
+
+    nombres = comp["nombres"]
+    iguales = 0
+    nodos = 0
+    inicio = time.perf_counter()
+    for (origen, destino), costo in zip(puntos, costos):
+        salidas = metro_cdmx.buscar_cercanas(indice, origen[0], origen[1], k)
+        llegadas = metro_cdmx.buscar_cercanas(indice, destino[0], destino[1], k)
+        mejor = math.dist(origen, destino) * MINUTOS_CAMINANDO_SINTETICA
+        for distancia_o, o in salidas:
+            for distancia_d, d in llegadas:
+                _, estadisticas = metro_cdmx.a_star_compilado(comp, nombres[o], nombres[d],
+                                                              heuristica=metro_cdmx.heuristica_calibrada)
+                nodos = nodos + estadisticas.get("nodos_explorados", 0)
+                if "costo_total" in estadisticas:
+                    mejor = min(mejor, (distancia_o + distancia_d) * MINUTOS_CAMINANDO_SINTETICA
+                                + estadisticas["costo_total"])
+        iguales += abs(mejor - costo) < 1e-6
+    resultado["tiempos_ms"]["a_star_k_x_k"] = (time.perf_counter() - inicio) / num_consultas * 1000
+    resultado["nodos_k_x_k"] = nodos / num_consultas
+    resultado["mismo_costo"] = iguales / num_consultas
+    return resultado
+
+def imprimir_coordenadas(resultado):
+    tiempos = resultado["tiempos_ms"]
+    print(f"\nrutas entre coordenadas: {resultado['estaciones']} estaciones, "
+          f"{resultado['consultas']} consultas, k = {resultado['k']}, "
+          f"reticula en {resultado['construccion_ms']:.1f} ms")
+    print(f"  {'modo':<22}{'ms':>9}")
+    for modo, ms in tiempos.items():
+        print(f"  {modo:<22}{ms:>9.3f}")
+    print(f"  nodos: multiorigen {resultado['nodos_multiorigen']:.0f}, "
+          f"k x k {resultado['nodos_k_x_k']:.0f}; mismo costo: {resultado['mismo_costo']:.1%}")
+
+# POOL DE PROCESOS
+
+def medir_pool(num_lineas, estaciones_por_linea, num_consultas=CONSULTAS_POOL, semilla=6):
+    # arranque de un trabajador (adjuntarse al bloque contra deserializar comp)
+    # y lote completo en el proceso actual contra el pool con 1..nucleos procesos
+    import os
+    import pickle
+
+    metro = crear_red_sintetica(num_lineas, estaciones_por_linea)
+    comp = metro_cdmx.compilar_grafo(metro)
+    carga = crear_carga(metro, num_consultas, semilla)
+    heuristica = metro_cdmx.heuristica_alt
+    resultado = {"estaciones": len(comp["nombres"]), "consultas": num_consultas,
+                 "nucleos": os.cpu_count() or 1, "arranque_ms": {}, "lote_s": {}}
+
+    perfiles = metro_cdmx.perfiles_posibles(comp["costos"])
+    inicio = time.perf_counter()
+    memoria, descriptor = metro_cdmx.publicar_red_compartida(comp, perfiles)
+    resultado["publicar_ms"] = (time.perf_counter() - inicio) * 1000
+    resultado["bytes_compartidos"] = memoria.size
+    inicio = time.perf_counter()
+    adjunto, _ = metro_cdmx.adjuntar_red_compartida(descriptor)
+    resultado["arranque_ms"]["adjuntar_bloque"] = (time.perf_counter() - inicio) * 1000
+    resultado["bytes_descriptor"] = len(pickle.dumps(descriptor))
+    del adjunto
+    # sin bloque: cada trabajador recibe comp con sus landmarks serializados
+    copia = {clave: valor for clave, valor in comp.items() if clave != "numpy"}
+    serializado = pickle.dumps(copia)
+    inicio = time.perf_counter()
+    pickle.loads(serializado)
+    resultado["arranque_ms"]["deserializar_comp"] = (time.perf_counter() - inicio) * 1000
+    resultado["bytes_serializados"] = len(serializado)
+    memoria.close()
+    memoria.unlink()
+
+    inicio = time.perf_counter()
+    list(metro_cdmx.rutas_multiples(carga, comp=comp, heuristica=heuristica))
+    resultado["lote_s"]["sin_pool"] = time.perf_counter() - inicio
+    for procesos in sorted({1, 2, resultado["nucleos"]}):
+        pool = metro_cdmx.crear_pool_rutas(comp, procesos, heuristica)
+        try:
+            # el primer lote paga el arranque de los trabajadores
+            list(metro_cdmx.rutas_en_pool(pool, carga[:procesos]))
+            inicio = time.perf_counter()
+            list(metro_cdmx.rutas_en_pool(pool, carga))
+            resultado["lote_s"][f"pool_{procesos}"] = time.perf_counter() - inicio
+        finally:
+            metro_cdmx.cerrar_pool_rutas(pool)
+    return resultado
+
+def imprimir_pool(resultado):
+    print(f"\npool de procesos: {resultado['estaciones']} estaciones, {resultado['consultas']} consultas, "
+          f"{resultado['nucleos']} nucleos")
+    print(f"  bloque compartido: {resultado['bytes_compartidos'] / 1024:.0f} kb, publicado en "
+          f"{resultado['publicar_ms']:.1f} ms; descriptor {resultado['bytes_descriptor'] / 1024:.0f} kb "
+          f"contra {resultado['bytes_serializados'] / 1024:.0f} kb de comp serializado")
+    for modo, ms in resultado["arranque_ms"].items():
+        print(f"  arranque {modo:<20}{ms:>9.2f} ms")
+    base = resultado["lote_s"]["sin_pool"]
+    for modo, segundos in resultado["lote_s"].items():
+        print(f"  lote {modo:<24}{segundos:>9.3f} s{base / segundos:>7.2f}x")
+
+def imprimir_motores(motores):
+    print(f"  {'motor':<22}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'nodos':>9}{'mem kb':>9}{'cons/s':>10}")
+    for motor, m in motores.items():
+        print(f"  {motor:<22}{m['p50_ms']:>9.3f}{m['p95_ms']:>9.3f}{m['p99_ms']:>9.3f}"
+              f"{m['nodos_explorados_medio']:>9.1f}{m['memoria_pico_kb']:>9.1f}"
+              f"{m['consultas_por_segundo']:>10.0f}")
+
+def imprimir_reporte(resultados):
+    for nombre, escenario in resultados["escenarios"].items():
+        print(f"\n{nombre}: {escenario['estaciones']} estaciones, "
+              f"{escenario['estados']} estados, {escenario['consultas']} consultas")
+        imprimir_motores(escenario["motores"])
+        for intervalo, comparacion in escenario.get("dependiente_tiempo", {}).items():
+            print(f"\n  dependiente del tiempo (intervalos de {intervalo}): "
+                  f"costo distinto {comparacion['costo_distinto']:.1%}, "
+                  f"ruta distinta {comparacion['ruta_distinta']:.1%}")
+            imprimir_motores(comparacion["motores"])
+
+def comparar_con_linea_base(resultados, linea_base):
+    # regresa (regresiones, faltantes): lo medido que no esta en la linea base
+    # no se puede comparar y se reporta aparte
+    regresiones = []
+    faltantes = []
+    for nombre, escenario in resultados["escenarios"].items():
+        base = linea_base["escenarios"].get(nombre)
+        if base is None:
+            faltantes.append(nombre)
+            continue
+        for motor, m in escenario["motores"].items():
+            b = base["motores"].get(motor)
+            if b is None:
+                faltantes.append(f"{nombre}/{motor}")
+                continue
+            for metrica in ("p50_ms", "p95_ms"):
+                if m[metrica] > b[metrica] * (1 + TOLERANCIA_LATENCIA):
+                    regresiones.append(f"{nombre}/{motor}: {metrica} {b[metrica]:.3f} -> {m[metrica]:.3f}")
+            if m["nodos_explorados_medio"] > b["nodos_explorados_medio"] * (1 + TOLERANCIA_NODOS) + 1e-9:
+                regresiones.append(f"{nombre}/{motor}: nodos {b['nodos_explorados_medio']:.1f} "
+                                   f"-> {m['nodos_explorados_medio']:.1f}")
+    return regresiones, faltantes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los motores de ruteo")
+    parser.add_argument("--escenario", action="append", choices=list(ESCENARIOS),
+                        help="escenario a correr (se puede repetir); por defecto todos")
+    parser.add_argument("--motor", action="append", help="motor a medir (se puede repetir)")
+    parser.add_argument("--guardar", help="escribir los resultados como linea base JSON")
+    parser.add_argument("--comparar", help="comparar contra una linea base JSON")
+    parser.add_argument("--dependiente-tiempo", action="store_true",
+                        help="medir tambien el ruteo dependiente del tiempo contra el estatico")
+    parser.add_argument("--heuristicas", action="store_true",
+                        help="medir solo el costo por consulta y por expansion de las heuristicas")
+    parser.add_argument("--asignacion", action="store_true",
+                        help="medir solo la asignacion de una matriz origen-destino completa")
+    parser.add_argument("--nombres", action="store_true",
+                        help="medir solo el indice de nombres de estaciones")
+    parser.add_argument("--coordenadas", action="store_true",
+                        help="medir solo las estaciones cercanas y las rutas entre coordenadas")
+    parser.add_argument("--pool", action="store_true",
+                        help="medir solo el lote repartido entre procesos con la red compartida")
+    argumentos = parser.parse_args()
+
+    if argumentos.heuristicas:
+        imprimir_heuristicas([medir_heuristicas(*red) for red in REDES_HEURISTICA])
+        return 0
+    if argumentos.asignacion:
+        imprimir_asignacion(medir_asignacion(*RED_ASIGNACION))
+        return 0
+    if argumentos.nombres:
+        imprimir_nombres(medir_nombres())
+        return 0
+    if argumentos.coordenadas:
+        imprimir_coordenadas(medir_coordenadas(*RED_COORDENADAS))
+        return 0
+    if argumentos.pool:
+        imprimir_pool(medir_pool(*RED_POOL))
+        return 0
+
+    resultados = correr_benchmark(argumentos.escenario, argumentos.motor, argumentos.dependiente_tiempo)
+    imprimir_reporte(resultados)
+    if argumentos.guardar:
+        with open(argumentos.guardar, "w", encoding="utf-8") as archivo:
+            json.dump(resultados, archivo, indent=2, ensure_ascii=False)
+        print(f"\nLinea base guardada en {argumentos.guardar}")
+    if argumentos.comparar:
+        with open(argumentos.comparar, encoding="utf-8") as archivo:
+            regresiones, faltantes = comparar_con_linea_base(resultados, json.load(archivo))
+        if faltantes:
+            print(f"\nSIN LINEA BASE (regenerar con --guardar {argumentos.comparar}):")
+            for faltante in faltantes:
+                print(f"  {faltante}")
+        if regresiones:
+            print("\nREGRESIONES:")
+            for regresion in regresiones:
+                print(f"  {regresion}")
+        if faltantes or regresiones:
+            return 1
+        print("\nSin regresiones contra la linea base")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,281 @@
+## Importador GTFS para la red de transporte de la CDMX
+# Uso:
+#   python gtfs_metro.py ruta/al/feed[.zip] --salida redes/cdmx_gtfs.json
+#   python gtfs_metro.py redes/gtfs_muestra --tipos 1 0     # solo Metro y Tren Ligero
+# Lee stops.txt, routes.txt, trips.txt y stop_times.txt renglon por renglon
+# (csv sobre el archivo o el zip, sin cargarlos completos). La memoria depende
+# del numero de paradas, viajes y tramos distintos, no de stop_times: un viaje
+# se procesa en cuanto termina y sus tramos se suman a un acumulador por
+# (estacion, estacion, linea). Si stop_times no trae juntos los renglones de
+# cada viaje se vuelve a leer guardandolos por viaje. El resultado es un grafo de metro_cdmx (o su
+# fuente editable, que cargar_red compila).
+# python verificar_gtfs.py revisa el importador con la muestra de redes/gtfs_muestra.
+import argparse
+import csv
+import io
+import math
+import os
+import sys
+import zipfile
+
+import metro_cdmx
+
+# tipos de ruta GTFS: 0 tranvia/tren ligero, 1 metro, 2 tren, 3 autobus (Metrobus)
+TIPOS_RUTA = {0: "tren ligero", 1: "metro", 2: "tren", 3: "autobus", 11: "trolebus"}
+
+# km por grado de latitud
+KM_POR_GRADO = 111.32
+# minutos por km para tramos sin horarios (si todo el tramo carece de ellos)
+MINUTOS_POR_KM = 2.0
+# estaciones con el mismo nombre a lo mas a esta distancia (km) son un transbordo
+RADIO_UNION_KM = 0.3
+
+
+# LECTURA
+
+def leer_tabla(feed, archivo):
+    # genera diccionarios por renglon; feed es un directorio o un .zip
+    if os.path.isdir(feed):
+        with open(os.path.join(feed, archivo), encoding="utf-8-sig", newline="") as entrada:
+            yield from csv.DictReader(entrada)
+    else:
+        with zipfile.ZipFile(feed) as zip_feed:
+            with zip_feed.open(archivo) as crudo:
+                entrada = io.TextIOWrapper(crudo, encoding="utf-8-sig", newline="")
+                yield from csv.DictReader(entrada)
+
+def segundos_gtfs(hora):
+    # "HH:MM:SS" (las horas pueden pasar de 24); None si esta vacia
+    hora = hora.strip()
+    if not hora:
+        return None
+    h, m, s = hora.split(":")
+    return int(h) * 3600 + int(m) * 60 + int(s)
+
+def distancia_km(datos, lat, lon):
+    # del centro de las paradas ya unidas en datos a (lat, lon), equirectangular
+    lat0 = datos["lat"] / datos["n"]
+    lon0 = datos["lon"] / datos["n"]
+    dx = (lon - lon0) * KM_POR_GRADO * math.cos(math.radians((lat + lat0) / 2))
+    dy = (lat - lat0) * KM_POR_GRADO
+    return math.hypot(dx, dy)
+
+
+# PASOS DEL IMPORTADOR
+
+def leer_paradas(feed, unir_por_nombre=True):
+    # parada -> estacion; las paradas con parent_station se unen a su estacion
+    # y, con unir_por_nombre, las estaciones con el mismo nombre a lo mas a
+    # RADIO_UNION_KM (transbordos entre sistemas, p. ej. Metro y Metrobus) son
+    # una sola. Dos "Hidalgo" lejanas quedan separadas
+    estacion_de = {}
+    padre_de = {}
+    estaciones = {}   # clave (stop_id de la primera parada) -> {"nombre", "lat", "lon", "n"}
+    por_nombre = {}   # nombre sin mayusculas -> claves con ese nombre
+    for fila in leer_tabla(feed, "stops.txt"):
+        tipo = fila.get("location_type", "").strip() or "0"
+        if tipo not in ("0", "1"):
+            continue  # entradas, nodos genericos, andenes de abordaje
+        parada = fila["stop_id"]
+        padre = fila.get("parent_station", "").strip()
+        if padre:
+            padre_de[parada] = padre
+            continue
+        nombre = fila["stop_name"].strip()
+        lat = float(fila["stop_lat"])
+        lon = float(fila["stop_lon"])
+        clave = parada
+        if unir_por_nombre:
+            candidatas = por_nombre.setdefault(nombre.casefold(), [])
+            for candidata in candidatas:
+                if distancia_km(estaciones[candidata], lat, lon) <= RADIO_UNION_KM:
+                    clave = candidata
+                    break
+            else:
+                candidatas.append(parada)
+        datos = estaciones.setdefault(clave, {"nombre": nombre, "lat": 0.0, "lon": 0.0, "n": 0})
+        datos["lat"] += lat
+        datos["lon"] += lon
+        datos["n"] += 1
+        estacion_de[parada] = clave
+    for parada, padre in padre_de.items():
+        if padre in estacion_de:
+            estacion_de[parada] = estacion_de[padre]
+    return estacion_de, estaciones
+
+def leer_rutas(feed, tipos=None):
+    # ruta -> linea (route_short_name; route_id si el nombre corto se repite)
+    rutas = {}
+    for fila in leer_tabla(feed, "routes.txt"):
+        tipo = int(fila.get("route_type", "3") or 3)
+        if tipos is not None and tipo not in tipos:
+            continue
+        rutas[fila["route_id"]] = (fila.get("route_short_name", "").strip()
+                                   or fila.get("route_long_name", "").strip()
+                                   or fila["route_id"])
+    conteo = {}
+    for nombre in rutas.values():
+        conteo[nombre] = conteo.get(nombre, 0) + 1
+    return {ruta: (nombre if conteo[nombre] == 1 else ruta) for ruta, nombre in rutas.items()}
+
+def leer_viajes(feed, rutas):
+    # viaje -> linea, solo de las rutas importadas
+    viajes = {}
+    for fila in leer_tabla(feed, "trips.txt"):
+        linea = rutas.get(fila["route_id"])
+        if linea is not None:
+            viajes[fila["trip_id"]] = linea
+    return viajes
+
+def acumular_viaje(tramos, paradas_viaje, linea, estacion_de):
+    # suma los tramos consecutivos de un viaje: (a, b, linea) -> [suma_min, muestras]
+    paradas_viaje.sort()
+    anterior = None
+    for _, parada, llegada, salida in paradas_viaje:
+        estacion = estacion_de.get(parada)
+        if estacion is None:
+            continue
+        if anterior is not None and anterior[0] != estacion:
+            a, b = sorted((anterior[0], estacion))
+            datos = tramos.setdefault((a, b, linea), [0.0, 0])
+            if anterior[1] is not None and llegada is not None and llegada >= anterior[1]:
+                datos[0] += (llegada - anterior[1]) / 60
+                datos[1] += 1
+        anterior = (estacion, salida if salida is not None else llegada)
+
+def parada_horario(fila):
+    return (int(fila["stop_sequence"]), fila["stop_id"],
+            segundos_gtfs(fila.get("arrival_time", "")),
+            segundos_gtfs(fila.get("departure_time", "")))
+
+def leer_horarios(feed, viajes, estacion_de):
+    # una pasada por stop_times; los renglones de un viaje suelen venir juntos y
+    # cada viaje se procesa en cuanto termina. Si un viaje ya procesado vuelve a
+    # aparecer, el archivo no viene agrupado y se lee de nuevo juntando los
+    # renglones por viaje (leer_horarios_sin_agrupar)
+    tramos = {}
+    terminados = set()
+    viaje_actual = None
+    paradas_viaje = []
+    renglones = 0
+    for fila in leer_tabla(feed, "stop_times.txt"):
+        renglones = renglones + 1
+        viaje = fila["trip_id"]
+        if viaje != viaje_actual:
+            if viaje_actual in viajes:
+                acumular_viaje(tramos, paradas_viaje, viajes[viaje_actual], estacion_de)
+                terminados.add(viaje_actual)
+            if viaje in terminados:
+                return leer_horarios_sin_agrupar(feed, viajes, estacion_de)
+            viaje_actual = viaje
+            paradas_viaje = []
+        if viaje in viajes:
+            paradas_viaje.append(parada_horario(fila))
+    if viaje_actual in viajes:
+        acumular_viaje(tramos, paradas_viaje, viajes[viaje_actual], estacion_de)
+    return tramos, renglones
+
+def leer_horarios_sin_agrupar(feed, viajes, estacion_de):
+    # stop_times con los renglones de un viaje repartidos: se guardan todos por
+    # viaje y cada viaje se procesa completo al final (memoria de stop_times)
+    paradas = {}
+    renglones = 0
+    for fila in leer_tabla(feed, "stop_times.txt"):
+        renglones = renglones + 1
+        viaje = fila["trip_id"]
+        if viaje in viajes:
+            paradas.setdefault(viaje, []).append(parada_horario(fila))
+    tramos = {}
+    for viaje, paradas_viaje in paradas.items():
+        acumular_viaje(tramos, paradas_viaje, viajes[viaje], estacion_de)
+    return tramos, renglones
+
+# GRAFO
+
+def importar_gtfs(feed, tipos=None, unir_por_nombre=True, estadisticas=None):
+    # regresa un grafo de metro_cdmx con coordenadas en km (proyeccion local),
+    # lineas por estacion, transbordos y tiempo_min promedio por tramo
+    estacion_de, estaciones = leer_paradas(feed, unir_por_nombre)
+    rutas = leer_rutas(feed, tipos)
+    viajes = leer_viajes(feed, rutas)
+    tramos, renglones = leer_horarios(feed, viajes, estacion_de)
+
+    # lineas por estacion, en el orden en que aparecen
+    lineas_de = {}
+    for a, b, linea in tramos:
+        for clave in (a, b):
+            lineas = lineas_de.setdefault(clave, [])
+            if linea not in lineas:
+                lineas.append(linea)
+
+    # proyeccion equirectangular alrededor del centro de las estaciones usadas
+    usadas = [clave for clave in estaciones if clave in lineas_de]
+    if not usadas:
+        raise ValueError(f"El feed {feed} no tiene tramos para los tipos de ruta pedidos")
+    lat0 = sum(estaciones[c]["lat"] / estaciones[c]["n"] for c in usadas) / len(usadas)
+    lon0 = sum(estaciones[c]["lon"] / estaciones[c]["n"] for c in usadas) / len(usadas)
+    escala_lon = KM_POR_GRADO * math.cos(math.radians(lat0))
+
+    metro = metro_cdmx.crear_grafo()
+    nombres = {}
+    for clave in usadas:
+        datos = estaciones[clave]
+        nombre = datos["nombre"]
+        if nombre in metro["estaciones"]:
+            # mismo nombre lejos de la otra (o sin unir_por_nombre)
+            nombre = f"{nombre} ({clave})"
+        nombres[clave] = nombre
+        x = (datos["lon"] / datos["n"] - lon0) * escala_lon
+        y = (datos["lat"] / datos["n"] - lat0) * KM_POR_GRADO
+        metro_cdmx.agregar_estacion(metro, nombre, lineas_de[clave], (round(x, 3), round(y, 3)))
+
+    for (a, b, linea), (suma, muestras) in tramos.items():
+        if muestras:
+            tiempo_min = suma / muestras
+        else:
+            xa, ya = metro["estaciones"][nombres[a]]["coords"]
+            xb, yb = metro["estaciones"][nombres[b]]["coords"]
+            tiempo_min = math.hypot(xa - xb, ya - yb) * MINUTOS_POR_KM
+        metro_cdmx.agregar_conexion(metro, nombres[a], nombres[b], round(tiempo_min, 2), linea)
+
+    if estadisticas is not None:
+        estadisticas.update({
+            "paradas": len(estacion_de),
+            "estaciones": len(metro["estaciones"]),
+            "lineas": len({linea for _, _, linea in tramos}),
+            "viajes": len(viajes),
+            "renglones_stop_times": renglones,
+            "tramos": len(tramos),
+            "transbordos": sum(1 for e in metro["estaciones"].values() if e["es_transbordo"])
+        })
+    return metro
+
+def importar_gtfs_compilado(feed, tipos=None, unir_por_nombre=True):
+    # la forma compilada (CSR) que usan a_star_compilado y compania
+    return metro_cdmx.compilar_grafo(importar_gtfs(feed, tipos, unir_por_nombre))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importa un feed GTFS como red del metro")
+    parser.add_argument("feed", help="directorio o .zip con el feed GTFS")
+    parser.add_argument("--salida", help="escribir la red como fuente editable (JSON)")
+    parser.add_argument("--tipos", type=int, nargs="+",
+                        help="tipos de ruta GTFS a importar (0 tren ligero, 1 metro, 3 autobus)")
+    parser.add_argument("--sin-unir-nombres", action="store_true",
+                        help="no unir estaciones distintas con el mismo nombre")
+    argumentos = parser.parse_args()
+
+    estadisticas = {}
+    metro = importar_gtfs(argumentos.feed, argumentos.tipos,
+                          not argumentos.sin_unir_nombres, estadisticas)
+    for clave, valor in estadisticas.items():
+        print(f"{clave}: {valor}")
+    if argumentos.salida:
+        nombre = os.path.splitext(os.path.basename(argumentos.salida))[0]
+        metro_cdmx.guardar_fuente_red(metro, argumentos.salida, nombre)
+        print(f"Red guardada en {argumentos.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
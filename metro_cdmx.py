@@ -1,13 +1,28 @@
 ## Metro - CDMX
+import heapq
+import itertools
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
 import time
-from collections import defaultdict
-import matplotlib.pyplot as plt
-import networkx as nx
+from array import array
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict
+from types import MappingProxyType
 
 # Estructura del grafo (diccionarios simples)
 # estaciones = {nombre: {"lineas": [1,2], "coords": (x,y), "es_transbordo": bool}}
 # conexiones = {origen: [(destino, tiempo_min, linea), ...]}
 # costos = {"estacion_normal": 2, "transbordo": 3}
+# perfil = costos efectivos de un contexto, de solo lectura (ver crear_perfil_costos)
+# version = identificador unico de la topologia, cambia con cada estacion/conexion
+
+INFINITO = float("inf")
+
+contador_versiones = itertools.count(1)
 
 def crear_grafo():
     return {
@@ -16,7 +31,8 @@ def crear_grafo():
         "costos": {
             "estacion_normal": 2,  # minutos
             "transbordo": 3        # minutos adicionales
-        }
+        },
+        "version": next(contador_versiones)
     }
 
 def agregar_estacion(grafo, nombre, lineas, coords=(0, 0)):
@@ -25,23 +41,26 @@ def agregar_estacion(grafo, nombre, lineas, coords=(0, 0)):
         "coords": coords,
         "es_transbordo": len(lineas) > 1
     }
+    grafo["version"] = next(contador_versiones)
 
 def agregar_conexion(grafo, origen, destino, tiempo_min, linea):
     grafo["conexiones"][origen].append((destino, tiempo_min, linea))
     grafo["conexiones"][destino].append((origen, tiempo_min, linea))
+    grafo["version"] = next(contador_versiones)
 
 def obtener_vecinos(grafo, estacion):
     return grafo["conexiones"].get(estacion, [])
 
-def calcular_costo_movimiento(grafo, origen, destino, linea_actual):
+def calcular_costo_movimiento(grafo, origen, destino, linea_actual, perfil=None):
     estacion_destino = grafo["estaciones"][destino]
+    costos = grafo["costos"] if perfil is None else perfil
     
-    # costo modificado del grafo
-    costo = grafo["costos"]["estacion_normal"]
+    # costo modificado por el perfil
+    costo = costos["estacion_normal"]
     
     # penalizacion por transbordo
     if estacion_destino["es_transbordo"] and linea_actual not in estacion_destino["lineas"]:
-        costo = costo + grafo["costos"]["transbordo"]
+        costo = costo + costos["transbordo"]
     
     return costo
 
@@ -51,9 +70,150 @@ def heuristica_euclidiana(grafo, origen, destino):
     return ((coord_o[0] - coord_d[0])**2 + (coord_o[1] - coord_d[1])**2)**0.5
 
 
+# INSTRUMENTACION
+# Opcional y desactivada por defecto: los motores solo revisan si hay un
+# sumidero. Activada, cada busqueda mide sus fases con perf_counter_ns y manda
+# un registro al sumidero; los contadores que no salen gratis del bucle
+# (relajaciones, penalizaciones) se calculan despues, sobre los estados cerrados,
+# con el reloj ya detenido. Sin ruta no hay fase de reconstruccion.
+#   {"tipo": "busqueda", "motor": ..., "fases_ns": {...}, "contadores": {...}}
+# Motores: a_star, a_star_compilado, a_star_bidireccional, ruta_jerarquica,
+# rutas_pareto y a_star_dependiente_tiempo; cada uno manda los contadores que
+# tienen sentido para el (RAPTOR cuenta rondas y patrones, no el monticulo).
+#   {"tipo": "fase", "fase": "inferencia" | "construccion", "ns": ...}
+
+sumidero_metricas = None
+
+def activar_instrumentacion(sumidero):
+    # sumidero: funcion que recibe cada registro
+    global sumidero_metricas
+    sumidero_metricas = sumidero
+
+def desactivar_instrumentacion():
+    global sumidero_metricas
+    sumidero_metricas = None
+
+def emitir_metricas(registro):
+    sumidero = sumidero_metricas
+    if sumidero is not None:
+        sumidero(registro)
+
+def emitir_fase(fase, ns):
+    emitir_metricas({"tipo": "fase", "fase": fase, "ns": ns})
+
+def crear_agregador_metricas():
+    return {
+        "fases": {},        # fase -> {"cuenta", "total_ns", "max_ns"}
+        "contadores": {},   # contador -> total
+        "busquedas": {},    # motor -> numero de busquedas
+        "candado": threading.Lock()
+    }
+
+def agregar_registro(agregado, registro):
+    with agregado["candado"]:
+        if registro["tipo"] == "fase":
+            fases = {registro["fase"]: registro["ns"]}
+        else:
+            fases = registro["fases_ns"]
+            motor = registro["motor"]
+            agregado["busquedas"][motor] = agregado["busquedas"].get(motor, 0) + 1
+            for nombre, valor in registro["contadores"].items():
+                agregado["contadores"][nombre] = agregado["contadores"].get(nombre, 0) + valor
+        for fase, ns in fases.items():
+            datos = agregado["fases"].setdefault(fase, {"cuenta": 0, "total_ns": 0, "max_ns": 0})
+            datos["cuenta"] += 1
+            datos["total_ns"] += ns
+            datos["max_ns"] = max(datos["max_ns"], ns)
+
+def sumidero_agregador(agregado):
+    return lambda registro: agregar_registro(agregado, registro)
+
+def sumidero_log(logger=None):
+    # una linea por registro en el modulo logging
+    import logging
+    
+    if logger is None:
+        logger = logging.getLogger("metro_cdmx.metricas")
+    
+    def sumidero(registro):
+        if registro["tipo"] == "fase":
+            logger.info("fase=%s ns=%d", registro["fase"], registro["ns"])
+        else:
+            campos = " ".join(f"{k}={v}" for k, v in registro["fases_ns"].items())
+            contadores = " ".join(f"{k}={v}" for k, v in registro["contadores"].items())
+            logger.info("motor=%s %s %s", registro["motor"], campos, contadores)
+    return sumidero
+
+def exportar_prometheus(agregado):
+    # texto en formato de exposicion de Prometheus
+    with agregado["candado"]:
+        lineas = ["# TYPE metro_fase_segundos summary"]
+        for fase, datos in agregado["fases"].items():
+            lineas.append(f'metro_fase_segundos_sum{{fase="{fase}"}} {datos["total_ns"] / 1e9:.9f}')
+            lineas.append(f'metro_fase_segundos_count{{fase="{fase}"}} {datos["cuenta"]}')
+        lineas.append("# TYPE metro_fase_max_segundos gauge")
+        for fase, datos in agregado["fases"].items():
+            lineas.append(f'metro_fase_max_segundos{{fase="{fase}"}} {datos["max_ns"] / 1e9:.9f}')
+        lineas.append("# TYPE metro_busquedas_total counter")
+        for motor, cuenta in agregado["busquedas"].items():
+            lineas.append(f'metro_busquedas_total{{motor="{motor}"}} {cuenta}')
+        lineas.append("# TYPE metro_busqueda_eventos_total counter")
+        for nombre, total in agregado["contadores"].items():
+            lineas.append(f'metro_busqueda_eventos_total{{evento="{nombre}"}} {total}')
+    return "\n".join(lineas) + "\n"
+
+def sumidero_prometheus(ruta_archivo, cada=100, agregado=None):
+    # agrega en memoria y reescribe el archivo (textfile collector) cada N registros
+    import os
+    
+    if agregado is None:
+        agregado = crear_agregador_metricas()
+    pendientes = [0]
+    
+    def sumidero(registro):
+        agregar_registro(agregado, registro)
+        pendientes[0] += 1
+        if pendientes[0] >= cada:
+            pendientes[0] = 0
+            temporal = ruta_archivo + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as archivo:
+                archivo.write(exportar_prometheus(agregado))
+            os.replace(temporal, ruta_archivo)
+    return sumidero
+
+def reportar_busqueda(motor, inicio_ns, reconstruccion_ns, fin_ns, contadores):
+    # reconstruccion_ns None: no hubo ruta que reconstruir
+    if reconstruccion_ns is None:
+        fases = {"busqueda": fin_ns - inicio_ns}
+    else:
+        fases = {"busqueda": reconstruccion_ns - inicio_ns, "reconstruccion": fin_ns - reconstruccion_ns}
+    emitir_metricas({"tipo": "busqueda", "motor": motor, "fases_ns": fases, "contadores": contadores})
+
+def contadores_busqueda(extracciones_obsoletas, inserciones, nodos_explorados,
+                        evaluaciones_heuristica, relajaciones, penalizaciones):
+    return {
+        "inserciones_heap": inserciones,
+        "extracciones_heap": nodos_explorados + extracciones_obsoletas,
+        "extracciones_obsoletas": extracciones_obsoletas,
+        "relajaciones": relajaciones,
+        "evaluaciones_heuristica": evaluaciones_heuristica,
+        "penalizaciones_transbordo": penalizaciones
+    }
+
+
 # A*
 
-def a_star(grafo, inicio, destino, linea_inicial=None):
+def reconstruir_camino(padres, estado_final):
+    # seguir los apuntadores al padre desde el estado final
+    camino = []
+    estado = estado_final
+    while estado is not None:
+        camino.append(estado[0])
+        estado = padres[estado]
+    camino.reverse()
+    return camino
+
+def a_star(grafo, inicio, destino, linea_inicial=None, perfil=None):
     # Validar que las estaciones existan
     if inicio not in grafo["estaciones"] or destino not in grafo["estaciones"]:
         return None, {"error": "Estacion no encontrada"}
@@ -63,53 +223,49 @@ def a_star(grafo, inicio, destino, linea_inicial=None):
         linea_inicial = grafo["estaciones"][inicio]["lineas"][0]
     
     start_time = time.time()
+    medir = sumidero_metricas is not None
+    if medir:
+        inicio_ns = time.perf_counter_ns()
     
-    # LISTA ABIERTA [f_cost, g_cost, estacion, linea, camino]
-    open_list = []
+    # LISTA ABIERTA (monticulo) [f_cost, contador, g_cost, estado, estado_padre]
+    # el contador desempata en orden de insercion, igual que la lista original
+    contador = 0
+    estado_inicial = (inicio, linea_inicial)
     h_inicial = heuristica_euclidiana(grafo, inicio, destino)
-    nodo_inicial = [h_inicial, 0.0, inicio, linea_inicial, [inicio]]
-    open_list = open_list + [nodo_inicial]
+    open_list = [(h_inicial, contador, 0.0, estado_inicial, None)]
     
     # guardar el mejor g_cost para cada estado
     g_costs = {}
-    g_costs[(inicio, linea_inicial)] = 0.0
+    g_costs[estado_inicial] = 0.0
     
-    # LISTA DE VISITADOS
-    visitados = []
+    # VISITADOS: estado -> padre con el que se cerro (conjunto + apuntadores)
+    padres = {}
     nodos_explorados = 0
+    obsoletas = 0
     
     # BUCLE PRINCIPAL
-    while len(open_list) > 0:
+    while open_list:
         # nodo con menor f_cost
-        indice_mejor = 0
-        for i in range(len(open_list)):
-            if open_list[i][0] < open_list[indice_mejor][0]:
-                indice_mejor = i
-        
-        # mejor nodo de la lista
-        nodo_actual = open_list[indice_mejor]
-        open_list = open_list[:indice_mejor] + open_list[indice_mejor+1:]
+        f_cost, _, g_cost, estado, padre = heapq.heappop(open_list)
         
-        # informacion del nodo
-        f_cost = nodo_actual[0]
-        g_cost = nodo_actual[1]
-        estacion_actual = nodo_actual[2]
-        linea_actual = nodo_actual[3]
-        camino = nodo_actual[4]
-        
-        # Crear tupla del estado
-        estado = (estacion_actual, linea_actual)
-        
-        # Si ya visitamos este estado, saltar
-        if estado in visitados:
+        # Si ya visitamos este estado, saltar (borrado perezoso)
+        if estado in padres:
+            obsoletas = obsoletas + 1
             continue
         
         # Marcar como visitado
-        visitados = visitados + [estado]
+        padres[estado] = padre
         nodos_explorados = nodos_explorados + 1
+        estacion_actual, linea_actual = estado
         
         # ¿LLEGAMOS AL DESTINO?
         if estacion_actual == destino:
+            if medir:
+                reconstruccion_ns = time.perf_counter_ns()
+            camino = reconstruir_camino(padres, estado)
+            if medir:
+                reportar_a_star(grafo, perfil, padres, estado, inicio_ns, reconstruccion_ns,
+                                time.perf_counter_ns(), contador, obsoletas, nodos_explorados)
             tiempo_total = time.time() - start_time
             estadisticas = {
                 "ruta": camino,
@@ -122,15 +278,10 @@ def a_star(grafo, inicio, destino, linea_inicial=None):
             return camino, estadisticas
         
         # EXPLORAR VECINOS
-        vecinos = obtener_vecinos(grafo, estacion_actual)
-        for i in range(len(vecinos)):
-            vecino = vecinos[i][0]
-            tiempo_minutos = vecinos[i][1]
-            linea_conexion = vecinos[i][2]
-            
+        for vecino, tiempo_minutos, linea_conexion in obtener_vecinos(grafo, estacion_actual):
             # Calcular costo del movimiento
             costo_movimiento = calcular_costo_movimiento(
-                grafo, estacion_actual, vecino, linea_actual
+                grafo, estacion_actual, vecino, linea_actual, perfil
             )
             nuevo_g = g_cost + costo_movimiento
             
@@ -138,28 +289,21 @@ def a_star(grafo, inicio, destino, linea_inicial=None):
             estado_vecino = (vecino, linea_conexion)
             
             # ¿Es un camino mejor?
-            es_mejor = False
-            if estado_vecino not in g_costs:
-                es_mejor = True
-            elif nuevo_g < g_costs[estado_vecino]:
-                es_mejor = True
-            
-            if es_mejor:
+            if estado_vecino not in g_costs or nuevo_g < g_costs[estado_vecino]:
                 # Actualizar costo
                 g_costs[estado_vecino] = nuevo_g
                 
                 # Calcular heuristica y f_cost
                 h_cost = heuristica_euclidiana(grafo, vecino, destino)
-                f_cost = nuevo_g + h_cost
                 
-                # Crear nuevo camino
-                nuevo_camino = camino + [vecino]
-                
-                # Agregar a la lista abierta
-                nuevo_nodo = [f_cost, nuevo_g, vecino, linea_conexion, nuevo_camino]
-                open_list = open_list + [nuevo_nodo]
+                # Agregar al monticulo; el camino se reconstruye con los padres
+                contador = contador + 1
+                heapq.heappush(open_list, (nuevo_g + h_cost, contador, nuevo_g, estado_vecino, estado))
     
     # No se encontro ruta
+    if medir:
+        reportar_a_star(grafo, perfil, padres, None, inicio_ns, None, time.perf_counter_ns(),
+                        contador, obsoletas, nodos_explorados)
     tiempo_total = time.time() - start_time
     return None, {
         "error": "No se encontro ruta",
@@ -168,6 +312,1805 @@ def a_star(grafo, inicio, destino, linea_inicial=None):
     }
 
 
+def reportar_a_star(grafo, perfil, padres, estado_final, inicio_ns, reconstruccion_ns, fin_ns,
+                    contador, obsoletas, nodos_explorados):
+    # contadores de a_star calculados sobre los estados cerrados (solo con instrumentacion)
+    relajaciones = 0
+    penalizaciones = 0
+    costos = grafo["costos"] if perfil is None else perfil
+    for estacion, linea in padres:
+        if (estacion, linea) == estado_final:
+            continue
+        for vecino, _, _ in obtener_vecinos(grafo, estacion):
+            relajaciones = relajaciones + 1
+            if calcular_costo_movimiento(grafo, estacion, vecino, linea, costos) > costos["estacion_normal"]:
+                penalizaciones = penalizaciones + 1
+    reportar_busqueda("a_star", inicio_ns, reconstruccion_ns, fin_ns,
+                      contadores_busqueda(obsoletas, contador + 1, nodos_explorados,
+                                          contador + 1, relajaciones, penalizaciones))
+
+
+# GRAFO COMPILADO (CSR)
+# Las estaciones y lineas se internan como enteros y todo vive en arreglos planos:
+#   estaciones: x, y, es_transbordo, lineas (lineas_offsets/lineas_ids)
+#   adyacencia: ady_offsets, ady_destino, ady_tiempo, ady_linea
+#   estados (estacion, linea): estado_offsets por estacion, estado_estacion, estado_linea
+#   arcos entre estados: arco_offsets por estado, arco_destino (estado), arco_penaliza
+# arco_penaliza guarda la misma regla de calcular_costo_movimiento, asi el costo
+# de un arco es perfil["estacion_normal"] + arco_penaliza * perfil["transbordo"].
+
+def compilar_grafo(grafo):
+    nombres = list(grafo["estaciones"])
+    indice = {nombre: i for i, nombre in enumerate(nombres)}
+    
+    # internar lineas (las de las estaciones y las de las conexiones)
+    lineas = []
+    indice_linea = {}
+    for nombre in nombres:
+        for linea in grafo["estaciones"][nombre]["lineas"]:
+            if linea not in indice_linea:
+                indice_linea[linea] = len(lineas)
+                lineas.append(linea)
+    for nombre in nombres:
+        for _, _, linea in obtener_vecinos(grafo, nombre):
+            if linea not in indice_linea:
+                indice_linea[linea] = len(lineas)
+                lineas.append(linea)
+    
+    # estaciones
+    x = array("d")
+    y = array("d")
+    es_transbordo = array("b")
+    lineas_offsets = array("i", [0])
+    lineas_ids = array("i")
+    for nombre in nombres:
+        estacion = grafo["estaciones"][nombre]
+        x.append(estacion["coords"][0])
+        y.append(estacion["coords"][1])
+        es_transbordo.append(1 if estacion["es_transbordo"] else 0)
+        for linea in estacion["lineas"]:
+            lineas_ids.append(indice_linea[linea])
+        lineas_offsets.append(len(lineas_ids))
+    
+    # adyacencia por estacion
+    ady_offsets = array("i", [0])
+    ady_destino = array("i")
+    ady_tiempo = array("d")
+    ady_linea = array("i")
+    for nombre in nombres:
+        for vecino, tiempo_min, linea in obtener_vecinos(grafo, nombre):
+            ady_destino.append(indice[vecino])
+            ady_tiempo.append(tiempo_min)
+            ady_linea.append(indice_linea[linea])
+        ady_offsets.append(len(ady_destino))
+    
+    # estados: lineas de la estacion mas las lineas con las que se llega a ella
+    estado_offsets = array("i", [0])
+    estado_estacion = array("i")
+    estado_linea = array("i")
+    for e in range(len(nombres)):
+        propias = list(lineas_ids[lineas_offsets[e]:lineas_offsets[e + 1]])
+        for a in range(ady_offsets[e], ady_offsets[e + 1]):
+            v = ady_destino[a]
+            for a2 in range(ady_offsets[v], ady_offsets[v + 1]):
+                if ady_destino[a2] == e and ady_linea[a2] not in propias:
+                    propias.append(ady_linea[a2])
+        for linea in propias:
+            estado_estacion.append(e)
+            estado_linea.append(linea)
+        estado_offsets.append(len(estado_estacion))
+    
+    comp = {
+        "nombres": nombres,
+        "indice": indice,
+        "lineas": lineas,
+        "indice_linea": indice_linea,
+        "x": x,
+        "y": y,
+        "es_transbordo": es_transbordo,
+        "lineas_offsets": lineas_offsets,
+        "lineas_ids": lineas_ids,
+        "ady_offsets": ady_offsets,
+        "ady_destino": ady_destino,
+        "ady_tiempo": ady_tiempo,
+        "ady_linea": ady_linea,
+        "estado_offsets": estado_offsets,
+        "estado_estacion": estado_estacion,
+        "estado_linea": estado_linea,
+        "costos": grafo["costos"],
+        "pesos": {}
+    }
+    
+    # arcos entre estados, en el mismo orden que obtener_vecinos
+    arco_offsets = array("i", [0])
+    arco_destino = array("i")
+    arco_penaliza = array("b")
+    for s in range(len(estado_estacion)):
+        e = estado_estacion[s]
+        linea_actual = estado_linea[s]
+        for a in range(ady_offsets[e], ady_offsets[e + 1]):
+            v = ady_destino[a]
+            arco_destino.append(estado_de(comp, v, ady_linea[a]))
+            en_linea = linea_actual in lineas_ids[lineas_offsets[v]:lineas_offsets[v + 1]]
+            arco_penaliza.append(1 if es_transbordo[v] and not en_linea else 0)
+        arco_offsets.append(len(arco_destino))
+    comp["arco_offsets"] = arco_offsets
+    comp["arco_destino"] = arco_destino
+    comp["arco_penaliza"] = arco_penaliza
+    
+    # arcos invertidos (para busquedas hacia atras): por estado destino,
+    # el estado de origen y el id del arco original (para su peso)
+    num_estados = len(estado_estacion)
+    inv_offsets = array("i", [0]) * (num_estados + 1)
+    for t in arco_destino:
+        inv_offsets[t + 1] += 1
+    for t in range(num_estados):
+        inv_offsets[t + 1] += inv_offsets[t]
+    inv_origen = array("i", [0]) * len(arco_destino)
+    inv_arco = array("i", [0]) * len(arco_destino)
+    siguiente = array("i", inv_offsets[:num_estados])
+    for s in range(num_estados):
+        for a in range(arco_offsets[s], arco_offsets[s + 1]):
+            t = arco_destino[a]
+            inv_origen[siguiente[t]] = s
+            inv_arco[siguiente[t]] = a
+            siguiente[t] += 1
+    comp["inv_offsets"] = inv_offsets
+    comp["inv_origen"] = inv_origen
+    comp["inv_arco"] = inv_arco
+    return comp
+
+def estado_de(comp, estacion, linea):
+    # estado de (estacion, linea) con ids internos, -1 si no existe
+    for s in range(comp["estado_offsets"][estacion], comp["estado_offsets"][estacion + 1]):
+        if comp["estado_linea"][s] == linea:
+            return s
+    return -1
+
+def estado_inicial_compilado(comp, inicio, linea_inicial=None):
+    # estado de salida a partir del nombre de la estacion y la linea (como en a_star)
+    e = comp["indice"][inicio]
+    if linea_inicial is None:
+        return comp["estado_offsets"][e]
+    if linea_inicial not in comp["indice_linea"]:
+        return -1
+    return estado_de(comp, e, comp["indice_linea"][linea_inicial])
+
+def pesos_arcos(comp, perfil=None):
+    # costo de cada arco para un perfil; se guarda por valor de los costos
+    # (con cierres o arcos lentos se multiplica por su factor, ver CIERRES)
+    if perfil is None:
+        perfil = comp["costos"]
+    clave = (perfil["estacion_normal"], perfil["transbordo"])
+    pesos = comp["pesos"].get(clave)
+    if pesos is None:
+        normal, transbordo = clave
+        pesos = array("d", [normal + transbordo if p else normal for p in comp["arco_penaliza"]])
+        if "factor_arco" in comp:
+            pesos = array("d", [w * f for w, f in zip(pesos, comp["factor_arco"])])
+        comp["pesos"][clave] = pesos
+    return pesos
+
+def reconstruir_camino_compilado(comp, padres, estado_final):
+    camino = []
+    s = estado_final
+    while s != -1:
+        camino.append(comp["nombres"][comp["estado_estacion"][s]])
+        s = padres[s]
+    camino.reverse()
+    return camino
+
+def reportar_a_star_compilado(comp, padres, estado_final, evaluaciones_heuristica, inicio_ns,
+                              reconstruccion_ns, fin_ns, contador, obsoletas, nodos_explorados,
+                              motor="a_star_compilado"):
+    relajaciones = 0
+    penalizaciones = 0
+    arco_offsets = comp["arco_offsets"]
+    arco_penaliza = comp["arco_penaliza"]
+    for s in padres:
+        if s == estado_final:
+            continue
+        relajaciones = relajaciones + arco_offsets[s + 1] - arco_offsets[s]
+        penalizaciones = penalizaciones + sum(arco_penaliza[arco_offsets[s]:arco_offsets[s + 1]])
+    reportar_busqueda(motor, inicio_ns, reconstruccion_ns, fin_ns,
+                      contadores_busqueda(obsoletas, contador + 1, nodos_explorados,
+                                          evaluaciones_heuristica, relajaciones, penalizaciones))
+
+def a_star_compilado(comp, inicio, destino, linea_inicial=None, perfil=None, heuristica=None,
+                     bidireccional=False):
+    # Mismo contrato que a_star pero sobre el grafo compilado
+    # heuristica: ver HEURISTICAS (por defecto la calibrada, que es admisible)
+    # bidireccional: usar a_star_bidireccional (ver A* BIDIRECCIONAL)
+    if bidireccional:
+        return a_star_bidireccional(comp, inicio, destino, linea_inicial, perfil, heuristica)
+    if inicio not in comp["indice"] or destino not in comp["indice"]:
+        return None, {"error": "Estacion no encontrada"}
+    
+    estado_inicial = estado_inicial_compilado(comp, inicio, linea_inicial)
+    if estado_inicial == -1:
+        return None, {"error": "Linea inicial no valida"}
+    
+    start_time = time.time()
+    medir = sumidero_metricas is not None
+    if medir:
+        inicio_ns = time.perf_counter_ns()
+    
+    pesos = pesos_arcos(comp, perfil)
+    estado_estacion = comp["estado_estacion"]
+    arco_offsets = comp["arco_offsets"]
+    arco_destino = comp["arco_destino"]
+    d = comp["indice"][destino]
+    if heuristica is None:
+        heuristica = heuristica_calibrada
+    h = heuristica(comp, d, perfil)
+    
+    # [f_cost, contador, g_cost, estado, estado_padre]
+    contador = 0
+    open_list = [(h(estado_inicial), contador, 0.0, estado_inicial, -1)]
+    g_costs = {estado_inicial: 0.0}
+    padres = {}
+    nodos_explorados = 0
+    obsoletas = 0
+    
+    while open_list:
+        f_cost, _, g_cost, s, padre = heapq.heappop(open_list)
+        if s in padres:
+            obsoletas = obsoletas + 1
+            continue
+        padres[s] = padre
+        nodos_explorados = nodos_explorados + 1
+        
+        if estado_estacion[s] == d:
+            if medir:
+                reconstruccion_ns = time.perf_counter_ns()
+            camino = reconstruir_camino_compilado(comp, padres, s)
+            if medir:
+                reportar_a_star_compilado(comp, padres, s, contador + 1, inicio_ns, reconstruccion_ns,
+                                          time.perf_counter_ns(), contador, obsoletas, nodos_explorados)
+            tiempo_total = time.time() - start_time
+            estadisticas = {
+                "ruta": camino,
+                "costo_total": g_cost,
+                "nodos_explorados": nodos_explorados,
+                "tiempo_segundos": tiempo_total,
+                "longitud_ruta": len(camino),
+                "eficiencia": len(camino) / nodos_explorados if nodos_explorados > 0 else 0
+            }
+            return camino, estadisticas
+        
+        for a in range(arco_offsets[s], arco_offsets[s + 1]):
+            t = arco_destino[a]
+            nuevo_g = g_cost + pesos[a]
+            if nuevo_g < g_costs.get(t, INFINITO):
+                g_costs[t] = nuevo_g
+                contador = contador + 1
+                heapq.heappush(open_list, (nuevo_g + h(t), contador, nuevo_g, t, s))
+    
+    if medir:
+        reportar_a_star_compilado(comp, padres, -1, contador + 1, inicio_ns, None, time.perf_counter_ns(),
+                                  contador, obsoletas, nodos_explorados)
+    tiempo_total = time.time() - start_time
+    return None, {
+        "error": "No se encontro ruta",
+        "nodos_explorados": nodos_explorados,
+        "tiempo_segundos": tiempo_total
+    }
+
+
+def dijkstra_compilado(comp, estado_inicial, pesos):
+    # Dijkstra de uno a todos sobre los estados; regresa distancias y padres por estado
+    return dijkstra_multiorigen(comp, [estado_inicial], pesos)
+
+def dijkstra_multiorigen(comp, estados_iniciales, pesos):
+    # igual que dijkstra_compilado pero con varios estados de salida a costo 0
+    num_estados = len(comp["estado_estacion"])
+    arco_offsets = comp["arco_offsets"]
+    arco_destino = comp["arco_destino"]
+    dist = array("d", [INFINITO]) * num_estados
+    padres = array("i", [-1]) * num_estados
+    cerrados = bytearray(num_estados)
+    heap = []
+    for estado_inicial in estados_iniciales:
+        dist[estado_inicial] = 0.0
+        heap.append((0.0, estado_inicial))
+    heapq.heapify(heap)
+    while heap:
+        g_cost, s = heapq.heappop(heap)
+        if cerrados[s]:
+            continue
+        cerrados[s] = 1
+        for a in range(arco_offsets[s], arco_offsets[s + 1]):
+            t = arco_destino[a]
+            nuevo_g = g_cost + pesos[a]
+            if nuevo_g < dist[t]:
+                dist[t] = nuevo_g
+                padres[t] = s
+                heapq.heappush(heap, (nuevo_g, t))
+    return dist, padres
+
+
+# ARBOL DE CAMINOS MINIMOS (uno a todos)
+# Un Dijkstra desde un origen sobre los estados (estacion, linea) responde
+# rutas a cualquier destino e isocronas sin volver a buscar.
+
+def arbol_caminos_minimos(comp, inicio, linea_inicial=None, perfil=None):
+    if inicio not in comp["indice"]:
+        return None, {"error": "Estacion no encontrada"}
+    estado_inicial = estado_inicial_compilado(comp, inicio, linea_inicial)
+    if estado_inicial == -1:
+        return None, {"error": "Linea inicial no valida"}
+    
+    start_time = time.time()
+    dist, padres = dijkstra_compilado(comp, estado_inicial, pesos_arcos(comp, perfil))
+    
+    mejor_estado = mejor_estado_por_estacion(comp, dist)
+    
+    arbol = {
+        "comp": comp,
+        "inicio": inicio,
+        "linea_inicial": linea_inicial,
+        "perfil": perfil,
+        "version_afectaciones": comp.get("version_afectaciones", 0),
+        "estado_inicial": estado_inicial,
+        "dist": dist,
+        "padres": padres,
+        "mejor_estado": mejor_estado
+    }
+    return arbol, {
+        "nodos_explorados": sum(1 for d in dist if d < INFINITO),
+        "tiempo_segundos": time.time() - start_time
+    }
+
+def mejor_estado_por_estacion(comp, dist):
+    # estado con el que se llega mas barato a cada estacion, -1 si a ninguno
+    # (el primero si empatan)
+    estado_offsets = comp["estado_offsets"]
+    mejor_estado = array("i")
+    for e in range(len(comp["nombres"])):
+        mejor = -1
+        for s in range(estado_offsets[e], estado_offsets[e + 1]):
+            if dist[s] < INFINITO and (mejor == -1 or dist[s] < dist[mejor]):
+                mejor = s
+        mejor_estado.append(mejor)
+    return mejor_estado
+
+def tiempo_en_arbol(arbol, destino):
+    actualizar_arbol(arbol)
+    s = arbol["mejor_estado"][arbol["comp"]["indice"][destino]]
+    return arbol["dist"][s] if s != -1 else INFINITO
+
+def ruta_en_arbol(arbol, destino):
+    # mismo contrato que a_star, sin busqueda adicional
+    comp = arbol["comp"]
+    if destino not in comp["indice"]:
+        return None, {"error": "Estacion no encontrada"}
+    actualizar_arbol(arbol)
+    s = arbol["mejor_estado"][comp["indice"][destino]]
+    if s == -1:
+        return None, {"error": "No se encontro ruta", "nodos_explorados": 0, "tiempo_segundos": 0.0}
+    camino = reconstruir_camino_compilado(comp, arbol["padres"], s)
+    return camino, {
+        "ruta": camino,
+        "costo_total": arbol["dist"][s],
+        "nodos_explorados": 0,
+        "tiempo_segundos": 0.0,
+        "longitud_ruta": len(camino),
+        "eficiencia": 0
+    }
+
+def isocrona(arbol, presupuesto_min):
+    # estaciones alcanzables dentro del presupuesto, de la mas cercana a la mas lejana
+    actualizar_arbol(arbol)
+    alcanzables = []
+    for e, s in enumerate(arbol["mejor_estado"]):
+        if s != -1 and arbol["dist"][s] <= presupuesto_min:
+            alcanzables.append((arbol["comp"]["nombres"][e], arbol["dist"][s]))
+    alcanzables.sort(key=lambda par: par[1])
+    return alcanzables
+
+
+# CIERRES Y AFECTACIONES
+# Sobre el grafo compilado: una estacion o una conexion se puede cerrar (costo
+# infinito) o hacer mas lenta (factor >= 1 sobre su costo). pesos_arcos aplica
+# los factores por arco; cada cambio queda en una bitacora con los arcos que
+# tocó, y los arboles y caches se ponen al dia solo donde les afecta:
+#   arboles (arbol_caminos_minimos): reparacion estilo LPA* desde los arcos
+#       cambiados, sin rehacer el Dijkstra completo
+#   cache compilada (a_star_compilado_con_cache): si todo fueron aumentos solo
+#       se descartan las rutas que pasan por un arco cambiado; una reapertura
+#       descarta todas (cualquier ruta podria mejorar)
+
+MAX_CAMBIOS = 256
+
+def id_estacion_afectada(comp, estacion):
+    if estacion not in comp["indice"]:
+        raise ValueError(f"Estacion no encontrada: {estacion}")
+    return comp["indice"][estacion]
+
+def arcos_de_estacion(comp, e):
+    # arcos que salen de o llegan a algun estado de la estacion
+    arcos = []
+    for s in range(comp["estado_offsets"][e], comp["estado_offsets"][e + 1]):
+        arcos.extend(range(comp["arco_offsets"][s], comp["arco_offsets"][s + 1]))
+        arcos.extend(comp["inv_arco"][comp["inv_offsets"][s]:comp["inv_offsets"][s + 1]])
+    return arcos
+
+def arcos_de_conexion(comp, e, v, linea):
+    # arcos de la conexion e - v en la linea dada, en ambos sentidos
+    ady_offsets = comp["ady_offsets"]
+    arcos = []
+    for origen, destino in ((e, v), (v, e)):
+        for s in range(comp["estado_offsets"][origen], comp["estado_offsets"][origen + 1]):
+            for j in range(ady_offsets[origen], ady_offsets[origen + 1]):
+                if comp["ady_destino"][j] == destino and comp["ady_linea"][j] == linea:
+                    arcos.append(comp["arco_offsets"][s] + j - ady_offsets[origen])
+    if not arcos:
+        raise ValueError(f"Conexion no encontrada: {comp['nombres'][e]} - {comp['nombres'][v]}")
+    return arcos
+
+def factor_de_tramo(afectaciones, e, v, linea):
+    # factor de ir de la estacion e a v por la linea (ids internos)
+    if afectaciones["estaciones"].get(e) == INFINITO:
+        return INFINITO
+    factor = afectaciones["estaciones"].get(v, 1.0)
+    return factor * afectaciones["conexiones"].get((min(e, v), max(e, v), linea), 1.0)
+
+def factor_de_arco(comp, a, origen):
+    # origen: estado de salida del arco a
+    t = comp["arco_destino"][a]
+    return factor_de_tramo(comp["afectaciones"], comp["estado_estacion"][origen],
+                           comp["estado_estacion"][t], comp["estado_linea"][t])
+
+def aplicar_afectacion(comp, arcos):
+    # recalcula los factores de los arcos y registra el cambio en la bitacora
+    if "factor_arco" not in comp:
+        comp["factor_arco"] = array("d", [1.0]) * len(comp["arco_destino"])
+    factores = comp["factor_arco"]
+    aumento = True
+    cambiados = []
+    for a in sorted(set(arcos)):
+        nuevo = factor_de_arco(comp, a, bisect_right(comp["arco_offsets"], a) - 1)
+        if nuevo != factores[a]:
+            if nuevo < factores[a]:
+                aumento = False
+            factores[a] = nuevo
+            cambiados.append(a)
+    if not cambiados:
+        return cambiados
+    
+    # los pesos (y lo que se guarda por pesos) se recalculan al pedirlos
+    comp["pesos"] = {}
+    comp.pop("landmarks", None)
+    comp["version_afectaciones"] = comp.get("version_afectaciones", 0) + 1
+    cambios = comp.setdefault("cambios", [])
+    cambios.append((comp["version_afectaciones"], cambiados, aumento))
+    del cambios[:-MAX_CAMBIOS]
+    return cambiados
+
+def nueva_afectacion(comp):
+    return comp.setdefault("afectaciones", {"estaciones": {}, "conexiones": {}})
+
+def cerrar_estacion(comp, estacion):
+    e = id_estacion_afectada(comp, estacion)
+    nueva_afectacion(comp)["estaciones"][e] = INFINITO
+    return aplicar_afectacion(comp, arcos_de_estacion(comp, e))
+
+def ralentizar_estacion(comp, estacion, factor):
+    # llegar a la estacion cuesta factor veces mas (aglomeracion, obras)
+    if factor < 1:
+        raise ValueError("El factor de una afectacion debe ser >= 1")
+    e = id_estacion_afectada(comp, estacion)
+    nueva_afectacion(comp)["estaciones"][e] = factor
+    return aplicar_afectacion(comp, arcos_de_estacion(comp, e))
+
+def reabrir_estacion(comp, estacion):
+    e = id_estacion_afectada(comp, estacion)
+    nueva_afectacion(comp)["estaciones"].pop(e, None)
+    return aplicar_afectacion(comp, arcos_de_estacion(comp, e))
+
+def clave_conexion(comp, origen, destino, linea):
+    e = id_estacion_afectada(comp, origen)
+    v = id_estacion_afectada(comp, destino)
+    if linea not in comp["indice_linea"]:
+        raise ValueError(f"Linea no encontrada: {linea}")
+    l = comp["indice_linea"][linea]
+    return (min(e, v), max(e, v), l), arcos_de_conexion(comp, e, v, l)
+
+def cerrar_conexion(comp, origen, destino, linea):
+    clave, arcos = clave_conexion(comp, origen, destino, linea)
+    nueva_afectacion(comp)["conexiones"][clave] = INFINITO
+    return aplicar_afectacion(comp, arcos)
+
+def ralentizar_conexion(comp, origen, destino, linea, factor):
+    if factor < 1:
+        raise ValueError("El factor de una afectacion debe ser >= 1")
+    clave, arcos = clave_conexion(comp, origen, destino, linea)
+    nueva_afectacion(comp)["conexiones"][clave] = factor
+    return aplicar_afectacion(comp, arcos)
+
+def reabrir_conexion(comp, origen, destino, linea):
+    clave, arcos = clave_conexion(comp, origen, destino, linea)
+    nueva_afectacion(comp)["conexiones"].pop(clave, None)
+    return aplicar_afectacion(comp, arcos)
+
+def afectaciones_activas(comp):
+    # {"estaciones": {nombre: factor}, "conexiones": {(origen, destino, linea): factor}}
+    afectaciones = comp.get("afectaciones", {"estaciones": {}, "conexiones": {}})
+    nombres = comp["nombres"]
+    return {
+        "estaciones": {nombres[e]: f for e, f in afectaciones["estaciones"].items()},
+        "conexiones": {(nombres[e], nombres[v], comp["lineas"][l]): f
+                       for (e, v, l), f in afectaciones["conexiones"].items()}
+    }
+
+def cambios_desde(comp, version):
+    # cambios posteriores a version; None si la bitacora ya no los tiene
+    cambios = comp.get("cambios", [])
+    actual = comp.get("version_afectaciones", 0)
+    if version == actual:
+        return []
+    if not cambios or cambios[0][0] > version + 1:
+        return None
+    return [cambio for cambio in cambios if cambio[0] > version]
+
+def reparar_arbol(arbol, arcos):
+    # LPA* sin heuristica sobre el arbol: g = dist vigente, rhs = mejor costo por
+    # los predecesores con los pesos nuevos. Solo se procesan los estados
+    # inconsistentes, que empiezan en los destinos de los arcos cambiados.
+    comp = arbol["comp"]
+    pesos = pesos_arcos(comp, arbol["perfil"])
+    g = arbol["dist"]
+    padres = arbol["padres"]
+    rhs = array("d", g)
+    inicial = arbol["estado_inicial"]
+    arco_offsets = comp["arco_offsets"]
+    arco_destino = comp["arco_destino"]
+    inv_offsets = comp["inv_offsets"]
+    inv_origen = comp["inv_origen"]
+    inv_arco = comp["inv_arco"]
+    
+    def actualizar_rhs(v):
+        if v == inicial:
+            return
+        mejor = INFINITO
+        padre = -1
+        for i in range(inv_offsets[v], inv_offsets[v + 1]):
+            costo = g[inv_origen[i]] + pesos[inv_arco[i]]
+            if costo < mejor:
+                mejor = costo
+                padre = inv_origen[i]
+        rhs[v] = mejor
+        padres[v] = padre
+    
+    heap = []
+    for v in {arco_destino[a] for a in arcos}:
+        actualizar_rhs(v)
+        if g[v] != rhs[v]:
+            heap.append((min(g[v], rhs[v]), v))
+    heapq.heapify(heap)
+    
+    tocados = set()
+    while heap:
+        clave, v = heapq.heappop(heap)
+        if g[v] == rhs[v] or clave != min(g[v], rhs[v]):
+            continue
+        tocados.add(v)
+        if g[v] > rhs[v]:
+            g[v] = rhs[v]
+        else:
+            g[v] = INFINITO
+            actualizar_rhs(v)
+            if g[v] != rhs[v]:
+                heapq.heappush(heap, (min(g[v], rhs[v]), v))
+        for a in range(arco_offsets[v], arco_offsets[v + 1]):
+            t = arco_destino[a]
+            actualizar_rhs(t)
+            if g[t] != rhs[t]:
+                heapq.heappush(heap, (min(g[t], rhs[t]), t))
+    for v in tocados:
+        if g[v] == INFINITO:
+            padres[v] = -1
+    
+    # mejor estado solo de las estaciones con algun estado tocado
+    estado_offsets = comp["estado_offsets"]
+    for e in {comp["estado_estacion"][v] for v in tocados}:
+        mejor = -1
+        for s in range(estado_offsets[e], estado_offsets[e + 1]):
+            if g[s] < INFINITO and (mejor == -1 or g[s] < g[mejor]):
+                mejor = s
+        arbol["mejor_estado"][e] = mejor
+    return len(tocados)
+
+def actualizar_arbol(arbol):
+    # aplica los cierres posteriores a la construccion del arbol
+    comp = arbol["comp"]
+    if arbol["version_afectaciones"] == comp.get("version_afectaciones", 0):
+        return 0
+    cambios = cambios_desde(comp, arbol["version_afectaciones"])
+    if cambios is None:
+        nuevo, _ = arbol_caminos_minimos(comp, arbol["inicio"], arbol["linea_inicial"], arbol["perfil"])
+        arbol.update(nuevo)
+        return len(arbol["dist"])
+    arcos = set()
+    for _, cambiados, _ in cambios:
+        arcos.update(cambiados)
+    arbol["version_afectaciones"] = comp.get("version_afectaciones", 0)
+    return reparar_arbol(arbol, arcos)
+
+
+# HEURISTICAS PARA a_star_compilado
+# Una heuristica es una funcion (comp, destino, perfil) -> h, donde destino es
+# el id interno de la estacion y h(estado) da la cota de ese estado. La cota se
+# calcula solo para los estados que la busqueda mete al monticulo, asi que
+# preparar una consulta no cuesta O(estados) (los landmarks se preparan una vez
+# por perfil, ver preparar_landmarks).
+#   heuristica_euclidiana_compilada: distancia en unidades de coords (la original,
+#       no calibrada: puede sobreestimar y dar rutas no optimas; solo si se pide)
+#   heuristica_calibrada: distancia escalada a minutos, admisible para el perfil
+#       (la de todos los motores cuando no se da heuristica)
+#   heuristica_alt: cotas con landmarks (A*, Landmarks, desigualdad del triangulo)
+#   heuristica_nula: sin guia (Dijkstra), como referencia
+#   heuristica_calibrada_vectorizada: la calibrada para lotes con destinos
+#       repetidos; con NumPy calcula la cota de todos los estados hacia el destino
+#       en una sola operacion, la guarda por destino (TAM_CACHE_DISTANCIAS) y la
+#       busqueda solo indexa la lista. Cuesta O(estados) la primera vez que se
+#       pide un destino, asi que para consultas sueltas conviene la calibrada
+# NumPy es opcional (usar_numpy = False lo apaga); sin NumPy la vectorizada es
+# la calibrada. Tambien lo usa la asignacion de demanda.
+
+NUM_LANDMARKS = 4
+TAM_CACHE_DISTANCIAS = 256
+usar_numpy = True
+
+def datos_numpy(comp):
+    # coordenadas y estacion de cada estado como arreglos de NumPy (None sin NumPy)
+    if not usar_numpy:
+        return None
+    if "numpy" not in comp:
+        try:
+            import numpy as np
+        except ImportError:
+            comp["numpy"] = None
+            return None
+        comp["numpy"] = {
+            "np": np,
+            "xy": np.column_stack((np.array(comp["x"], dtype=np.float64),
+                                   np.array(comp["y"], dtype=np.float64))),
+            "estado_estacion": np.array(comp["estado_estacion"], dtype=np.intp),
+            "distancias": OrderedDict(),  # (destino, escala) -> cota por estado (LRU)
+            "candado": threading.Lock()
+        }
+    return comp["numpy"]
+
+def distancias_estados(comp, destino, escala):
+    # distancia de la estacion de cada estado al destino por escala, como lista;
+    # vectorizada y guardada por destino. None sin NumPy
+    datos = datos_numpy(comp)
+    if datos is None:
+        return None
+    clave = (destino, escala)
+    cache = datos["distancias"]
+    with datos["candado"]:
+        distancias = cache.get(clave)
+        if distancias is not None:
+            cache.move_to_end(clave)
+            return distancias
+    np = datos["np"]
+    delta = datos["xy"] - datos["xy"][destino]
+    distancias = (np.sqrt((delta * delta).sum(axis=1)) * escala)[datos["estado_estacion"]].tolist()
+    with datos["candado"]:
+        cache[clave] = distancias
+        if len(cache) > TAM_CACHE_DISTANCIAS:
+            cache.popitem(last=False)
+    return distancias
+
+def cota_nula(s):
+    return 0.0
+
+def heuristica_nula(comp, destino, perfil):
+    return cota_nula
+
+def heuristica_distancia(comp, destino, escala):
+    # distancia de la estacion de cada estado al destino por escala
+    x = comp["x"]
+    y = comp["y"]
+    estado_estacion = comp["estado_estacion"]
+    xd = x[destino]
+    yd = y[destino]
+    
+    def h(s):
+        e = estado_estacion[s]
+        return ((x[e] - xd)**2 + (y[e] - yd)**2)**0.5 * escala
+    return h
+
+def heuristica_euclidiana_compilada(comp, destino, perfil):
+    return heuristica_distancia(comp, destino, 1.0)
+
+def longitud_max_arista(comp):
+    if "longitud_max_arista" not in comp:
+        x = comp["x"]
+        y = comp["y"]
+        maxima = 0.0
+        for e in range(len(x)):
+            for a in range(comp["ady_offsets"][e], comp["ady_offsets"][e + 1]):
+                v = comp["ady_destino"][a]
+                maxima = max(maxima, ((x[e] - x[v])**2 + (y[e] - y[v])**2)**0.5)
+        comp["longitud_max_arista"] = maxima
+    return comp["longitud_max_arista"]
+
+def escala_calibrada(comp, perfil):
+    # cada movimiento cuesta al menos estacion_normal y avanza a lo mas la arista
+    # mas larga, asi que distancia * estacion_normal / arista_max nunca sobreestima
+    if perfil is None:
+        perfil = comp["costos"]
+    maxima = longitud_max_arista(comp)
+    return perfil["estacion_normal"] / maxima if maxima > 0 else 0.0
+
+def heuristica_calibrada(comp, destino, perfil):
+    return heuristica_distancia(comp, destino, escala_calibrada(comp, perfil))
+
+def heuristica_calibrada_vectorizada(comp, destino, perfil):
+    escala = escala_calibrada(comp, perfil)
+    distancias = distancias_estados(comp, destino, escala)
+    if distancias is None:
+        return heuristica_distancia(comp, destino, escala)
+    return distancias.__getitem__
+
+def preparar_landmarks(comp, perfil=None, num_landmarks=NUM_LANDMARKS):
+    # distancias desde cada landmark a todos los estados; se guardan por perfil
+    pesos = pesos_arcos(comp, perfil)
+    clave = (id(pesos), num_landmarks)
+    cache = comp.setdefault("landmarks", {})
+    if clave in cache and cache[clave]["pesos"] is pesos:
+        return cache[clave]
+    
+    estado_offsets = comp["estado_offsets"]
+    num_estaciones = len(comp["nombres"])
+    landmarks = []
+    tablas = []
+    cercania = [INFINITO] * num_estaciones  # distancia al landmark mas cercano
+    siguiente = 0
+    while len(landmarks) < min(num_landmarks, num_estaciones):
+        # seleccion del mas lejano: el siguiente landmark es la estacion peor cubierta
+        landmarks.append(siguiente)
+        dist, _ = dijkstra_multiorigen(
+            comp, range(estado_offsets[siguiente], estado_offsets[siguiente + 1]), pesos)
+        por_estacion = array("d", [min(dist[estado_offsets[e]:estado_offsets[e + 1]], default=INFINITO)
+                                   for e in range(num_estaciones)])
+        tablas.append((dist, por_estacion))
+        mejor = -1
+        for e in range(num_estaciones):
+            cercania[e] = min(cercania[e], por_estacion[e])
+            if e not in landmarks and cercania[e] < INFINITO and (mejor == -1 or cercania[e] > cercania[mejor]):
+                mejor = e
+        if mejor == -1:
+            break
+        siguiente = mejor
+    
+    preparados = {"pesos": pesos, "landmarks": landmarks, "tablas": tablas}
+    cache[clave] = preparados
+    return preparados
+
+def heuristica_alt(comp, destino, perfil):
+    # d(s, destino) >= d(L, destino) - d(L, s) para cada landmark L
+    preparados = preparar_landmarks(comp, perfil)
+    cotas = [(por_estacion[destino], dist) for dist, por_estacion in preparados["tablas"]
+             if por_estacion[destino] < INFINITO]
+    if not cotas:
+        return cota_nula
+    
+    def h(s):
+        mejor = 0.0
+        for hasta_destino, dist in cotas:
+            cota = hasta_destino - dist[s]
+            if cota > mejor:
+                mejor = cota
+        return mejor
+    return h
+
+def comparar_heuristicas(comp, perfil=None, pares=None):
+    # nodos explorados y rutas no optimas de cada heuristica contra Dijkstra
+    if pares is None:
+        pares = [(o, d) for o in comp["nombres"] for d in comp["nombres"] if o != d]
+    heuristicas = {
+        "nula": heuristica_nula,
+        "euclidiana": heuristica_euclidiana_compilada,
+        "calibrada": heuristica_calibrada,
+        "alt": heuristica_alt
+    }
+    optimos = {}
+    reporte = {}
+    for nombre, heuristica in heuristicas.items():
+        nodos = 0
+        suboptimas = 0
+        start_time = time.time()
+        for inicio, destino in pares:
+            camino, estadisticas = a_star_compilado(comp, inicio, destino, perfil=perfil, heuristica=heuristica)
+            nodos = nodos + estadisticas.get("nodos_explorados", 0)
+            costo = estadisticas.get("costo_total", INFINITO)
+            if nombre == "nula":
+                optimos[(inicio, destino)] = costo
+            elif costo > optimos[(inicio, destino)] + 1e-9:
+                suboptimas = suboptimas + 1
+        reporte[nombre] = {
+            "nodos_explorados": nodos,
+            "reduccion_nodos": 1 - nodos / reporte["nula"]["nodos_explorados"] if reporte else 0.0,
+            "rutas_suboptimas": suboptimas,
+            "tiempo_segundos": time.time() - start_time
+        }
+    return reporte
+
+
+# A* BIDIRECCIONAL
+# Frente hacia adelante desde el estado inicial y frente hacia atras (arcos
+# invertidos) desde todos los estados de la estacion destino. Cada arco
+# invertido conserva su peso, incluida la penalizacion de transbordo que
+# depende de la linea del estado de origen, asi que ambos frentes ven los
+# mismos costos. Se usan potenciales promedio pf = (h_destino - h_origen) / 2
+# para que las dos busquedas sean consistentes; la busqueda termina cuando
+# tope_adelante + tope_atras >= mejor costo encontrado.
+
+def a_star_bidireccional(comp, inicio, destino, linea_inicial=None, perfil=None, heuristica=None):
+    # heuristica: cota por estacion valida en ambos sentidos (calibrada o nula)
+    if inicio not in comp["indice"] or destino not in comp["indice"]:
+        return None, {"error": "Estacion no encontrada"}
+    
+    estado_inicial = estado_inicial_compilado(comp, inicio, linea_inicial)
+    if estado_inicial == -1:
+        return None, {"error": "Linea inicial no valida"}
+    
+    start_time = time.time()
+    medir = sumidero_metricas is not None
+    if medir:
+        inicio_ns = time.perf_counter_ns()
+    
+    if heuristica is None:
+        heuristica = heuristica_calibrada
+    pesos = pesos_arcos(comp, perfil)
+    estado_estacion = comp["estado_estacion"]
+    arco_offsets = comp["arco_offsets"]
+    arco_destino = comp["arco_destino"]
+    inv_offsets = comp["inv_offsets"]
+    inv_origen = comp["inv_origen"]
+    inv_arco = comp["inv_arco"]
+    o = comp["indice"][inicio]
+    d = comp["indice"][destino]
+    h_destino = heuristica(comp, d, perfil)
+    h_origen = heuristica(comp, o, perfil)
+    
+    def pf(s):
+        return (h_destino(s) - h_origen(s)) / 2
+    
+    # g y padres de cada frente; el padre hacia atras es el siguiente estado
+    g_adelante = {estado_inicial: 0.0}
+    g_atras = {}
+    padres_adelante = {estado_inicial: -1}
+    padres_atras = {}
+    cerrados_adelante = set()
+    cerrados_atras = set()
+    heap_adelante = [(pf(estado_inicial), estado_inicial)]
+    heap_atras = []
+    for s in range(comp["estado_offsets"][d], comp["estado_offsets"][d + 1]):
+        g_atras[s] = 0.0
+        padres_atras[s] = -1
+        heap_atras.append((-pf(s), s))
+    heapq.heapify(heap_atras)
+    
+    mejor_costo = INFINITO
+    encuentro = -1
+    if estado_estacion[estado_inicial] == d:
+        mejor_costo = 0.0
+        encuentro = estado_inicial
+    nodos_explorados = 0
+    inserciones = len(heap_adelante) + len(heap_atras)
+    obsoletas = 0
+    
+    while heap_adelante and heap_atras:
+        if heap_adelante[0][0] + heap_atras[0][0] >= mejor_costo:
+            break
+        
+        # expandir el frente con menor tope
+        if heap_adelante[0][0] <= heap_atras[0][0]:
+            _, s = heapq.heappop(heap_adelante)
+            if s in cerrados_adelante:
+                obsoletas = obsoletas + 1
+                continue
+            cerrados_adelante.add(s)
+            nodos_explorados = nodos_explorados + 1
+            g_s = g_adelante[s]
+            for a in range(arco_offsets[s], arco_offsets[s + 1]):
+                t = arco_destino[a]
+                nuevo_g = g_s + pesos[a]
+                if nuevo_g < g_adelante.get(t, INFINITO):
+                    g_adelante[t] = nuevo_g
+                    padres_adelante[t] = s
+                    heapq.heappush(heap_adelante, (nuevo_g + pf(t), t))
+                    inserciones = inserciones + 1
+                    if t in g_atras and nuevo_g + g_atras[t] < mejor_costo:
+                        mejor_costo = nuevo_g + g_atras[t]
+                        encuentro = t
+        else:
+            _, s = heapq.heappop(heap_atras)
+            if s in cerrados_atras:
+                obsoletas = obsoletas + 1
+                continue
+            cerrados_atras.add(s)
+            nodos_explorados = nodos_explorados + 1
+            g_s = g_atras[s]
+            for i in range(inv_offsets[s], inv_offsets[s + 1]):
+                t = inv_origen[i]
+                nuevo_g = g_s + pesos[inv_arco[i]]
+                if nuevo_g < g_atras.get(t, INFINITO):
+                    g_atras[t] = nuevo_g
+                    padres_atras[t] = s
+                    heapq.heappush(heap_atras, (nuevo_g - pf(t), t))
+                    inserciones = inserciones + 1
+                    if t in g_adelante and g_adelante[t] + nuevo_g < mejor_costo:
+                        mejor_costo = g_adelante[t] + nuevo_g
+                        encuentro = t
+    
+    if encuentro == -1:
+        if medir:
+            reportar_bidireccional(comp, cerrados_adelante, cerrados_atras, inicio_ns, None,
+                                   time.perf_counter_ns(), inserciones, obsoletas, nodos_explorados)
+        return None, {
+            "error": "No se encontro ruta",
+            "nodos_explorados": nodos_explorados,
+            "tiempo_segundos": time.time() - start_time
+        }
+    
+    if medir:
+        reconstruccion_ns = time.perf_counter_ns()
+    camino = reconstruir_camino_compilado(comp, padres_adelante, encuentro)
+    s = padres_atras[encuentro]
+    while s != -1:
+        camino.append(comp["nombres"][estado_estacion[s]])
+        s = padres_atras[s]
+    if medir:
+        reportar_bidireccional(comp, cerrados_adelante, cerrados_atras, inicio_ns, reconstruccion_ns,
+                               time.perf_counter_ns(), inserciones, obsoletas, nodos_explorados)
+    tiempo_total = time.time() - start_time
+    return camino, {
+        "ruta": camino,
+        "costo_total": mejor_costo,
+        "nodos_explorados": nodos_explorados,
+        "tiempo_segundos": tiempo_total,
+        "longitud_ruta": len(camino),
+        "eficiencia": len(camino) / nodos_explorados if nodos_explorados > 0 else 0
+    }
+
+def reportar_bidireccional(comp, cerrados_adelante, cerrados_atras, inicio_ns, reconstruccion_ns, fin_ns,
+                           inserciones, obsoletas, nodos_explorados):
+    # relajaciones de los dos frentes; cada insercion evalua dos heuristicas (pf)
+    arco_offsets = comp["arco_offsets"]
+    inv_offsets = comp["inv_offsets"]
+    inv_arco = comp["inv_arco"]
+    arco_penaliza = comp["arco_penaliza"]
+    relajaciones = 0
+    penalizaciones = 0
+    for s in cerrados_adelante:
+        relajaciones = relajaciones + arco_offsets[s + 1] - arco_offsets[s]
+        penalizaciones = penalizaciones + sum(arco_penaliza[arco_offsets[s]:arco_offsets[s + 1]])
+    for s in cerrados_atras:
+        relajaciones = relajaciones + inv_offsets[s + 1] - inv_offsets[s]
+        penalizaciones = penalizaciones + sum(arco_penaliza[inv_arco[i]]
+                                              for i in range(inv_offsets[s], inv_offsets[s + 1]))
+    reportar_busqueda("a_star_bidireccional", inicio_ns, reconstruccion_ns, fin_ns,
+                      contadores_busqueda(obsoletas, inserciones, nodos_explorados,
+                                          2 * inserciones, relajaciones, penalizaciones))
+
+def comparar_bidireccional(comp, perfil=None, pares=None):
+    # nodos explorados y latencia: unidireccional vs bidireccional (misma heuristica)
+    if pares is None:
+        pares = [(o, d) for o in comp["nombres"] for d in comp["nombres"] if o != d]
+    reporte = {}
+    costos = {}
+    for nombre, bidireccional in (("unidireccional", False), ("bidireccional", True)):
+        nodos = 0
+        diferencias = 0
+        start_time = time.time()
+        for inicio, destino in pares:
+            camino, estadisticas = a_star_compilado(comp, inicio, destino, perfil=perfil,
+                                                    heuristica=heuristica_calibrada,
+                                                    bidireccional=bidireccional)
+            nodos = nodos + estadisticas.get("nodos_explorados", 0)
+            costo = estadisticas.get("costo_total", INFINITO)
+            if not bidireccional:
+                costos[(inicio, destino)] = costo
+            elif abs(costo - costos[(inicio, destino)]) > 1e-9:
+                diferencias = diferencias + 1
+        tiempo_total = time.time() - start_time
+        reporte[nombre] = {
+            "nodos_explorados": nodos,
+            "latencia_media_ms": tiempo_total * 1000 / len(pares) if pares else 0.0,
+            "costos_distintos": diferencias
+        }
+    return reporte
+
+
+# RUTEO JERARQUICO SOBRE ESTACIONES DE TRANSBORDO
+# Las estaciones "nucleo" son los transbordos, las terminales y cualquier
+# estacion que no sea un simple eslabon de una linea (una sola linea, dos
+# vecinos). Cada tramo de linea entre dos estados nucleo se colapsa en un
+# atajo que guarda sus arcos. Como el estado depende de la linea, tambien hay
+# un atajo de "vuelta" (entrar al tramo y regresar a la misma estacion por
+# otra linea), que puede salir mas barato que una penalizacion de transbordo.
+# La consulta busca solo en el grafo de atajos y
+# al final los expande en la lista completa de estaciones. El costo de un
+# atajo es la suma de pesos_arcos, asi que sirve para cualquier perfil.
+
+def es_estacion_nucleo(comp, e):
+    if comp["es_transbordo"][e]:
+        return True
+    if comp["estado_offsets"][e + 1] - comp["estado_offsets"][e] != 1:
+        return True
+    inicio = comp["ady_offsets"][e]
+    if comp["ady_offsets"][e + 1] - inicio != 2:
+        return True
+    return comp["ady_destino"][inicio] == comp["ady_destino"][inicio + 1]
+
+def recorrer_tramo(comp, nucleo, arco, estacion_previa):
+    # sigue la cadena desde un arco hasta el primer estado nucleo;
+    # regresa (arcos, estado final) o (arcos, -1) si la cadena se cierra sin nucleo
+    arco_offsets = comp["arco_offsets"]
+    arco_destino = comp["arco_destino"]
+    estado_estacion = comp["estado_estacion"]
+    arcos = [arco]
+    t = arco_destino[arco]
+    inicio = estacion_previa
+    while not nucleo[estado_estacion[t]]:
+        a = arco_offsets[t]
+        if estado_estacion[arco_destino[a]] == estacion_previa:
+            a = a + 1
+        estacion_previa = estado_estacion[t]
+        arcos.append(a)
+        t = arco_destino[a]
+        if estado_estacion[t] == inicio and not nucleo[inicio]:
+            return arcos, -1
+    return arcos, t
+
+def preprocesar_jerarquia(comp):
+    num_estaciones = len(comp["nombres"])
+    num_estados = len(comp["estado_estacion"])
+    estado_estacion = comp["estado_estacion"]
+    arco_offsets = comp["arco_offsets"]
+    nucleo = bytearray(1 if es_estacion_nucleo(comp, e) else 0 for e in range(num_estaciones))
+    
+    atajo_offsets = array("i", [0])  # por estado (solo los nucleo tienen atajos)
+    atajo_destino = array("i")
+    atajo_arcos_offsets = array("i", [0])
+    atajo_arcos = array("i")
+    pasa_por = {}  # estacion no nucleo -> [(atajo, posicion del arco que llega a ella)]
+    for s in range(num_estados):
+        if nucleo[estado_estacion[s]]:
+            for a in range(arco_offsets[s], arco_offsets[s + 1]):
+                arcos, t = recorrer_tramo(comp, nucleo, a, estado_estacion[s])
+                k = len(atajo_destino)
+                atajo_destino.append(t)
+                for i, arco in enumerate(arcos[:-1]):
+                    pasa_por.setdefault(estado_estacion[comp["arco_destino"][arco]], []).append((k, i))
+                atajo_arcos.extend(arcos)
+                atajo_arcos_offsets.append(len(atajo_arcos))
+                
+                # vuelta en la primera estacion del tramo (las mas largas cuestan mas)
+                t1 = comp["arco_destino"][a]
+                if not nucleo[estado_estacion[t1]]:
+                    regreso = arco_offsets[t1]
+                    if estado_estacion[comp["arco_destino"][regreso]] != estado_estacion[s]:
+                        regreso = regreso + 1
+                    atajo_destino.append(comp["arco_destino"][regreso])
+                    atajo_arcos.extend((a, regreso))
+                    atajo_arcos_offsets.append(len(atajo_arcos))
+        atajo_offsets.append(len(atajo_destino))
+    
+    return {
+        "comp": comp,
+        "nucleo": nucleo,
+        "atajo_offsets": atajo_offsets,
+        "atajo_destino": atajo_destino,
+        "atajo_arcos_offsets": atajo_arcos_offsets,
+        "atajo_arcos": atajo_arcos,
+        "pasa_por": pasa_por,
+        "costos_atajos": {}
+    }
+
+def costos_atajos(jer, perfil):
+    # costo de cada atajo; se guarda por costos del perfil y version de las
+    # afectaciones, como costos_tramos
+    comp = jer["comp"]
+    if perfil is None:
+        perfil = comp["costos"]
+    version = comp.get("version_afectaciones", 0)
+    clave = (perfil["estacion_normal"], perfil["transbordo"], version)
+    costos = jer["costos_atajos"].get(clave)
+    if costos is not None:
+        return costos
+    pesos = pesos_arcos(comp, perfil)
+    offsets = jer["atajo_arcos_offsets"]
+    arcos = jer["atajo_arcos"]
+    costos = array("d", [sum(pesos[arcos[i]] for i in range(offsets[k], offsets[k + 1]))
+                         for k in range(len(jer["atajo_destino"]))])
+    # los de otra version ya no sirven
+    jer["costos_atajos"] = {c: v for c, v in jer["costos_atajos"].items() if c[2] == version}
+    jer["costos_atajos"][clave] = costos
+    return costos
+
+def ruta_jerarquica(jer, inicio, destino, linea_inicial=None, perfil=None):
+    # mismo contrato que a_star; nodos_explorados cuenta estados nucleo
+    comp = jer["comp"]
+    if inicio not in comp["indice"] or destino not in comp["indice"]:
+        return None, {"error": "Estacion no encontrada"}
+    estado_inicial = estado_inicial_compilado(comp, inicio, linea_inicial)
+    if estado_inicial == -1:
+        return None, {"error": "Linea inicial no valida"}
+    
+    start_time = time.time()
+    medir = sumidero_metricas is not None
+    if medir:
+        inicio_ns = time.perf_counter_ns()
+    pesos = pesos_arcos(comp, perfil)
+    costos = costos_atajos(jer, perfil)
+    nucleo = jer["nucleo"]
+    estado_estacion = comp["estado_estacion"]
+    atajo_offsets = jer["atajo_offsets"]
+    atajo_destino = jer["atajo_destino"]
+    atajo_arcos_offsets = jer["atajo_arcos_offsets"]
+    atajo_arcos = jer["atajo_arcos"]
+    d = comp["indice"][destino]
+    
+    # atajos que pasan por el destino (si no es nucleo), con su costo parcial
+    por_destino = {}
+    for k, i in jer["pasa_por"].get(d, ()):
+        base = atajo_arcos_offsets[k]
+        por_destino.setdefault(k, []).append(
+            (sum(pesos[atajo_arcos[j]] for j in range(base, base + i + 1)), i))
+    
+    # mejor llegada al destino a la mitad de un tramo: (costo, estado nucleo, atajo, posicion)
+    mejor = (INFINITO, -1, -1, -1)
+    g = {}
+    padres = {}  # estado nucleo -> (estado nucleo previo, arcos o atajo)
+    heap = []
+    if estado_estacion[estado_inicial] == d:
+        mejor = (0.0, estado_inicial, -1, -1)
+    elif nucleo[estado_estacion[estado_inicial]]:
+        g[estado_inicial] = 0.0
+        padres[estado_inicial] = (-1, None)
+        heap.append((0.0, estado_inicial))
+    else:
+        # salir del tramo por ambos lados; puede que el destino este en el mismo tramo
+        for a in range(comp["arco_offsets"][estado_inicial], comp["arco_offsets"][estado_inicial + 1]):
+            arcos, t = recorrer_tramo(comp, nucleo, a, estado_estacion[estado_inicial])
+            costo = 0.0
+            for i, arco in enumerate(arcos):
+                costo = costo + pesos[arco]
+                if estado_estacion[comp["arco_destino"][arco]] == d and costo < mejor[0]:
+                    mejor = (costo, -1, -1, arcos[:i + 1])
+            if t != -1 and costo < g.get(t, INFINITO):
+                g[t] = costo
+                padres[t] = (-1, arcos)
+                heapq.heappush(heap, (costo, t))
+    
+    nodos_explorados = 0
+    inserciones = len(heap)
+    obsoletas = 0
+    cerrados = set()
+    while heap:
+        g_cost, s = heapq.heappop(heap)
+        if g_cost >= mejor[0]:
+            break
+        if s in cerrados:
+            obsoletas = obsoletas + 1
+            continue
+        cerrados.add(s)
+        nodos_explorados = nodos_explorados + 1
+        if estado_estacion[s] == d:
+            mejor = (g_cost, s, -1, -1)
+            break
+        for k in range(atajo_offsets[s], atajo_offsets[s + 1]):
+            for parcial, i in por_destino.get(k, ()):
+                if g_cost + parcial < mejor[0]:
+                    mejor = (g_cost + parcial, s, k, i)
+            t = atajo_destino[k]
+            if t == -1:
+                continue
+            nuevo_g = g_cost + costos[k]
+            if nuevo_g < g.get(t, INFINITO):
+                g[t] = nuevo_g
+                padres[t] = (s, k)
+                heapq.heappush(heap, (nuevo_g, t))
+                inserciones = inserciones + 1
+    
+    costo_total, s, k, i = mejor
+    if costo_total == INFINITO:
+        if medir:
+            reportar_jerarquica(jer, cerrados, inicio_ns, None, time.perf_counter_ns(),
+                                inserciones, obsoletas, nodos_explorados)
+        return None, {
+            "error": "No se encontro ruta",
+            "nodos_explorados": nodos_explorados,
+            "tiempo_segundos": time.time() - start_time
+        }
+    if medir:
+        reconstruccion_ns = time.perf_counter_ns()
+    
+    # expandir atajos en arcos, del destino hacia atras
+    tramos = []
+    if s == -1:
+        tramos.append(i)  # llegada directa dentro del tramo de salida
+    else:
+        if k != -1:
+            tramos.append(atajo_arcos[atajo_arcos_offsets[k]:atajo_arcos_offsets[k] + i + 1])
+        while s != -1:
+            previo, via = padres[s] if s in padres else (-1, None)
+            if via is None:
+                pass
+            elif isinstance(via, list):
+                tramos.append(via)
+            else:
+                tramos.append(atajo_arcos[atajo_arcos_offsets[via]:atajo_arcos_offsets[via + 1]])
+            s = previo
+    camino = [inicio]
+    for tramo in reversed(tramos):
+        for arco in tramo:
+            camino.append(comp["nombres"][estado_estacion[comp["arco_destino"][arco]]])
+    if medir:
+        reportar_jerarquica(jer, cerrados, inicio_ns, reconstruccion_ns, time.perf_counter_ns(),
+                            inserciones, obsoletas, nodos_explorados)
+    tiempo_total = time.time() - start_time
+    return camino, {
+        "ruta": camino,
+        "costo_total": costo_total,
+        "nodos_explorados": nodos_explorados,
+        "tiempo_segundos": tiempo_total,
+        "longitud_ruta": len(camino),
+        "eficiencia": len(camino) / nodos_explorados if nodos_explorados > 0 else 0
+    }
+
+
+def reportar_jerarquica(jer, cerrados, inicio_ns, reconstruccion_ns, fin_ns,
+                        inserciones, obsoletas, nodos_explorados):
+    # las relajaciones son atajos; sin heuristica
+    atajo_offsets = jer["atajo_offsets"]
+    relajaciones = sum(atajo_offsets[s + 1] - atajo_offsets[s] for s in cerrados)
+    reportar_busqueda("ruta_jerarquica", inicio_ns, reconstruccion_ns, fin_ns, {
+        "inserciones_heap": inserciones,
+        "extracciones_heap": nodos_explorados + obsoletas,
+        "extracciones_obsoletas": obsoletas,
+        "relajaciones": relajaciones
+    })
+
+
+# RAPTOR: RUTAS POR RONDAS (TIEMPO VS TRANSBORDOS)
+# Una sola consulta da el conjunto de Pareto: la ruta mas rapida con 0, 1,
+# 2... transbordos. No usa los estados (estacion, linea): trabaja sobre las
+# secuencias de estaciones de cada linea (patrones, sacados de los ids de linea
+# de las conexiones) y hace una ronda por viaje. La ronda k parte de las
+# estaciones que mejoraron en la ronda k - 1 y recorre una sola vez cada patron
+# que pasa por ellas, desde la primera estacion marcada.
+# Costos del pasajero: cada tramo cuesta perfil["estacion_normal"] (por su
+# factor, ver CIERRES) y subir a otra linea cuesta perfil["transbordo"]. Los
+# motores sobre estados cobran el transbordo al llegar a una estacion de
+# transbordo por otra linea; aqui se cobra al cambiar de linea, que es lo que
+# se cuenta, asi que los tiempos pueden diferir un poco.
+# Patrones por linea: un camino da uno por sentido; con ramales, uno por cada
+# par de terminales; un circuito se recorre dos vueltas por sentido para subir
+# y bajar en cualquier punto. En otras formas cada tramo entre bifurcaciones
+# es un patron y pasar de uno a otro cuenta como transbordo.
+
+def patrones_de_linea(vecinos):
+    # vecinos: estacion -> estaciones vecinas por la linea; regresa listas de estaciones
+    patrones = []
+    vistas = set()
+    for raiz in vecinos:
+        if raiz in vistas:
+            continue
+        componente = [raiz]
+        vistas.add(raiz)
+        for e in componente:
+            for v in vecinos[e]:
+                if v not in vistas:
+                    vistas.add(v)
+                    componente.append(v)
+        aristas = sum(len(vecinos[e]) for e in componente) // 2
+    
+        if aristas == len(componente) - 1:
+            # camino o arbol: de cada terminal a cada una de las otras
+            terminales = [e for e in componente if len(vecinos[e]) == 1]
+            for origen in terminales:
+                padres = {origen: None}
+                cola = [origen]
+                for e in cola:
+                    for v in vecinos[e]:
+                        if v not in padres:
+                            padres[v] = e
+                            cola.append(v)
+                for destino in terminales:
+                    if destino == origen:
+                        continue
+                    camino = []
+                    e = destino
+                    while e is not None:
+                        camino.append(e)
+                        e = padres[e]
+                    camino.reverse()
+                    patrones.append(camino)
+        elif all(len(vecinos[e]) == 2 for e in componente):
+            # circuito: dos vueltas en cada sentido
+            vuelta = [raiz]
+            previa, e = raiz, vecinos[raiz][0]
+            while e != raiz:
+                vuelta.append(e)
+                previa, e = e, vecinos[e][0] if vecinos[e][0] != previa else vecinos[e][1]
+            for sentido in (vuelta, [raiz] + vuelta[:0:-1]):
+                patrones.append(sentido + sentido[:-1])
+        else:
+            # tramos entre bifurcaciones (cada uno sale una vez desde cada punta)
+            for e in componente:
+                if len(vecinos[e]) == 2:
+                    continue
+                for v in vecinos[e]:
+                    tramo = [e, v]
+                    while len(vecinos[tramo[-1]]) == 2:
+                        a, b = vecinos[tramo[-1]]
+                        tramo.append(b if a == tramo[-2] else a)
+                    patrones.append(tramo)
+    return patrones
+
+def preparar_raptor(comp):
+    # patrones de todas las lineas y, por estacion, donde aparece en ellos
+    num_estaciones = len(comp["nombres"])
+    ady_offsets = comp["ady_offsets"]
+    ady_destino = comp["ady_destino"]
+    ady_linea = comp["ady_linea"]
+    por_linea = {}
+    for e in range(num_estaciones):
+        for a in range(ady_offsets[e], ady_offsets[e + 1]):
+            v = ady_destino[a]
+            if v != e:
+                vecinos = por_linea.setdefault(ady_linea[a], {})
+                vecinos.setdefault(e, set()).add(v)
+                vecinos.setdefault(v, set()).add(e)
+    
+    patron_offsets = array("i", [0])
+    patron_estacion = array("i")
+    patron_linea = array("i")
+    for linea in sorted(por_linea):
+        vecinos = {e: sorted(vs) for e, vs in sorted(por_linea[linea].items())}
+        for patron in patrones_de_linea(vecinos):
+            patron_estacion.extend(patron)
+            patron_linea.append(linea)
+            patron_offsets.append(len(patron_estacion))
+    
+    # paradas por estacion: patron y posicion (en patron_estacion) de cada aparicion
+    apariciones = [[] for _ in range(num_estaciones)]
+    for r in range(len(patron_linea)):
+        for j in range(patron_offsets[r], patron_offsets[r + 1]):
+            apariciones[patron_estacion[j]].append((r, j))
+    parada_offsets = array("i", [0])
+    parada_patron = array("i")
+    parada_posicion = array("i")
+    for lista in apariciones:
+        for r, j in lista:
+            parada_patron.append(r)
+            parada_posicion.append(j)
+        parada_offsets.append(len(parada_patron))
+    
+    return {
+        "comp": comp,
+        "patron_offsets": patron_offsets,
+        "patron_estacion": patron_estacion,
+        "patron_linea": patron_linea,
+        "parada_offsets": parada_offsets,
+        "parada_patron": parada_patron,
+        "parada_posicion": parada_posicion,
+        "costos_tramos": {}
+    }
+
+def costos_tramos(raptor, perfil):
+    # costo de ir de cada posicion de un patron a la siguiente; se guarda por
+    # costo de estacion y version de las afectaciones
+    comp = raptor["comp"]
+    version = comp.get("version_afectaciones", 0)
+    clave = (perfil["estacion_normal"], version)
+    costos = raptor["costos_tramos"].get(clave)
+    if costos is not None:
+        return costos
+    
+    normal = perfil["estacion_normal"]
+    patron_offsets = raptor["patron_offsets"]
+    patron_estacion = raptor["patron_estacion"]
+    costos = array("d", [normal]) * len(patron_estacion)
+    afectaciones = comp.get("afectaciones")
+    if afectaciones and (afectaciones["estaciones"] or afectaciones["conexiones"]):
+        for r, linea in enumerate(raptor["patron_linea"]):
+            for j in range(patron_offsets[r], patron_offsets[r + 1] - 1):
+                costos[j] = normal * factor_de_tramo(afectaciones, patron_estacion[j],
+                                                     patron_estacion[j + 1], linea)
+    # los de otra version ya no sirven
+    raptor["costos_tramos"] = {c: v for c, v in raptor["costos_tramos"].items() if c[1] == version}
+    raptor["costos_tramos"][clave] = costos
+    return costos
+
+def reconstruir_opcion(raptor, bajadas, ronda, o, d):
+    # sigue las bajadas de la ronda hacia atras; una etiqueta que no cambio en
+    # una ronda viene de una anterior
+    comp = raptor["comp"]
+    patron_estacion = raptor["patron_estacion"]
+    tramos = []
+    e = d
+    while e != o:
+        while e not in bajadas[ronda - 1]:
+            ronda = ronda - 1
+        j_subida, j_bajada = bajadas[ronda - 1][e]
+        tramos.append((j_subida, j_bajada))
+        e = patron_estacion[j_subida]
+        ronda = ronda - 1
+    
+    nombres = comp["nombres"]
+    ruta = [nombres[o]]
+    viajes = []
+    for j_subida, j_bajada in reversed(tramos):
+        r = bisect_right(raptor["patron_offsets"], j_subida) - 1
+        viajes.append((comp["lineas"][raptor["patron_linea"][r]],
+                       nombres[patron_estacion[j_subida]], nombres[patron_estacion[j_bajada]]))
+        ruta.extend(nombres[patron_estacion[j]] for j in range(j_subida + 1, j_bajada + 1))
+    return ruta, viajes
+
+def rutas_pareto(raptor, inicio, destino, linea_inicial=None, perfil=None, max_transbordos=None):
+    # regresa (opciones, estadisticas); opciones va de menos a mas transbordos y
+    # cada una es mas rapida que las anteriores:
+    #   {"transbordos", "costo_total", "ruta", "viajes": [(linea, subida, bajada), ...]}
+    # Con linea_inicial se empieza a bordo de esa linea: tomar otra en el
+    # origen ya es un transbordo.
+    comp = raptor["comp"]
+    if inicio not in comp["indice"] or destino not in comp["indice"]:
+        return None, {"error": "Estacion no encontrada"}
+    if estado_inicial_compilado(comp, inicio, linea_inicial) == -1:
+        return None, {"error": "Linea inicial no valida"}
+    
+    start_time = time.time()
+    medir = sumidero_metricas is not None
+    if medir:
+        inicio_ns = time.perf_counter_ns()
+        reconstruccion_ns = 0  # acumulada: se reconstruye una opcion por ronda
+    if perfil is None:
+        perfil = comp["costos"]
+    costos = costos_tramos(raptor, perfil)
+    transbordo = perfil["transbordo"]
+    patron_offsets = raptor["patron_offsets"]
+    patron_estacion = raptor["patron_estacion"]
+    patron_linea = raptor["patron_linea"]
+    parada_offsets = raptor["parada_offsets"]
+    parada_patron = raptor["parada_patron"]
+    parada_posicion = raptor["parada_posicion"]
+    o = comp["indice"][inicio]
+    d = comp["indice"][destino]
+    linea_salida = -1 if linea_inicial is None else comp["indice_linea"][linea_inicial]
+    
+    # mejor: llegada mas temprana con cualquier numero de viajes (poda local y
+    # en el destino, con la cota de heuristica_calibrada); subida: llegadas de
+    # la ronda anterior en las estaciones marcadas. Subir en una estacion no
+    # marcada ya se probo en una ronda anterior con el mismo costo o menos.
+    num_estaciones = len(comp["nombres"])
+    mejor = array("d", [INFINITO]) * num_estaciones
+    mejor[o] = 0.0
+    subida = array("d", [INFINITO]) * num_estaciones
+    cota = heuristica_calibrada(comp, d, perfil)
+    primer_estado = comp["estado_offsets"]
+    bajadas = []  # por ronda: estacion -> (posicion de subida, posicion de bajada)
+    opciones = []
+    if o == d:
+        opciones.append({"transbordos": 0, "costo_total": 0.0, "ruta": [inicio], "viajes": []})
+    marcadas = [] if o == d else [o]
+    ronda = 0
+    patrones_revisados = 0
+    estaciones_marcadas = 0
+    
+    while marcadas and (max_transbordos is None or ronda <= max_transbordos):
+        ronda = ronda + 1
+        # el primer viaje sale gratis (salvo cambiar la linea inicial)
+        subir = 0.0 if ronda == 1 else transbordo
+        for e in marcadas:
+            subida[e] = mejor[e] + subir
+    
+        # cada patron una vez, de la primera a la ultima posicion marcada
+        por_revisar = {}
+        for e in marcadas:
+            for i in range(parada_offsets[e], parada_offsets[e + 1]):
+                r = parada_patron[i]
+                if ronda == 1 and linea_salida != -1 and patron_linea[r] != linea_salida:
+                    continue
+                j = parada_posicion[i]
+                rango = por_revisar.get(r)
+                if rango is None:
+                    por_revisar[r] = [j, j]
+                elif j < rango[0]:
+                    rango[0] = j
+                elif j > rango[1]:
+                    rango[1] = j
+    
+        bajadas_ronda = {}
+        for r, (j_inicio, j_ultima) in por_revisar.items():
+            patrones_revisados = patrones_revisados + 1
+            costo = INFINITO
+            j_subida = -1
+            for j in range(j_inicio, patron_offsets[r + 1]):
+                e = patron_estacion[j]
+                if j_subida != -1:
+                    costo = costo + costos[j - 1]
+                    if costo < mejor[e] and costo + cota(primer_estado[e]) < mejor[d]:
+                        mejor[e] = costo
+                        bajadas_ronda[e] = (j_subida, j)
+                    elif j > j_ultima and costo >= mejor[d]:
+                        break  # ya no se sube nadie y no se puede mejorar el destino
+                # subir aqui si sale mas barato que seguir a bordo
+                if subida[e] < costo:
+                    costo = subida[e]
+                    j_subida = j
+        for e in marcadas:
+            subida[e] = INFINITO
+    
+        bajadas.append(bajadas_ronda)
+        if d in bajadas_ronda:
+            if medir:
+                antes_ns = time.perf_counter_ns()
+            ruta, viajes = reconstruir_opcion(raptor, bajadas, ronda, o, d)
+            if medir:
+                reconstruccion_ns = reconstruccion_ns + time.perf_counter_ns() - antes_ns
+            opciones.append({"transbordos": ronda - 1, "costo_total": mejor[d],
+                             "ruta": ruta, "viajes": viajes})
+        marcadas = list(bajadas_ronda)
+        if ronda == 1 and linea_salida != -1:
+            # en el origen todavia se puede cambiar de linea (ronda 2)
+            marcadas.append(o)
+        estaciones_marcadas = estaciones_marcadas + len(marcadas)
+    
+    if medir:
+        fin_ns = time.perf_counter_ns()
+        reportar_busqueda("rutas_pareto", inicio_ns, fin_ns - reconstruccion_ns if opciones else None, fin_ns, {
+            "rondas": ronda,
+            "patrones_revisados": patrones_revisados,
+            "estaciones_marcadas": estaciones_marcadas
+        })
+    tiempo_total = time.time() - start_time
+    if not opciones:
+        return None, {
+            "error": "No se encontro ruta",
+            "rondas": ronda,
+            "nodos_explorados": estaciones_marcadas,
+            "tiempo_segundos": tiempo_total
+        }
+    mas_rapida = opciones[-1]
+    return opciones, {
+        "ruta": mas_rapida["ruta"],
+        "costo_total": mas_rapida["costo_total"],
+        "opciones": len(opciones),
+        "rondas": ronda,
+        "patrones_revisados": patrones_revisados,
+        # estaciones que mejoraron en alguna ronda
+        "nodos_explorados": estaciones_marcadas,
+        "tiempo_segundos": tiempo_total,
+        "longitud_ruta": len(mas_rapida["ruta"])
+    }
+
+
+# INDICE ESPACIAL Y RUTAS ENTRE COORDENADAS
+# Para viajes que empiezan o terminan en un punto (la ubicacion del usuario) y
+# no en una estacion. Las estaciones se reparten en una reticula uniforme
+# (celdas de tam_celda, unas ESTACIONES_POR_CELDA por celda en promedio) con
+# los ids de estacion en arreglos planos por celda, como el grafo compilado.
+# Las k mas cercanas se buscan por anillos de celdas alrededor del punto: una
+# celda del anillo r + 1 esta a mas de r * tam_celda, asi que se para en cuanto
+# la k-esima encontrada esta mas cerca que eso.
+# ruta_entre_coordenadas hace una sola busqueda A* con varias salidas (las
+# estaciones cerca del origen, con su caminata como costo inicial) y varias
+# llegadas (cerca del destino, sumando la caminata final), en vez de k x k
+# llamadas a a_star. Caminar cuesta minutos_por_unidad por unidad de coords.
+
+ESTACIONES_POR_CELDA = 2
+# 5 km/h con coords en km (como las de gtfs_metro)
+MINUTOS_CAMINANDO_POR_UNIDAD = 12.0
+
+def crear_indice_espacial(comp, estaciones_por_celda=ESTACIONES_POR_CELDA):
+    x = comp["x"]
+    y = comp["y"]
+    num_estaciones = len(x)
+    x0 = min(x) if num_estaciones else 0.0
+    y0 = min(y) if num_estaciones else 0.0
+    ancho = (max(x) - x0) if num_estaciones else 0.0
+    alto = (max(y) - y0) if num_estaciones else 0.0
+    # celdas cuadradas; con todas las estaciones en una recta se usa su largo
+    area = ancho * alto if ancho * alto > 0 else max(ancho, alto) ** 2
+    tam_celda = (area * estaciones_por_celda / max(num_estaciones, 1)) ** 0.5 or 1.0
+    columnas = int(ancho / tam_celda) + 1
+    filas = int(alto / tam_celda) + 1
+    
+    # ids de estacion ordenados por celda (celda = fila * columnas + columna)
+    celda_de = [min(int((y[e] - y0) / tam_celda), filas - 1) * columnas
+                + min(int((x[e] - x0) / tam_celda), columnas - 1) for e in range(num_estaciones)]
+    celda_offsets = array("i", [0]) * (columnas * filas + 1)
+    for celda in celda_de:
+        celda_offsets[celda + 1] += 1
+    for celda in range(columnas * filas):
+        celda_offsets[celda + 1] += celda_offsets[celda]
+    celda_estacion = array("i", [0]) * num_estaciones
+    llenas = array("i", celda_offsets[:-1])
+    for e, celda in enumerate(celda_de):
+        celda_estacion[llenas[celda]] = e
+        llenas[celda] += 1
+    
+    return {
+        "comp": comp,
+        "x0": x0,
+        "y0": y0,
+        "tam_celda": tam_celda,
+        "columnas": columnas,
+        "filas": filas,
+        "celda_offsets": celda_offsets,
+        "celda_estacion": celda_estacion
+    }
+
+def buscar_cercanas(indice, px, py, k=None, radio=None):
+    # [(distancia, id de estacion), ...] de la mas cercana a la mas lejana: las k
+    # mas cercanas, las que estan a lo mas a radio, o ambas condiciones juntas
+    if k is None and radio is None:
+        raise ValueError("Se necesita k o radio")
+    # un NaN o inf no cae en ninguna celda
+    if not (math.isfinite(px) and math.isfinite(py)):
+        raise ValueError(f"Coordenadas invalidas: {px}, {py}")
+    if k is not None and k < 1:
+        raise ValueError(f"k debe ser al menos 1: {k}")
+    if radio is not None and not radio >= 0:
+        raise ValueError(f"radio invalido: {radio}")
+    comp = indice["comp"]
+    x = comp["x"]
+    y = comp["y"]
+    tam_celda = indice["tam_celda"]
+    columnas = indice["columnas"]
+    filas = indice["filas"]
+    celda_offsets = indice["celda_offsets"]
+    celda_estacion = indice["celda_estacion"]
+    # celda del punto (o la mas cercana si cae fuera de la reticula)
+    cx = min(max(int((px - indice["x0"]) // tam_celda), 0), columnas - 1)
+    cy = min(max(int((py - indice["y0"]) // tam_celda), 0), filas - 1)
+    ultimo_anillo = max(cx, columnas - 1 - cx, cy, filas - 1 - cy)
+    
+    encontradas = []
+    for r in range(ultimo_anillo + 1):
+        for fila in range(max(cy - r, 0), min(cy + r, filas - 1) + 1):
+            # en las filas de en medio solo las dos columnas del borde
+            if abs(fila - cy) == r:
+                rango_columnas = range(max(cx - r, 0), min(cx + r, columnas - 1) + 1)
+            else:
+                rango_columnas = [c for c in (cx - r, cx + r) if 0 <= c < columnas]
+            for columna in rango_columnas:
+                celda = fila * columnas + columna
+                for j in range(celda_offsets[celda], celda_offsets[celda + 1]):
+                    e = celda_estacion[j]
+                    distancia = ((x[e] - px) ** 2 + (y[e] - py) ** 2) ** 0.5
+                    if radio is None or distancia <= radio:
+                        encontradas.append((distancia, e))
+        # lo que falta esta a mas de r * tam_celda
+        cota = r * tam_celda
+        if radio is not None and cota >= radio:
+            break
+        if k is not None and len(encontradas) >= k:
+            encontradas.sort()
+            if encontradas[k - 1][0] <= cota:
+                break
+    encontradas.sort()
+    return encontradas if k is None else encontradas[:k]
+
+def estaciones_cercanas(indice, px, py, k=None, radio=None):
+    # como buscar_cercanas pero con nombres: [(nombre, distancia), ...]
+    nombres = indice["comp"]["nombres"]
+    return [(nombres[e], distancia) for distancia, e in buscar_cercanas(indice, px, py, k, radio)]
+
+def accesos(indice, px, py, k, radio, minutos_por_unidad):
+    # estacion -> minutos caminando, sin las estaciones cerradas
+    afectaciones = indice["comp"].get("afectaciones")
+    cerradas = afectaciones["estaciones"] if afectaciones else {}
+    return {e: distancia * minutos_por_unidad for distancia, e in buscar_cercanas(indice, px, py, k, radio)
+            if cerradas.get(e) != INFINITO}
+
+def ruta_entre_coordenadas(indice, origen, destino, perfil=None, k=4, radio=None,
+                           minutos_por_unidad=MINUTOS_CAMINANDO_POR_UNIDAD):
+    # origen y destino son puntos (x, y) en las unidades de coords; se sube en
+    # alguna de las k estaciones mas cercanas al origen (o a menos de radio) y
+    # se baja en alguna de las cercanas al destino. Regresa (ruta, estadisticas)
+    # con la misma forma que a_star_compilado mas la entrada, la salida y los
+    # minutos caminando; si caminar directo es mas rapido la ruta queda vacia.
+    comp = indice["comp"]
+    start_time = time.time()
+    salidas = accesos(indice, origen[0], origen[1], k, radio, minutos_por_unidad)
+    llegadas = accesos(indice, destino[0], destino[1], k, radio, minutos_por_unidad)
+    directo = ((origen[0] - destino[0]) ** 2 + (origen[1] - destino[1]) ** 2) ** 0.5 * minutos_por_unidad
+    if not salidas or not llegadas:
+        return None, {"error": "Sin estaciones cerca", "caminata_directa": directo}
+    
+    pesos = pesos_arcos(comp, perfil)
+    if perfil is None:
+        perfil = comp["costos"]
+    x = comp["x"]
+    y = comp["y"]
+    estado_estacion = comp["estado_estacion"]
+    estado_offsets = comp["estado_offsets"]
+    arco_offsets = comp["arco_offsets"]
+    arco_destino = comp["arco_destino"]
+    # cota admisible hasta el punto de destino: en metro se avanza a lo mas la
+    # arista mas larga por estacion_normal y caminando 1 / minutos_por_unidad
+    maxima = longitud_max_arista(comp)
+    escala = min(perfil["estacion_normal"] / maxima if maxima > 0 else 0.0, minutos_por_unidad)
+    dx, dy = destino
+    
+    # [f_cost, contador, g_cost, estado, estado_padre]
+    contador = 0
+    open_list = []
+    g_costs = {}
+    for e, caminata in salidas.items():
+        s = estado_offsets[e]
+        g_costs[s] = caminata
+        contador = contador + 1
+        h = ((x[e] - dx) ** 2 + (y[e] - dy) ** 2) ** 0.5 * escala
+        open_list.append((caminata + h, contador, caminata, s, -1))
+    heapq.heapify(open_list)
+    padres = {}
+    nodos_explorados = 0
+    mejor = directo
+    mejor_estado = -1
+    
+    while open_list:
+        f_cost, _, g_cost, s, padre = heapq.heappop(open_list)
+        if f_cost >= mejor:
+            break
+        if s in padres:
+            continue
+        padres[s] = padre
+        nodos_explorados = nodos_explorados + 1
+        e = estado_estacion[s]
+        if e in llegadas and g_cost + llegadas[e] < mejor:
+            mejor = g_cost + llegadas[e]
+            mejor_estado = s
+    
+        for a in range(arco_offsets[s], arco_offsets[s + 1]):
+            t = arco_destino[a]
+            nuevo_g = g_cost + pesos[a]
+            if nuevo_g < g_costs.get(t, INFINITO):
+                g_costs[t] = nuevo_g
+                contador = contador + 1
+                v = estado_estacion[t]
+                h = ((x[v] - dx) ** 2 + (y[v] - dy) ** 2) ** 0.5 * escala
+                heapq.heappush(open_list, (nuevo_g + h, contador, nuevo_g, t, s))
+    
+    tiempo_total = time.time() - start_time
+    if mejor_estado == -1:
+        # caminar directo es lo mas rapido (o no hay ruta entre las cercanas)
+        return [], {
+            "costo_total": directo,
+            "caminata_directa": directo,
+            "nodos_explorados": nodos_explorados,
+            "tiempo_segundos": tiempo_total,
+            "longitud_ruta": 0
+        }
+    camino = reconstruir_camino_compilado(comp, padres, mejor_estado)
+    entrada = comp["indice"][camino[0]]
+    salida = estado_estacion[mejor_estado]
+    return camino, {
+        "ruta": camino,
+        "costo_total": mejor,
+        "entrada": camino[0],
+        "salida": camino[-1],
+        "caminata_inicio": salidas[entrada],
+        "caminata_fin": llegadas[salida],
+        "caminata_directa": directo,
+        "salidas": len(salidas),
+        "llegadas": len(llegadas),
+        "nodos_explorados": nodos_explorados,
+        "tiempo_segundos": tiempo_total,
+        "longitud_ruta": len(camino)
+    }
+
+
 # LOGICA DE PRIMER ORDEN
 
 # BASE DE CONOCIMIENTO
@@ -231,27 +2174,87 @@ def es_hora_tranquila(hora):
                 return True
     return False
 
+# BASE DE CONOCIMIENTO COMPILADA
+# Los hechos se indexan por condicion una sola vez. Si se modifican las listas
+# de hechos en tiempo de ejecucion hay que llamar recompilar_base_conocimiento().
+
+base_compilada = None
+
+def compilar_base_conocimiento():
+    base = {
+        "costos_por_condicion": {},      # condicion -> [(tipo, mult), ...]
+        "modificador": {},               # (condicion, tipo) -> mult (primer hecho)
+        "preferencias_por_condicion": {},  # condicion -> [(accion, valor), ...]
+        "preferencia": {},               # (condicion, accion) -> valor (primer hecho)
+        "combinaciones_por_condicion": {},  # cond1 -> [(orden, cond2, nombre, mult), ...]
+        "condicion_hora": {}             # hora 0-23 -> "hora_pico" / "hora_tranquila" / None
+    }
+    for cond, tipo, mult in costo_hechos:
+        base["costos_por_condicion"].setdefault(cond, []).append((tipo, mult))
+        base["modificador"].setdefault((cond, tipo), mult)
+    for cond, accion, valor in preferencia_hechos:
+        base["preferencias_por_condicion"].setdefault(cond, []).append((accion, valor))
+        base["preferencia"].setdefault((cond, accion), valor)
+    for orden, (cond1, cond2, nombre, mult) in enumerate(combinaciones_pairs):
+        base["combinaciones_por_condicion"].setdefault(cond1, []).append((orden, cond2, nombre, mult))
+    for hora in range(24):
+        if es_hora_pico(hora):
+            base["condicion_hora"][hora] = "hora_pico"
+        elif es_hora_tranquila(hora):
+            base["condicion_hora"][hora] = "hora_tranquila"
+        else:
+            base["condicion_hora"][hora] = None
+    
+    # tabla de contextos para las 24 x 2 x 2 entradas posibles (sin explicaciones);
+    # se comparten entre llamadas, asi que se guardan de solo lectura
+    base["contextos"] = {}
+    for hora in range(24):
+        for prisa in (False, True):
+            for accesibilidad in (False, True):
+                base["contextos"][(hora, prisa, accesibilidad)] = congelar_contexto(
+                    inferir_contexto_indexado(base, hora, prisa, accesibilidad, False))
+    return base
+
+def congelar_contexto(contexto):
+    # listas como tuplas y diccionarios como mapeos de solo lectura
+    return MappingProxyType({
+        "condiciones_activas": tuple(contexto["condiciones_activas"]),
+        "modificadores": MappingProxyType(dict(contexto["modificadores"])),
+        "preferencias": tuple(contexto["preferencias"]),
+        "explicaciones": tuple(contexto["explicaciones"]),
+        "combinaciones": tuple(contexto["combinaciones"])
+    })
+
+def obtener_base_conocimiento():
+    global base_compilada
+    if base_compilada is None:
+        base_compilada = compilar_base_conocimiento()
+    return base_compilada
+
+def recompilar_base_conocimiento():
+    global base_compilada
+    base_compilada = compilar_base_conocimiento()
+    return base_compilada
+
 def obtener_modificador_costo(condicion, tipo_costo):
     #buscar costo para modificaciones
-    for cond, tipo, mult in costo_hechos:
-        if cond == condicion and tipo == tipo_costo:
-            return mult
-    return 1.0  # Neutro si no se encuentra
+    return obtener_base_conocimiento()["modificador"].get((condicion, tipo_costo), 1.0)  # Neutro si no se encuentra
 
 def tiene_preferencia(condicion, accion):
     #condicion implica preferencia
-    for cond, acc, valor in preferencia_hechos:
-        if cond == condicion and acc == accion:
-            return valor
-    return False
+    return obtener_base_conocimiento()["preferencia"].get((condicion, accion), False)
 
-def detectar_combinacion(condiciones_activas):
-    #combinaciones especiales
-    combinaciones_detectadas = []
-    for cond1, cond2, nombre, mult in combinaciones_pairs:
-        if cond1 in condiciones_activas and cond2 in condiciones_activas:
-            combinaciones_detectadas.append((nombre, mult))
-    return combinaciones_detectadas
+def detectar_combinacion(condiciones_activas, base=None):
+    #combinaciones especiales, en el orden de combinaciones_pairs
+    if base is None:
+        base = obtener_base_conocimiento()
+    detectadas = []
+    for cond1 in condiciones_activas:
+        for orden, cond2, nombre, mult in base["combinaciones_por_condicion"].get(cond1, ()):
+            if cond2 in condiciones_activas:
+                detectadas.append((orden, nombre, mult))
+    detectadas.sort()
+    return [(nombre, mult) for _, nombre, mult in detectadas]
 
 #explicaciones
 def explicar_condicion(condicion, hora=None):
@@ -274,50 +2277,71 @@ def explicar_preferencia(condicion, accion):
 # MOTOR DE INFERENCIA
 
 #reglas de inferencia
-def inferir_contexto(hora, prisa, accesibilidad):
+def inferir_contexto(hora, prisa, accesibilidad, explicar=True):
+    # explicar=False omite el texto de las explicaciones (camino rapido)
+    return inferir_contexto_indexado(obtener_base_conocimiento(), hora, prisa, accesibilidad, explicar)
+
+def contexto_precalculado(hora, prisa, accesibilidad):
+    # consulta directa a la tabla 24 x 2 x 2; el resultado es compartido y de solo lectura
+    contexto = obtener_base_conocimiento()["contextos"].get((hora, bool(prisa), bool(accesibilidad)))
+    if contexto is None:
+        contexto = inferir_contexto(hora, prisa, accesibilidad, explicar=False)
+    return contexto
+
+def inferir_contexto_indexado(base, hora, prisa, accesibilidad, explicar):
     condiciones_activas = []
     explicaciones = []
     modificadores = {}
     preferencias = []
     
     # INFERENCIA: Determinar condiciones temporales
-    if es_hora_pico(hora):
-        condiciones_activas.append("hora_pico")
-        explicaciones.append(explicar_condicion("hora_pico", hora))
+    if hora in base["condicion_hora"]:
+        condicion_hora = base["condicion_hora"][hora]
+    elif es_hora_pico(hora):
+        condicion_hora = "hora_pico"
     elif es_hora_tranquila(hora):
-        condiciones_activas.append("hora_tranquila")
-        explicaciones.append(explicar_condicion("hora_tranquila", hora))
+        condicion_hora = "hora_tranquila"
+    else:
+        condicion_hora = None
+    if condicion_hora is not None:
+        condiciones_activas.append(condicion_hora)
+        if explicar:
+            explicaciones.append(explicar_condicion(condicion_hora, hora))
     
     # INFERENCIA: Condiciones de usuario
     if prisa:
         condiciones_activas.append("prisa")
-        explicaciones.append(explicar_condicion("prisa"))
+        if explicar:
+            explicaciones.append(explicar_condicion("prisa"))
     
     if accesibilidad:
         condiciones_activas.append("accesibilidad")
-        explicaciones.append(explicar_condicion("accesibilidad"))
+        if explicar:
+            explicaciones.append(explicar_condicion("accesibilidad"))
     
     # INFERENCIA: Detectar combinaciones especiales
-    combinaciones = detectar_combinacion(condiciones_activas)
+    combinaciones = detectar_combinacion(condiciones_activas, base)
     for nombre_comb, mult_extra in combinaciones:
-        explicaciones.append(f"¡Combinacion especial detectada: {nombre_comb}! (multiplicador adicional: {mult_extra})")
+        if explicar:
+            explicaciones.append(f"¡Combinacion especial detectada: {nombre_comb}! (multiplicador adicional: {mult_extra})")
         modificadores[nombre_comb] = mult_extra
     
     # DERIVACIoN: Aplicar modificadores de costo
     for condicion in condiciones_activas:
-        # Buscar todos los modificadores para esta condicion
-        for cond, tipo, mult in costo_hechos:
-            if cond == condicion:
-                if tipo not in modificadores:
-                    modificadores[tipo] = 1.0
-                modificadores[tipo] *= mult
+        # Modificadores para esta condicion
+        for tipo, mult in base["costos_por_condicion"].get(condicion, ()):
+            if tipo not in modificadores:
+                modificadores[tipo] = 1.0
+            modificadores[tipo] *= mult
+            if explicar:
                 explicaciones.append(explicar_modificador(condicion, tipo, mult))
         
-        # Buscar preferencias
-        for cond, accion, valor in preferencia_hechos:
-            if cond == condicion and valor:
+        # Preferencias
+        for accion, valor in base["preferencias_por_condicion"].get(condicion, ()):
+            if valor:
                 preferencias.append(accion)
-                explicaciones.append(explicar_preferencia(condicion, accion))
+                if explicar:
+                    explicaciones.append(explicar_preferencia(condicion, accion))
     
     return {
         "condiciones_activas": condiciones_activas,
@@ -344,21 +2368,494 @@ def aplicar_logica_primer_orden(grafo, hora, prisa, accesibilidad):
     for tipo, mult in contexto['modificadores'].items():
         print(f"  {tipo}: x{mult:.1f}")
     
-    # modificar el grafo
+    # perfil de costos del contexto; el grafo no se modifica
+    perfil = crear_perfil_costos(grafo["costos"], contexto)
+    contexto["perfil"] = perfil
     if "estacion_normal" in contexto['modificadores']:
-        grafo["costos"]["estacion_normal"] *= contexto['modificadores']['estacion_normal']
-        print(f"\nTiempo estacion: {grafo['costos']['estacion_normal']:.1f} min")
+        print(f"\nTiempo estacion: {perfil['estacion_normal']:.1f} min")
     
     if "transbordo" in contexto['modificadores']:
-        grafo["costos"]["transbordo"] *= contexto['modificadores']['transbordo']
-        print(f"Tiempo transbordo: {grafo['costos']['transbordo']:.1f} min")
+        print(f"Tiempo transbordo: {perfil['transbordo']:.1f} min")
     
     return contexto
 
 
+def crear_perfil_costos(costos_base, contexto):
+    # costos base x modificadores del contexto, en un mapeo de solo lectura;
+    # asi un mismo grafo sirve a muchas consultas (e hilos) sin copiarlo
+    costos = {
+        "estacion_normal": costos_base["estacion_normal"],
+        "transbordo": costos_base["transbordo"]
+    }
+    for tipo in ("estacion_normal", "transbordo"):
+        if tipo in contexto["modificadores"]:
+            costos[tipo] = costos[tipo] * contexto["modificadores"][tipo]
+    return MappingProxyType(costos)
+
+
+# RUTEO DEPENDIENTE DEL TIEMPO
+# inferir_contexto evalua la hora una sola vez, al salir. Aqui cada tramo se
+# cobra con la hora en que de verdad se recorre: las reglas de hora_pico_hechos,
+# hora_tranquila_hechos y costo_hechos se precalculan en una tabla por
+# intervalo del dia (24 de 60 min o 96 de 15 min) y cada arco es una consulta O(1).
+# Para que la busqueda siga siendo exacta se permite esperar en el anden: la
+# llegada es min(t + costo(t), mejor llegada saliendo al inicio de un intervalo
+# posterior), y salir mas tarde nunca hace llegar antes (FIFO).
+
+MINUTOS_DIA = 1440
+
+def tabla_costos_horaria(costos_base, prisa, accesibilidad, minutos_intervalo=60):
+    # costo de un arco normal y de uno con transbordo en cada intervalo del dia;
+    # se guarda en la base compilada (recompilar_base_conocimiento la descarta)
+    if MINUTOS_DIA % minutos_intervalo:
+        raise ValueError("minutos_intervalo debe dividir el dia (p. ej. 15, 30 o 60)")
+    base = obtener_base_conocimiento()
+    clave = (costos_base["estacion_normal"], costos_base["transbordo"],
+             bool(prisa), bool(accesibilidad), minutos_intervalo)
+    tablas = base.setdefault("tablas_horarias", {})
+    tabla = tablas.get(clave)
+    if tabla is not None:
+        return tabla
+    
+    n = MINUTOS_DIA // minutos_intervalo
+    normal = array("d")
+    penalizado = array("d")
+    for k in range(n):
+        contexto = contexto_precalculado(k * minutos_intervalo // 60, prisa, accesibilidad)
+        perfil = crear_perfil_costos(costos_base, contexto)
+        normal.append(perfil["estacion_normal"])
+        penalizado.append(perfil["estacion_normal"] + perfil["transbordo"])
+    
+    tabla = {
+        "minutos_intervalo": minutos_intervalo,
+        "normal": normal,
+        "penalizado": penalizado,
+        # cota inferior de cualquier hora, para las heuristicas
+        "perfil_minimo": {"estacion_normal": min(normal),
+                          "transbordo": min(p - c for p, c in zip(penalizado, normal))}
+    }
+    # llegada mas temprana esperando al inicio de algun intervalo posterior
+    # (minutos desde el inicio del dia del intervalo k), con dos dias de ventana
+    for nombre, costos in (("normal", normal), ("penalizado", penalizado)):
+        espera = array("d", [INFINITO]) * n
+        mejor = INFINITO
+        for j in range(2 * n - 1, 0, -1):
+            mejor = min(mejor, j * minutos_intervalo + costos[j % n])
+            if j <= n:
+                espera[j - 1] = mejor
+        tabla["espera_" + nombre] = espera
+    tablas[clave] = tabla
+    return tabla
+
+def costo_arco_en_hora(tabla, penaliza, minuto):
+    # minutos para cruzar un arco saliendo en el minuto dado (desde la medianoche
+    # del dia de salida; puede pasar de 1440)
+    dia, minuto_dia = divmod(minuto, MINUTOS_DIA)
+    k = int(minuto_dia // tabla["minutos_intervalo"])
+    if penaliza:
+        llegada = min(minuto_dia + tabla["penalizado"][k], tabla["espera_penalizado"][k])
+    else:
+        llegada = min(minuto_dia + tabla["normal"][k], tabla["espera_normal"][k])
+    return llegada - minuto_dia
+
+def a_star_dependiente_tiempo(comp, inicio, destino, hora_salida, prisa=False, accesibilidad=False,
+                              linea_inicial=None, minutos_intervalo=60, heuristica=None):
+    # hora_salida en horas (8.5 = 8:30); costo_total son los minutos de viaje
+    # incluyendo esperas. heuristica: ver HEURISTICAS, se evalua con el perfil
+    # minimo del dia para que siga siendo admisible (por defecto la calibrada)
+    if inicio not in comp["indice"] or destino not in comp["indice"]:
+        return None, {"error": "Estacion no encontrada"}
+    
+    estado_inicial = estado_inicial_compilado(comp, inicio, linea_inicial)
+    if estado_inicial == -1:
+        return None, {"error": "Linea inicial no valida"}
+    
+    start_time = time.time()
+    medir = sumidero_metricas is not None
+    if medir:
+        inicio_ns = time.perf_counter_ns()
+    tabla = tabla_costos_horaria(comp["costos"], prisa, accesibilidad, minutos_intervalo)
+    minuto_salida = hora_salida * 60
+    intervalo = tabla["minutos_intervalo"]
+    normal = tabla["normal"]
+    penalizado = tabla["penalizado"]
+    espera_normal = tabla["espera_normal"]
+    espera_penalizado = tabla["espera_penalizado"]
+    estado_estacion = comp["estado_estacion"]
+    arco_offsets = comp["arco_offsets"]
+    arco_destino = comp["arco_destino"]
+    arco_penaliza = comp["arco_penaliza"]
+    d = comp["indice"][destino]
+    if heuristica is None:
+        heuristica = heuristica_calibrada
+    h = heuristica(comp, d, tabla["perfil_minimo"])
+    
+    # [f_cost, contador, g_cost, estado, estado_padre]
+    contador = 0
+    open_list = [(h(estado_inicial), contador, 0.0, estado_inicial, -1)]
+    g_costs = {estado_inicial: 0.0}
+    padres = {}
+    nodos_explorados = 0
+    obsoletas = 0
+    
+    while open_list:
+        f_cost, _, g_cost, s, padre = heapq.heappop(open_list)
+        if s in padres:
+            obsoletas = obsoletas + 1
+            continue
+        padres[s] = padre
+        nodos_explorados = nodos_explorados + 1
+        
+        if estado_estacion[s] == d:
+            if medir:
+                reconstruccion_ns = time.perf_counter_ns()
+            camino = reconstruir_camino_compilado(comp, padres, s)
+            if medir:
+                reportar_a_star_compilado(comp, padres, s, contador + 1, inicio_ns, reconstruccion_ns,
+                                          time.perf_counter_ns(), contador, obsoletas, nodos_explorados,
+                                          "a_star_dependiente_tiempo")
+            tiempo_total = time.time() - start_time
+            estadisticas = {
+                "ruta": camino,
+                "costo_total": g_cost,
+                "nodos_explorados": nodos_explorados,
+                "tiempo_segundos": tiempo_total,
+                "longitud_ruta": len(camino),
+                "eficiencia": len(camino) / nodos_explorados if nodos_explorados > 0 else 0,
+                "hora_salida": hora_salida,
+                "hora_llegada": (minuto_salida + g_cost) / 60
+            }
+            return camino, estadisticas
+        
+        # costo_arco_en_hora en linea: el intervalo es el mismo para todos los arcos de s
+        dia, minuto_dia = divmod(minuto_salida + g_cost, MINUTOS_DIA)
+        k = int(minuto_dia // intervalo)
+        costo_normal = min(minuto_dia + normal[k], espera_normal[k]) - minuto_dia
+        costo_penalizado = min(minuto_dia + penalizado[k], espera_penalizado[k]) - minuto_dia
+        for a in range(arco_offsets[s], arco_offsets[s + 1]):
+            t = arco_destino[a]
+            nuevo_g = g_cost + (costo_penalizado if arco_penaliza[a] else costo_normal)
+            if nuevo_g < g_costs.get(t, INFINITO):
+                g_costs[t] = nuevo_g
+                contador = contador + 1
+                heapq.heappush(open_list, (nuevo_g + h(t), contador, nuevo_g, t, s))
+    
+    if medir:
+        reportar_a_star_compilado(comp, padres, -1, contador + 1, inicio_ns, None, time.perf_counter_ns(),
+                                  contador, obsoletas, nodos_explorados, "a_star_dependiente_tiempo")
+    tiempo_total = time.time() - start_time
+    return None, {
+        "error": "No se encontro ruta",
+        "nodos_explorados": nodos_explorados,
+        "tiempo_segundos": tiempo_total
+    }
+
+
+# ORACULO DE RUTAS PRECALCULADAS
+# Para cada perfil de costos que puede salir de inferir_contexto se guarda, por
+# cada origen, el arbol de caminos minimos: costo y estado final por destino y
+# el padre de cada estado. Consultar una ruta es seguir padres (O(longitud)).
+# Archivo: MAGIA | largo del encabezado (uint32) | encabezado JSON | arreglos
+#   costos  [perfil][origen][destino]  float32
+#   finales [perfil][origen][destino]  int32 (estado con el que se llega)
+#   padres  [perfil][origen][estado]   int32
+
+MAGIA_ORACULO = b"MCDXORC1"
+
+def firma_grafo(comp):
+    # huella de la topologia compilada para detectar archivos desactualizados
+    import hashlib
+    
+    h = hashlib.sha256()
+    h.update("\n".join(comp["nombres"]).encode("utf-8"))
+    for nombre in ("estado_estacion", "arco_offsets", "arco_destino", "arco_penaliza"):
+        h.update(comp[nombre].tobytes())
+    return h.hexdigest()
+
+def perfiles_posibles(costos_base):
+    # todos los costos efectivos distintos para hora 0-23 x prisa x accesibilidad
+    perfiles = []
+    for hora in range(24):
+        for prisa in (False, True):
+            for accesibilidad in (False, True):
+                perfil = crear_perfil_costos(costos_base, contexto_precalculado(hora, prisa, accesibilidad))
+                clave = (perfil["estacion_normal"], perfil["transbordo"])
+                if clave not in perfiles:
+                    perfiles.append(clave)
+    return perfiles
+
+def precalcular_oraculo(grafo, ruta_archivo):
+    import json
+    
+    comp = compilar_grafo(grafo)
+    n = len(comp["nombres"])
+    num_estados = len(comp["estado_estacion"])
+    costos_base = {"estacion_normal": grafo["costos"]["estacion_normal"],
+                   "transbordo": grafo["costos"]["transbordo"]}
+    perfiles = perfiles_posibles(costos_base)
+    
+    costos = array("f")
+    finales = array("i")
+    padres_todos = array("i")
+    for normal, transbordo in perfiles:
+        pesos = pesos_arcos(comp, {"estacion_normal": normal, "transbordo": transbordo})
+        for o in range(n):
+            dist, padres = dijkstra_compilado(comp, comp["estado_offsets"][o], pesos)
+            for d in range(n):
+                mejor = -1
+                for s in range(comp["estado_offsets"][d], comp["estado_offsets"][d + 1]):
+                    if mejor == -1 or dist[s] < dist[mejor]:
+                        mejor = s
+                costos.append(dist[mejor])
+                finales.append(mejor if dist[mejor] < INFINITO else -1)
+            padres_todos.extend(padres)
+    
+    encabezado = json.dumps({
+        "version": 1,
+        "orden_bytes": sys.byteorder,
+        "firma": firma_grafo(comp),
+        "nombres": comp["nombres"],
+        "estado_estacion": list(comp["estado_estacion"]),
+        "costos_base": costos_base,
+        "perfiles": perfiles,
+        "num_estados": num_estados
+    }).encode("utf-8")
+    # alinear el inicio de los arreglos a 8 bytes
+    relleno = -(len(MAGIA_ORACULO) + 4 + len(encabezado)) % 8
+    with open(ruta_archivo, "wb") as archivo:
+        archivo.write(MAGIA_ORACULO)
+        archivo.write(struct.pack("<I", len(encabezado) + relleno))
+        archivo.write(encabezado + b" " * relleno)
+        costos.tofile(archivo)
+        finales.tofile(archivo)
+        padres_todos.tofile(archivo)
+    return len(perfiles)
+
+def cargar_oraculo(ruta_archivo, comp=None):
+    # mapea el archivo en memoria; varios procesos comparten las mismas paginas
+    import json
+    
+    with open(ruta_archivo, "rb") as archivo:
+        mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+    if mapa[:len(MAGIA_ORACULO)] != MAGIA_ORACULO:
+        raise ValueError(f"{ruta_archivo} no es un archivo de oraculo")
+    inicio = len(MAGIA_ORACULO) + 4
+    largo = struct.unpack("<I", mapa[len(MAGIA_ORACULO):inicio])[0]
+    encabezado = json.loads(mapa[inicio:inicio + largo])
+    if encabezado["orden_bytes"] != sys.byteorder:
+        raise ValueError("El oraculo se genero con otro orden de bytes")
+    if comp is not None and encabezado["firma"] != firma_grafo(comp):
+        raise ValueError("El oraculo no corresponde a este grafo")
+    
+    n = len(encabezado["nombres"])
+    num_perfiles = len(encabezado["perfiles"])
+    vista = memoryview(mapa)
+    pos = inicio + largo
+    tam_matriz = num_perfiles * n * n * 4
+    tam_padres = num_perfiles * n * encabezado["num_estados"] * 4
+    return {
+        "mapa": mapa,
+        "nombres": encabezado["nombres"],
+        "indice": {nombre: i for i, nombre in enumerate(encabezado["nombres"])},
+        "estado_estacion": encabezado["estado_estacion"],
+        "costos_base": encabezado["costos_base"],
+        "perfiles": {tuple(p): i for i, p in enumerate(encabezado["perfiles"])},
+        "num_estados": encabezado["num_estados"],
+        "costos": vista[pos:pos + tam_matriz].cast("f"),
+        "finales": vista[pos + tam_matriz:pos + 2 * tam_matriz].cast("i"),
+        "padres": vista[pos + 2 * tam_matriz:pos + 2 * tam_matriz + tam_padres].cast("i")
+    }
+
+def consultar_oraculo(oraculo, inicio, destino, hora, prisa, accesibilidad):
+    # ruta por la linea inicial por defecto, sin busqueda
+    if inicio not in oraculo["indice"] or destino not in oraculo["indice"]:
+        return None, {"error": "Estacion no encontrada"}
+    
+    start_time = time.time()
+    perfil = crear_perfil_costos(oraculo["costos_base"], contexto_precalculado(hora, prisa, accesibilidad))
+    p = oraculo["perfiles"].get((perfil["estacion_normal"], perfil["transbordo"]))
+    if p is None:
+        return None, {"error": "Perfil no precalculado"}
+    
+    n = len(oraculo["nombres"])
+    o = oraculo["indice"][inicio]
+    d = oraculo["indice"][destino]
+    posicion = (p * n + o) * n + d
+    s = oraculo["finales"][posicion]
+    if s == -1:
+        return None, {"error": "No se encontro ruta", "nodos_explorados": 0,
+                      "tiempo_segundos": time.time() - start_time}
+    
+    base_padres = (p * n + o) * oraculo["num_estados"]
+    camino = []
+    while s != -1:
+        camino.append(oraculo["nombres"][oraculo["estado_estacion"][s]])
+        s = oraculo["padres"][base_padres + s]
+    camino.reverse()
+    return camino, {
+        "ruta": camino,
+        "costo_total": oraculo["costos"][posicion],
+        "nodos_explorados": 0,
+        "tiempo_segundos": time.time() - start_time,
+        "longitud_ruta": len(camino),
+        "eficiencia": 0
+    }
+
+
+# CACHE DE RUTAS
+# LRU con TTL opcional alrededor de a_star. La clave incluye los costos
+# efectivos (perfil o grafo["costos"]), asi que cambiarlos nunca reutiliza una
+# ruta vieja; si la topologia cambia (version del grafo) se vacia la cache.
+# Un candado protege las entradas; la busqueda corre fuera de el.
+# Cada resultado lleva "cache": True si salio de la cache.
+
+def crear_cache_rutas(capacidad=1024, ttl_segundos=None):
+    return {
+        "entradas": OrderedDict(),  # clave -> (instante, camino, estadisticas)
+        "capacidad": capacidad,
+        "ttl_segundos": ttl_segundos,
+        "version_grafo": None,
+        "version_afectaciones": None,  # solo para a_star_compilado_con_cache
+        "aciertos": 0,
+        "fallos": 0,
+        "desalojos": 0,
+        "expirados": 0,
+        "invalidaciones": 0,
+        "reparaciones": 0,          # rutas descartadas por pasar por un arco cerrado
+        "candado": threading.Lock()
+    }
+
+def limpiar_cache_rutas(cache):
+    if cache["entradas"]:
+        cache["invalidaciones"] += 1
+    cache["entradas"].clear()
+
+def copiar_resultado(camino, estadisticas, segundos_acierto=None):
+    # el llamador recibe copias: modificar la ruta no toca la entrada guardada;
+    # en un acierto tiempo_segundos es lo que tardo la consulta a la cache
+    estadisticas = dict(estadisticas)
+    if "ruta" in estadisticas:
+        estadisticas["ruta"] = list(estadisticas["ruta"])
+    estadisticas["cache"] = segundos_acierto is not None
+    if segundos_acierto is not None:
+        estadisticas["tiempo_segundos"] = segundos_acierto
+    return (list(camino) if camino else camino), estadisticas
+
+def a_star_con_cache(cache, grafo, inicio, destino, linea_inicial=None, perfil=None):
+    costos = grafo["costos"] if perfil is None else perfil
+    clave = (inicio, destino, linea_inicial, costos["estacion_normal"], costos["transbordo"])
+    entradas = cache["entradas"]
+    
+    with cache["candado"]:
+        if cache["version_grafo"] != grafo["version"]:
+            limpiar_cache_rutas(cache)
+            cache["version_grafo"] = grafo["version"]
+        ahora = time.monotonic()
+        entrada = entradas.get(clave)
+        if entrada is not None:
+            ttl = cache["ttl_segundos"]
+            if ttl is not None and ahora - entrada[0] > ttl:
+                del entradas[clave]
+                cache["expirados"] += 1
+            else:
+                entradas.move_to_end(clave)
+                cache["aciertos"] += 1
+                return copiar_resultado(entrada[1], entrada[2], time.monotonic() - ahora)
+        cache["fallos"] += 1
+    
+    camino, estadisticas = a_star(grafo, inicio, destino, linea_inicial, perfil)
+    
+    with cache["candado"]:
+        if cache["version_grafo"] == grafo["version"]:
+            entradas[clave] = (ahora, camino, estadisticas)
+            if len(entradas) > cache["capacidad"]:
+                entradas.popitem(last=False)
+                cache["desalojos"] += 1
+    return copiar_resultado(camino, estadisticas)
+
+def reparar_cache_rutas(cache, comp):
+    # pone la cache al dia con los cierres del grafo compilado (con el candado tomado)
+    cambios = cambios_desde(comp, cache["version_afectaciones"]) if cache["version_afectaciones"] is not None else None
+    cache["version_afectaciones"] = comp.get("version_afectaciones", 0)
+    if cambios is None or not all(aumento for _, _, aumento in cambios):
+        limpiar_cache_rutas(cache)
+        return
+    # con solo aumentos, una ruta que no usa ningun arco cambiado sigue siendo optima
+    # (se compara por la estacion a la que llega cada arco cambiado)
+    llegadas = set()
+    for _, cambiados, _ in cambios:
+        for a in cambiados:
+            llegadas.add(comp["nombres"][comp["estado_estacion"][comp["arco_destino"][a]]])
+    entradas = cache["entradas"]
+    for clave in list(entradas):
+        camino = entradas[clave][1]
+        if camino and any(nombre in llegadas for nombre in camino[1:]):
+            del entradas[clave]
+            cache["reparaciones"] += 1
+
+def a_star_compilado_con_cache(cache, comp, inicio, destino, linea_inicial=None, perfil=None):
+    # como a_star_con_cache pero sobre el grafo compilado, que admite cierres;
+    # usar una cache distinta de la de a_star_con_cache
+    costos = comp["costos"] if perfil is None else perfil
+    clave = (inicio, destino, linea_inicial, costos["estacion_normal"], costos["transbordo"])
+    entradas = cache["entradas"]
+    
+    with cache["candado"]:
+        if cache["version_afectaciones"] != comp.get("version_afectaciones", 0):
+            reparar_cache_rutas(cache, comp)
+        version = cache["version_afectaciones"]
+        ahora = time.monotonic()
+        entrada = entradas.get(clave)
+        if entrada is not None:
+            ttl = cache["ttl_segundos"]
+            if ttl is not None and ahora - entrada[0] > ttl:
+                del entradas[clave]
+                cache["expirados"] += 1
+            else:
+                entradas.move_to_end(clave)
+                cache["aciertos"] += 1
+                return copiar_resultado(entrada[1], entrada[2], time.monotonic() - ahora)
+        cache["fallos"] += 1
+    
+    camino, estadisticas = a_star_compilado(comp, inicio, destino, linea_inicial, perfil,
+                                            heuristica_calibrada)
+    
+    with cache["candado"]:
+        if cache["version_afectaciones"] == version == comp.get("version_afectaciones", 0):
+            entradas[clave] = (ahora, camino, estadisticas)
+            if len(entradas) > cache["capacidad"]:
+                entradas.popitem(last=False)
+                cache["desalojos"] += 1
+    return copiar_resultado(camino, estadisticas)
+
+def estadisticas_cache_rutas(cache):
+    consultas = cache["aciertos"] + cache["fallos"]
+    return {
+        "tamano": len(cache["entradas"]),
+        "aciertos": cache["aciertos"],
+        "fallos": cache["fallos"],
+        "desalojos": cache["desalojos"],
+        "expirados": cache["expirados"],
+        "invalidaciones": cache["invalidaciones"],
+        "reparaciones": cache["reparaciones"],
+        "tasa_aciertos": cache["aciertos"] / consultas if consultas > 0 else 0
+    }
+
+
 # Visualizacion
 
-def visualizar_grafo_metro(grafo, ruta=None):    
+def visualizar_grafo_metro(grafo, ruta=None, archivo=None):
+    # con archivo (.png/.svg) se exporta sin ventana reusando el fondo ya
+    # dibujado del grafo (ver render_metro); sin archivo se abre la ventana
+    if archivo is not None:
+        import render_metro
+        return render_metro.renderizar_ruta(render_metro.lienzo_de(grafo), ruta, archivo)
+    
+    # matplotlib y networkx solo se cargan cuando se pide una visualizacion
+    import matplotlib.pyplot as plt
+    import networkx as nx
+    from matplotlib.patches import Patch
+    
     G = nx.Graph()
     pos = {}
     
@@ -435,7 +2932,6 @@ def visualizar_grafo_metro(grafo, ruta=None):
                  fontsize=14, fontweight='bold')
     
     # Leyenda
-    from matplotlib.patches import Patch
     legend_elements = [
         Patch(facecolor=colores_linea[1], edgecolor='black', label='Linea 1 (Rosa)'),
         Patch(facecolor=colores_linea[2], edgecolor='black', label='Linea 2 (Azul)'),
@@ -453,271 +2949,532 @@ def visualizar_grafo_metro(grafo, ruta=None):
 
 # Creacion grafo
 
-def crear_metro_cdmx_completo():
+# RED EN DISCO
+# Fuente editable (JSON, formato 1):
+#   {"formato": 1, "nombre": ..., "costos": {...},
+#    "estaciones": [[nombre, [lineas], [x, y]], ...],
+#    "lineas": [{"linea": 1, "nombre": ..., "conexiones": [[origen, destino, minutos], ...]}, ...]}
+# Copia compilada (.red junto a la fuente): los arreglos del grafo compilado.
+# Archivo: MAGIA | largo del encabezado (uint32) | encabezado JSON | arreglos
+# El encabezado guarda el sha256 de la fuente y el de los arreglos; si la
+# fuente cambia o la copia no cuadra, se reconstruye desde la fuente.
+
+MAGIA_RED = b"MCDXRED1"
+FORMATO_RED = 1
+DIRECTORIO_REDES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "redes")
+RUTA_RED_CDMX = os.path.join(DIRECTORIO_REDES, "metro_cdmx.json")
+
+# arreglos del grafo compilado en la copia; primero los de 8 bytes para
+# que todos queden alineados
+ARREGLOS_RED = [
+    ("x", "d"), ("y", "d"), ("ady_tiempo", "d"),
+    ("lineas_offsets", "i"), ("lineas_ids", "i"),
+    ("ady_offsets", "i"), ("ady_destino", "i"), ("ady_linea", "i"),
+    ("estado_offsets", "i"), ("estado_estacion", "i"), ("estado_linea", "i"),
+    ("arco_offsets", "i"), ("arco_destino", "i"),
+    ("inv_offsets", "i"), ("inv_origen", "i"), ("inv_arco", "i"),
+    ("es_transbordo", "b"), ("arco_penaliza", "b")
+]
+
+def construir_red(fuente):
+    # grafo a partir de la fuente JSON ya leida
+    if fuente.get("formato") != FORMATO_RED:
+        raise ValueError(f"Formato de red no soportado: {fuente.get('formato')}")
+    
     metro = crear_grafo()
+    metro["costos"].update(fuente.get("costos", {}))
+    for nombre, lineas, coords in fuente["estaciones"]:
+        if nombre in metro["estaciones"]:
+            raise ValueError(f"Estacion repetida en la red: {nombre}")
+        agregar_estacion(metro, nombre, lineas, tuple(coords))
+    for datos_linea in fuente["lineas"]:
+        for origen, destino, tiempo_min in datos_linea["conexiones"]:
+            if origen not in metro["estaciones"] or destino not in metro["estaciones"]:
+                raise ValueError(f"Conexion con estacion desconocida: {origen} - {destino}")
+            agregar_conexion(metro, origen, destino, tiempo_min, datos_linea["linea"])
+    return metro
+
+def guardar_fuente_red(grafo, ruta_archivo, nombre=""):
+    # escribe un grafo como fuente editable, una estacion o conexion por renglon
+    import json
     
-    # Linea 1 (ROSA) - Observatorio a Pantitlan 
-    estaciones_l1 = [
-        ("Observatorio", [1], (0, 50)),
-        ("Tacubaya", [1], (3, 51)),
-        ("Juanacatlan", [1], (6, 53)),
-        ("Chapultepec", [1], (9, 54)),
-        ("Sevilla", [1], (12, 55)),
-        ("Insurgentes", [1], (15, 55)),
-        ("Cuauhtemoc", [1], (18, 56)),
-        ("Balderas", [1, 3], (21, 56)),
-        ("Salto del Agua", [1], (24, 56)),
-        ("Isabel la Catolica", [1], (27, 55)),
-        ("Pino Suarez", [1, 2], (30, 55)),
-        ("Merced", [1], (33, 54)),
-        ("Candelaria", [1, 4], (36, 55)),
-        ("San Lazaro", [1], (39, 56)),
-        ("Moctezuma", [1], (42, 55)),
-        ("Balbuena", [1], (45, 54)),
-        ("Boulevard Puerto Aereo", [1], (48, 53)),
-        ("Gomez Farias", [1], (51, 52)),
-        ("Zaragoza", [1], (54, 51)),
-        ("Pantitlan", [1, 5], (57, 50)),
-    ]
+    # cada conexion aparece dos veces en la adyacencia; se escribe una
+    pendientes = defaultdict(int)
+    conexiones_por_linea = {}
+    for origen, vecinos in grafo["conexiones"].items():
+        for destino, tiempo_min, linea in vecinos:
+            clave = (destino, origen, tiempo_min, linea)
+            if pendientes[clave] > 0:
+                pendientes[clave] -= 1
+                continue
+            pendientes[(origen, destino, tiempo_min, linea)] += 1
+            conexiones_por_linea.setdefault(linea, []).append((origen, destino, tiempo_min))
     
-    conexiones_l1 = [
-        ("Observatorio", "Tacubaya", 2),
-        ("Tacubaya", "Juanacatlan", 2),
-        ("Juanacatlan", "Chapultepec", 2),
-        ("Chapultepec", "Sevilla", 2),
-        ("Sevilla", "Insurgentes", 2),
-        ("Insurgentes", "Cuauhtemoc", 2),
-        ("Cuauhtemoc", "Balderas", 2),
-        ("Balderas", "Salto del Agua", 2),
-        ("Salto del Agua", "Isabel la Catolica", 2),
-        ("Isabel la Catolica", "Pino Suarez", 2),
-        ("Pino Suarez", "Merced", 2),
-        ("Merced", "Candelaria", 2),
-        ("Candelaria", "San Lazaro", 2),
-        ("San Lazaro", "Moctezuma", 2),
-        ("Moctezuma", "Balbuena", 2),
-        ("Balbuena", "Boulevard Puerto Aereo", 2),
-        ("Boulevard Puerto Aereo", "Gomez Farias", 2),
-        ("Gomez Farias", "Zaragoza", 2),
-        ("Zaragoza", "Pantitlan", 2),
-    ]
+    texto = lambda valor: json.dumps(valor, ensure_ascii=False)
+    renglones = [f"    [{texto(nombre_est)}, {texto(est['lineas'])}, {texto(list(est['coords']))}]"
+                 for nombre_est, est in grafo["estaciones"].items()]
+    bloques = []
+    for linea, conexiones in conexiones_por_linea.items():
+        filas = ",\n".join(f"      [{texto(o)}, {texto(d)}, {texto(t)}]" for o, d, t in conexiones)
+        bloques.append(f'    {{"linea": {texto(linea)}, "conexiones": [\n{filas}\n    ]}}')
+    with open(ruta_archivo, "w", encoding="utf-8") as archivo:
+        archivo.write("{\n")
+        archivo.write(f'  "formato": {FORMATO_RED},\n')
+        archivo.write(f'  "nombre": {texto(nombre)},\n')
+        archivo.write(f'  "costos": {texto(grafo["costos"])},\n')
+        archivo.write('  "estaciones": [\n' + ",\n".join(renglones) + "\n  ],\n")
+        archivo.write('  "lineas": [\n' + ",\n".join(bloques) + "\n  ]\n}\n")
+
+def guardar_copia_red(comp, ruta_archivo, suma_fuente):
+    import hashlib
+    import json
     
-    # Linea 2 (AZUL) - Cuatro Caminos a Tasqueña 
-    estaciones_l2 = [
-        ("Cuatro Caminos", [2], (0, 80)),
-        ("Panteones", [2], (3, 79)),
-        ("Tacuba", [2], (7, 79)),
-        ("Cuitlahuac", [2], (9, 76)),
-        ("Popotla", [2], (11, 74)),
-        ("Colegio Militar", [2], (13, 72)),
-        ("Normal", [2], (15, 70)),
-        ("San Cosme", [2], (17, 67)),
-        ("Revolucion", [2], (19, 66)),
-        ("Hidalgo", [2, 3], (21, 64)),
-        ("Bellas Artes", [2], (24, 62)),
-        ("Allende", [2], (26, 60)),
-        ("Zocalo", [2], (27, 58)),
-        # Pino Suarez ya existe en L1
-        ("San Antonio Abad", [2], (31, 50)),
-        ("Chabacano", [2], (31, 45)),
-        ("Viaducto", [2], (31, 40)),
-        ("Xola", [2], (31, 35)),
-        ("Villa de Cortes", [2], (31, 30)),
-        ("Nativitas", [2], (31, 25)),
-        ("Portales", [2], (31, 20)),
-        ("Ermita", [2], (31, 15)),
-        ("General Anaya", [2], (31, 10)),
-        ("Tasqueña", [2], (31, 5)),
-    ]
+    datos = b"".join(comp[nombre].tobytes() for nombre, _ in ARREGLOS_RED)
+    encabezado = json.dumps({
+        "formato": FORMATO_RED,
+        "orden_bytes": sys.byteorder,
+        "suma_fuente": suma_fuente,
+        "suma_datos": hashlib.sha256(datos).hexdigest(),
+        "nombres": comp["nombres"],
+        "lineas": comp["lineas"],
+        "costos": dict(comp["costos"]),
+        "largos": [len(comp[nombre]) for nombre, _ in ARREGLOS_RED]
+    }, ensure_ascii=False).encode("utf-8")
+    relleno = -(len(MAGIA_RED) + 4 + len(encabezado)) % 8
+    # se escribe aparte y se renombra para que nadie lea una copia a medias
+    temporal = ruta_archivo + ".tmp"
+    with open(temporal, "wb") as archivo:
+        archivo.write(MAGIA_RED)
+        archivo.write(struct.pack("<I", len(encabezado) + relleno))
+        archivo.write(encabezado + b" " * relleno)
+        archivo.write(datos)
+    os.replace(temporal, ruta_archivo)
+
+def cargar_copia_red(ruta_archivo, suma_fuente=None):
+    # grafo compilado sobre la copia mapeada en memoria: los arreglos son vistas
+    # de solo lectura del mapa, sin copiarlos; ValueError si la copia no sirve
+    import hashlib
+    import json
     
-    conexiones_l2 = [
-        ("Cuatro Caminos", "Panteones", 2),
-        ("Panteones", "Tacuba", 2),
-        ("Tacuba", "Cuitlahuac", 2),
-        ("Cuitlahuac", "Popotla", 2),
-        ("Popotla", "Colegio Militar", 2),
-        ("Colegio Militar", "Normal", 2),
-        ("Normal", "San Cosme", 2),
-        ("San Cosme", "Revolucion", 2),
-        ("Revolucion", "Hidalgo", 2),
-        ("Hidalgo", "Bellas Artes", 2),
-        ("Bellas Artes", "Allende", 2),
-        ("Allende", "Zocalo", 2),
-        ("Zocalo", "Pino Suarez", 2),
-        ("Pino Suarez", "San Antonio Abad", 2),
-        ("San Antonio Abad", "Chabacano", 2),
-        ("Chabacano", "Viaducto", 2),
-        ("Viaducto", "Xola", 2),
-        ("Xola", "Villa de Cortes", 2),
-        ("Villa de Cortes", "Nativitas", 2),
-        ("Nativitas", "Portales", 2),
-        ("Portales", "Ermita", 2),
-        ("Ermita", "General Anaya", 2),
-        ("General Anaya", "Tasqueña", 2),
-    ]
+    with open(ruta_archivo, "rb") as archivo:
+        mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        if mapa[:len(MAGIA_RED)] != MAGIA_RED:
+            raise ValueError(f"{ruta_archivo} no es una copia compilada de red")
+        inicio = len(MAGIA_RED) + 4
+        largo = struct.unpack("<I", mapa[len(MAGIA_RED):inicio])[0]
+        encabezado = json.loads(mapa[inicio:inicio + largo])
+        if encabezado["formato"] != FORMATO_RED or encabezado["orden_bytes"] != sys.byteorder:
+            raise ValueError("La copia se genero con otro formato u orden de bytes")
+        if suma_fuente is not None and encabezado["suma_fuente"] != suma_fuente:
+            raise ValueError("La copia no corresponde a la fuente")
+        with memoryview(mapa) as vista:
+            if hashlib.sha256(vista[inicio + largo:]).hexdigest() != encabezado["suma_datos"]:
+                raise ValueError("Suma de verificacion invalida en la copia")
+    except Exception:
+        mapa.close()
+        raise
     
-    # Linea 3 (VERDE) - Indios Verdes a Universidad
-    estaciones_l3 = [
-        ("Indios Verdes", [3], (36, 90)),
-        ("Deportivo 18 de Marzo", [3], (34, 85)),
-        ("Potrero", [3], (32, 80)),
-        ("La Raza", [3, 5], (30, 75)),
-        ("Tlatelolco", [3], (28, 70)),
-        ("Guerrero", [3], (24, 67)),
-        # Hidalgo L2
-        ("Juarez", [3], (21, 60)),
-        # Balderas L1
-        ("Niños Heroes", [3], (21, 52)),
-        ("Hospital General", [3], (19, 49)),
-        ("Centro Medico", [3], (19, 46)),
-        ("Etiopia", [3], (18, 41)),
-        ("Eugenia", [3], (17, 36)),
-        ("Division del Norte", [3], (16, 31)),
-        ("Zapata", [3], (15, 26)),
-        ("Coyoacan", [3], (14, 21)),
-        ("Viveros", [3], (12, 16)),
-        ("Miguel angel de Quevedo", [3], (13, 11)),
-        ("Copilco", [3], (12, 6)),
-        ("Universidad", [3], (11, 1)),
-    ]
+    comp = {
+        "nombres": encabezado["nombres"],
+        "indice": {nombre: i for i, nombre in enumerate(encabezado["nombres"])},
+        "lineas": encabezado["lineas"],
+        "indice_linea": {linea: i for i, linea in enumerate(encabezado["lineas"])},
+        "costos": encabezado["costos"],
+        "pesos": {}
+    }
+    vista = memoryview(mapa)
+    pos = inicio + largo
+    for (nombre, tipo), n in zip(ARREGLOS_RED, encabezado["largos"]):
+        tam = n * array(tipo).itemsize
+        comp[nombre] = vista[pos:pos + tam].cast(tipo)
+        pos = pos + tam
+    # el mapa vive mientras viva comp; va al final para que al liberar comp
+    # se suelten antes las vistas que lo usan
+    comp["mapa_copia"] = mapa
+    return comp
+
+def grafo_desde_compilado(comp):
+    # grafo de diccionarios en una pasada sobre los arreglos; comparte costos con comp
+    metro = crear_grafo()
+    metro["costos"] = comp["costos"]
+    nombres = comp["nombres"]
+    lineas = comp["lineas"]
+    lineas_offsets = comp["lineas_offsets"]
+    ady_offsets = comp["ady_offsets"]
+    for e, nombre in enumerate(nombres):
+        metro["estaciones"][nombre] = {
+            "lineas": [lineas[i] for i in comp["lineas_ids"][lineas_offsets[e]:lineas_offsets[e + 1]]],
+            "coords": (comp["x"][e], comp["y"][e]),
+            "es_transbordo": bool(comp["es_transbordo"][e])
+        }
+        if ady_offsets[e] < ady_offsets[e + 1]:
+            metro["conexiones"][nombre] = [
+                (nombres[comp["ady_destino"][a]], comp["ady_tiempo"][a], lineas[comp["ady_linea"][a]])
+                for a in range(ady_offsets[e], ady_offsets[e + 1])
+            ]
+    return metro
+
+def cargar_red(ruta_fuente=RUTA_RED_CDMX, ruta_copia=None, guardar_copia=True):
+    # regresa (grafo, comp); usa la copia compilada si esta al dia y si no la
+    # reconstruye desde la fuente y (con guardar_copia) la vuelve a escribir
+    import hashlib
+    import json
     
-    conexiones_l3 = [
-        ("Indios Verdes", "Deportivo 18 de Marzo", 2),
-        ("Deportivo 18 de Marzo", "Potrero", 2),
-        ("Potrero", "La Raza", 2),
-        ("La Raza", "Tlatelolco", 2),
-        ("Tlatelolco", "Guerrero", 2),
-        ("Guerrero", "Hidalgo", 2),
-        ("Hidalgo", "Juarez", 2),
-        ("Juarez", "Balderas", 2),
-        ("Balderas", "Niños Heroes", 2),
-        ("Niños Heroes", "Hospital General", 2),
-        ("Hospital General", "Centro Medico", 2),
-        ("Centro Medico", "Etiopia", 2),
-        ("Etiopia", "Eugenia", 2),
-        ("Eugenia", "Division del Norte", 2),
-        ("Division del Norte", "Zapata", 2),
-        ("Zapata", "Coyoacan", 2),
-        ("Coyoacan", "Viveros", 2),
-        ("Viveros", "Miguel angel de Quevedo", 2),
-        ("Miguel angel de Quevedo", "Copilco", 2),
-        ("Copilco", "Universidad", 2),
-    ]
+    if ruta_copia is None:
+        ruta_copia = os.path.splitext(ruta_fuente)[0] + ".red"
+    with open(ruta_fuente, "rb") as archivo:
+        contenido = archivo.read()
+    suma_fuente = hashlib.sha256(contenido).hexdigest()
     
-    # Linea 4 (CIAN) - Martin Carrera a Santa Anita 
-    estaciones_l4 = [
-        ("Martin Carrera", [4], (42, 85)),
-        ("Talisman", [4], (44, 80)),
-        ("Bondojito", [4], (50, 73)),
-        ("Consulado", [4, 5], (50, 69)),
-        ("Canal del Norte", [4], (47, 64)),
-        ("Morelos", [4], (44, 60)),
-        # Candelaria L1
-        ("Fray Servando", [4], (34, 50)),
-        ("Jamaica", [4], (34, 45)),
-        ("Santa Anita", [4], (34, 40)),
-    ]
+    try:
+        comp = cargar_copia_red(ruta_copia, suma_fuente)
+        return grafo_desde_compilado(comp), comp
+    except (OSError, ValueError):
+        pass
     
-    conexiones_l4 = [
-        ("Martin Carrera", "Talisman", 2),
-        ("Talisman", "Bondojito", 2),
-        ("Bondojito", "Consulado", 2),
-        ("Consulado", "Canal del Norte", 2),
-        ("Canal del Norte", "Morelos", 2),
-        ("Morelos", "Candelaria", 2),
-        ("Candelaria", "Fray Servando", 2),
-        ("Fray Servando", "Jamaica", 2),
-        ("Jamaica", "Santa Anita", 2),
-    ]
+    metro = construir_red(json.loads(contenido))
+    comp = compilar_grafo(metro)
+    if not guardar_copia:
+        return metro, comp
+    try:
+        guardar_copia_red(comp, ruta_copia, suma_fuente)
+    except OSError:
+        # directorio de solo lectura: se trabaja sin copia
+        pass
+    return metro, comp
+
+# redes de crear_metro_cdmx_completo: ruta -> ((mtime, tamaño) de la fuente, grafo)
+redes_cargadas = {}
+
+def crear_metro_cdmx_completo(ruta_fuente=RUTA_RED_CDMX):
+    # la red de ruta_fuente, cargada una vez por version de la fuente (se recarga
+    # si cambia su fecha o tamaño); sin escribir la copia .red. El grafo se
+    # comparte entre llamadas: no se debe modificar
+    estado = os.stat(ruta_fuente)
+    version = (estado.st_mtime_ns, estado.st_size)
+    cargada = redes_cargadas.get(ruta_fuente)
+    if cargada is None or cargada[0] != version:
+        cargada = (version, cargar_red(ruta_fuente, guardar_copia=False)[0])
+        redes_cargadas[ruta_fuente] = cargada
+    return cargada[1]
+
+
+# Alias para mantener compatibilidad
+def crear_metro_cdmx_simplificado():
+    return crear_metro_cdmx_completo()
+
+
+# INDICE DE NOMBRES DE ESTACIONES
+# Resuelve el texto que escribe el usuario ("tasquena", "ninos heroes",
+# "hidal", "tasqeña") a los nombres exactos de grafo["estaciones"]. Las claves
+# se normalizan sin acentos, mayusculas ni signos. El indice tiene tres partes:
+#   exactos: clave -> estaciones
+#   trie de prefijos (para autocompletar): por cada palabra del nombre se
+#       inserta la clave desde esa palabra, asi "quev" encuentra "Miguel angel
+#       de Quevedo"; cada nodo guarda sus entradas ya ordenadas por rango
+#       (nombre completo antes que palabra, luego mas lineas, luego mas corto)
+#       y el trie llega a PROFUNDIDAD_TRIE letras; despues se filtra el ultimo nodo
+#   trigramas (para errores de dedo): una estacion es candidata si comparte
+#       al menos UMBRAL_APROXIMADA de los trigramas de la consulta; las que
+#       comparten mas se ordenan por distancia de edicion
+# Resultados: exacta > prefijo > palabra; las aproximadas solo se buscan si no
+# hubo ninguna de las otras. Todo se puede filtrar por linea.
+
+PROFUNDIDAD_TRIE = 8
+UMBRAL_APROXIMADA = 0.5
+# candidatos (los de mas trigramas en comun) que se comparan letra por letra
+CANDIDATOS_APROXIMADA = 8
+# puntaje minimo de una aproximada (1 - errores / largo); resolver_estacion
+# solo acepta una desde UMBRAL_RESOLVER (1 error en 4 letras)
+PUNTAJE_MINIMO = 0.5
+UMBRAL_RESOLVER = 0.75
+
+def normalizar_nombre(texto):
+    # sin acentos, en minusculas, los signos como espacios y sin espacios de sobra
+    import unicodedata
     
-    # Linea 5 (AMARILLA) - Politecnico a Pantitlan
-    estaciones_l5 = [
-        ("Politecnico", [5], (21, 90)),
-        ("Instituto del Petroleo", [5], (24, 85)),
-        ("Autobuses del Norte", [5], (27, 80)),
-        # La Raza L3
-        ("Misterios", [5], (35, 73)),
-        ("tranquila Gomez", [5], (40, 71)),
-        # Consulado L4
-        ("Eduardo Molina", [5], (52, 65)),
-        ("Aragon", [5], (53, 62)),
-        ("Oceania", [5], (54, 59)),
-        ("Terminal Aerea", [5], (55, 56)),
-        ("Hangares", [5], (56, 53)),
-        # Pantitlan L1
-    ]
+    descompuesto = unicodedata.normalize("NFKD", texto)
+    letras = "".join(c if c.isalnum() else " " for c in descompuesto if not unicodedata.combining(c))
+    return " ".join(letras.casefold().split())
+
+def trigramas(clave):
+    # con relleno al inicio para que las primeras letras pesen como prefijo
+    relleno = "  " + clave
+    return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+
+def crear_indice_nombres(grafo):
+    nombres = list(grafo["estaciones"])
+    claves = [normalizar_nombre(nombre) for nombre in nombres]
+    lineas = [frozenset(grafo["estaciones"][nombre]["lineas"]) for nombre in nombres]
     
-    conexiones_l5 = [
-        ("Politecnico", "Instituto del Petroleo", 2),
-        ("Instituto del Petroleo", "Autobuses del Norte", 2),
-        ("Autobuses del Norte", "La Raza", 2),
-        ("La Raza", "Misterios", 2),
-        ("Misterios", "tranquila Gomez", 2),
-        ("tranquila Gomez", "Consulado", 2),
-        ("Consulado", "Eduardo Molina", 2),
-        ("Eduardo Molina", "Aragon", 2),
-        ("Aragon", "Oceania", 2),
-        ("Oceania", "Terminal Aerea", 2),
-        ("Terminal Aerea", "Hangares", 2),
-        ("Hangares", "Pantitlan", 2),
-    ]
+    exactos = {}
+    for i, clave in enumerate(claves):
+        exactos.setdefault(clave, []).append(i)
     
-    # Agregar todas las estaciones
-    for estacion, lineas, coords in estaciones_l1:
-        agregar_estacion(metro, estacion, lineas, coords)
-    for estacion, lineas, coords in estaciones_l2:
-        if estacion not in metro["estaciones"]:
-            agregar_estacion(metro, estacion, lineas, coords)
-    for estacion, lineas, coords in estaciones_l3:
-        if estacion not in metro["estaciones"]:
-            agregar_estacion(metro, estacion, lineas, coords)
-    for estacion, lineas, coords in estaciones_l4:
-        if estacion not in metro["estaciones"]:
-            agregar_estacion(metro, estacion, lineas, coords)
-    for estacion, lineas, coords in estaciones_l5:
-        if estacion not in metro["estaciones"]:
-            agregar_estacion(metro, estacion, lineas, coords)
-    
-    # Agregar conexiones
-    for origen, destino, dist in conexiones_l1:
-        agregar_conexion(metro, origen, destino, dist, 1)
-    for origen, destino, dist in conexiones_l2:
-        agregar_conexion(metro, origen, destino, dist, 2)
-    for origen, destino, dist in conexiones_l3:
-        agregar_conexion(metro, origen, destino, dist, 3)
-    for origen, destino, dist in conexiones_l4:
-        agregar_conexion(metro, origen, destino, dist, 4)
-    for origen, destino, dist in conexiones_l5:
-        agregar_conexion(metro, origen, destino, dist, 5)
+    # entradas (estacion, inicio de la palabra) en orden de rango
+    entradas = []
+    for i, clave in enumerate(claves):
+        entradas.append((0, i, 0))
+        entradas.extend((1, i, j + 1) for j, c in enumerate(clave) if c == " ")
+    entradas.sort(key=lambda entrada: (entrada[0], -len(lineas[entrada[1]]),
+                                       len(claves[entrada[1]]), claves[entrada[1]]))
+    entrada_estacion = array("i", (i for _, i, _ in entradas))
+    entrada_inicio = array("i", (inicio for _, _, inicio in entradas))
     
-    return metro
+    # nodo: {letra: nodo, None: [entrada, ...]}
+    trie = {}
+    for k, (_, i, inicio) in enumerate(entradas):
+        nodo = trie
+        for c in claves[i][inicio:inicio + PROFUNDIDAD_TRIE]:
+            nodo = nodo.setdefault(c, {})
+            nodo.setdefault(None, []).append(k)
+    
+    por_trigrama = {}
+    for i, clave in enumerate(claves):
+        for trigrama in trigramas(clave):
+            por_trigrama.setdefault(trigrama, set()).add(i)
+    
+    return {
+        "version": grafo["version"],
+        "nombres": nombres,
+        "conjunto": frozenset(nombres),
+        "claves": claves,
+        "lineas": lineas,
+        "exactos": exactos,
+        "entrada_estacion": entrada_estacion,
+        "entrada_inicio": entrada_inicio,
+        "trie": trie,
+        "por_trigrama": por_trigrama
+    }
 
+def resultado_nombre(indice, i, coincidencia, puntaje):
+    return {
+        "nombre": indice["nombres"][i],
+        "lineas": sorted(indice["lineas"][i], key=str),
+        "coincidencia": coincidencia,
+        "puntaje": puntaje
+    }
 
-# Alias para mantener compatibilidad
-def crear_metro_cdmx_simplificado():
-    return crear_metro_cdmx_completo()
+def buscar_por_prefijo(indice, clave, limite, linea, vistas):
+    nodo = indice["trie"]
+    for c in clave[:PROFUNDIDAD_TRIE]:
+        nodo = nodo.get(c)
+        if nodo is None:
+            return []
+    claves = indice["claves"]
+    lineas = indice["lineas"]
+    entrada_estacion = indice["entrada_estacion"]
+    entrada_inicio = indice["entrada_inicio"]
+    profundo = len(clave) > PROFUNDIDAD_TRIE
+    resultados = []
+    for k in nodo[None]:
+        i = entrada_estacion[k]
+        if i in vistas or (linea is not None and linea not in lineas[i]):
+            continue
+        inicio = entrada_inicio[k]
+        if profundo and not claves[i].startswith(clave, inicio):
+            continue
+        vistas.add(i)
+        resultados.append(resultado_nombre(indice, i, "prefijo" if inicio == 0 else "palabra",
+                                           len(clave) / len(claves[i])))
+        if len(resultados) >= limite:
+            break
+    return resultados
+
+def distancia_edicion(a, b):
+    # Levenshtein contando un intercambio de letras vecinas como un solo error,
+    # con una columna de la matriz como bits de un entero (Hyyro): unas cuantas
+    # operaciones por letra de b en vez de una por celda
+    if not a:
+        return len(b)
+    posiciones = {}
+    for i, c in enumerate(a):
+        posiciones[c] = posiciones.get(c, 0) | (1 << i)
+    todos = (1 << len(a)) - 1
+    ultimo = 1 << (len(a) - 1)
+    vp = todos
+    vn = 0
+    d0 = 0
+    pm_previa = 0
+    distancia = len(a)
+    for c in b:
+        pm = posiciones.get(c, 0)
+        intercambio = (((~d0 & pm) << 1) & pm_previa)
+        d0 = ((((pm & vp) + vp) ^ vp) | pm | vn | intercambio) & todos
+        hp = (vn | ~(d0 | vp)) & todos
+        hn = d0 & vp
+        if hp & ultimo:
+            distancia = distancia + 1
+        elif hn & ultimo:
+            distancia = distancia - 1
+        hp = ((hp << 1) | 1) & todos
+        hn = (hn << 1) & todos
+        vp = (hn | ~(d0 | hp)) & todos
+        vn = hp & d0
+        pm_previa = pm
+    return distancia
+
+def buscar_aproximada(indice, clave, limite, linea):
+    por_trigrama = indice["por_trigrama"]
+    # los trigramas de la consulta del menos al mas comun
+    consulta = sorted(trigramas(clave), key=lambda t: len(por_trigrama.get(t, ())))
+    minimo = len(consulta) - int((1.0 - UMBRAL_APROXIMADA) * len(consulta))
+    # se cuentan todos menos los mas comunes; quien no junta ahi minimo - comunes
+    # ya no llega, y para los que quedan los comunes se cuentan por interseccion
+    comunes = min(minimo - 1, len(consulta) // 3)
+    corte = len(consulta) - comunes
+    cuenta = Counter()
+    for trigrama in consulta[:corte]:
+        cuenta.update(por_trigrama.get(trigrama, ()))
+    lineas = indice["lineas"]
+    candidatos = {i for i, n in cuenta.items()
+                  if n >= minimo - comunes and (linea is None or linea in lineas[i])}
+    for trigrama in consulta[corte:]:
+        if trigrama in por_trigrama:
+            cuenta.update(candidatos.intersection(por_trigrama[trigrama]))
+    claves = indice["claves"]
+    contados = [(-cuenta[i], len(claves[i]), i) for i in candidatos if cuenta[i] >= minimo]
+    
+    puntuados = []
+    for _, _, i in heapq.nsmallest(CANDIDATOS_APROXIMADA, contados):
+        largo = max(len(clave), len(claves[i]))
+        errores = distancia_edicion(clave, claves[i])
+        if errores <= (1.0 - PUNTAJE_MINIMO) * largo:
+            puntuados.append((errores / largo, len(claves[i]), claves[i], i))
+    puntuados.sort()
+    return [resultado_nombre(indice, i, "aproximada", 1.0 - error)
+            for error, _, _, i in puntuados[:limite]]
+
+def buscar_estaciones(indice, texto, limite=10, linea=None):
+    # [{"nombre", "lineas", "coincidencia", "puntaje"}, ...] del mejor al peor;
+    # linea: solo estaciones de esa linea
+    clave = normalizar_nombre(texto)
+    if not clave:
+        return []
+    vistas = set()
+    resultados = []
+    for i in indice["exactos"].get(clave, ()):
+        if linea is None or linea in indice["lineas"][i]:
+            vistas.add(i)
+            resultados.append(resultado_nombre(indice, i, "exacta", 1.0))
+    if len(resultados) < limite:
+        resultados.extend(buscar_por_prefijo(indice, clave, limite - len(resultados), linea, vistas))
+    if not resultados:
+        resultados = buscar_aproximada(indice, clave, limite, linea)
+    return resultados[:limite]
+
+def autocompletar(indice, prefijo, limite=10, linea=None):
+    # nombres que empiezan (el nombre o alguna de sus palabras) con el prefijo
+    clave = normalizar_nombre(prefijo)
+    if not clave:
+        return []
+    return [r["nombre"] for r in buscar_por_prefijo(indice, clave, limite, linea, set())]
+
+def resolver_estacion(indice, texto, linea=None):
+    # nombre exacto de la estacion si el texto la identifica sin ambiguedad, si no
+    # None. Para rutear solo valen el nombre normalizado o una aproximada desde
+    # UMBRAL_RESOLVER; un prefijo ("x", "hidal") no basta, queda como sugerencia
+    if texto in indice["conjunto"]:
+        return texto
+    clave = normalizar_nombre(texto)
+    if not clave:
+        return None
+    exactas = [i for i in indice["exactos"].get(clave, ()) if linea is None or linea in indice["lineas"][i]]
+    if exactas:
+        return indice["nombres"][exactas[0]] if len(exactas) == 1 else None
+    resultados = buscar_aproximada(indice, clave, 2, linea)
+    if not resultados or resultados[0]["puntaje"] < UMBRAL_RESOLVER:
+        return None
+    mejor = resultados[0]
+    unico = len(resultados) == 1 or resultados[1]["puntaje"] < mejor["puntaje"]
+    return mejor["nombre"] if unico else None
+
+
+# Red compartida entre llamadas a func; es de solo lectura, cada consulta
+# lleva su propio perfil de costos
+metro_compartido = None
+metro_compilado = None
+metro_raptor = None
+indice_nombres = None
+indice_espacial = None
+cache_rutas = crear_cache_rutas()
+
+def obtener_metro():
+    # la primera llamada carga la red (y su version compilada) desde disco
+    global metro_compartido, metro_compilado
+    if metro_compartido is None:
+        metro_compartido, metro_compilado = cargar_red(RUTA_RED_CDMX)
+    return metro_compartido
+
+def obtener_metro_compilado():
+    obtener_metro()
+    return metro_compilado
+
+def obtener_raptor():
+    # patrones de linea de la red compartida (ver RAPTOR)
+    global metro_raptor
+    if metro_raptor is None or metro_raptor["comp"] is not obtener_metro_compilado():
+        metro_raptor = preparar_raptor(obtener_metro_compilado())
+    return metro_raptor
+
+def obtener_indice_nombres():
+    # indice de nombres de la red compartida; se rehace si cambia su version
+    global indice_nombres
+    metro = obtener_metro()
+    if indice_nombres is None or indice_nombres["version"] != metro["version"]:
+        indice_nombres = crear_indice_nombres(metro)
+    return indice_nombres
+
+def obtener_indice_espacial():
+    # reticula de estaciones de la red compartida (ver INDICE ESPACIAL)
+    global indice_espacial
+    if indice_espacial is None or indice_espacial["comp"] is not obtener_metro_compilado():
+        indice_espacial = crear_indice_espacial(obtener_metro_compilado())
+    return indice_espacial
 
 
 def func(inicio, destino, hora, prisa, accesibilidad):
     print("SISTEMA INTELIGENTE PARA EL METRO CDMX")
     print("Algoritmos: A* + Logica de Primer Orden")
     
-    # Crear grafo del metro
-    metro = crear_metro_cdmx_simplificado()
+    # Grafo del metro (se construye una sola vez)
+    if sumidero_metricas is not None:
+        inicio_ns = time.perf_counter_ns()
+    metro = obtener_metro()
+    if sumidero_metricas is not None:
+        emitir_fase("construccion", time.perf_counter_ns() - inicio_ns)
     print(f"\nGrafo creado: {len(metro['estaciones'])} estaciones")
-    
-    # PRIMERO: Aplicar logica de primer orden para modificar los costos
+
+    # nombres como los escribe el usuario ("tasquena", "ninos heroes")
+    indice = obtener_indice_nombres()
+    for texto in (inicio, destino):
+        if resolver_estacion(indice, texto) is None:
+            sugerencias = [r["nombre"] for r in buscar_estaciones(indice, texto, 5)]
+            print(f"\nEstacion no encontrada: {texto}")
+            if sugerencias:
+                print(f"  Quiza: {', '.join(sugerencias)}")
+            return
+    inicio = resolver_estacion(indice, inicio)
+    destino = resolver_estacion(indice, destino)
+
+    # PRIMERO: Aplicar logica de primer orden para obtener el perfil de costos
+    if sumidero_metricas is not None:
+        inicio_ns = time.perf_counter_ns()
     contexto = aplicar_logica_primer_orden(metro, hora, prisa, accesibilidad)
+    perfil = contexto["perfil"]
+    if sumidero_metricas is not None:
+        emitir_fase("inferencia", time.perf_counter_ns() - inicio_ns)
     
-    # SEGUNDO: Ejecutar A* con los costos ya modificados
+    # SEGUNDO: Ejecutar A* con los costos del perfil
     print("\n--- A* ---")
     print(f"Origen: {inicio}")
     print(f"Destino: {destino}")
     print(f"\nBuscando ruta con costos modificados...")
-    print(f"  Costo estacion: {metro['costos']['estacion_normal']:.1f} min")
-    print(f"  Costo transbordo: {metro['costos']['transbordo']:.1f} min")
+    print(f"  Costo estacion: {perfil['estacion_normal']:.1f} min")
+    print(f"  Costo transbordo: {perfil['transbordo']:.1f} min")
     
-    ruta, stats = a_star(metro, inicio, destino)
+    ruta, stats = a_star_con_cache(cache_rutas, metro, inicio, destino, perfil=perfil)
     
     if ruta:
         print(f"\nRuta encontrada:")
@@ -736,32 +3493,513 @@ def func(inicio, destino, hora, prisa, accesibilidad):
         print(f"  {stats}")
 
 
-print("MENU - SISTEMA DE NAVEGACIoN DEL METRO CDMX")
-print("Lineas disponibles: 1 (Rosa), 2 (Azul), 3 (Verde), 4 (Cian), 5 (Amarilla)")
-while True: 
-    linea = input("\nSelecciona la linea del metro (1-5) o 0 para salir: ")
-    if linea in ['1', '2', '3', '4', '5']:
-        print(f"\nHas seleccionado la linea {linea}. Estaciones disponibles:")
-        metro = crear_metro_cdmx_simplificado()
-        estaciones_linea = [nombre for nombre, est in metro["estaciones"].items() if int(linea) in est["lineas"]]
-        print(", ".join(estaciones_linea))
-        inicio = input("\nIngresa la estacion de origen: ")
-        lineaD = input("Selecciona la linea de destino: ")
-        if lineaD in ['1', '2', '3', '4', '5']:
-            estaciones_lineaD = [nombre for nombre, est in metro["estaciones"].items() if int(lineaD) in est["lineas"]]
-            print(f"\nHas seleccionado la linea {lineaD}. Estaciones disponibles:")
-            print(", ".join(estaciones_lineaD))
-            destino = input("Ingresa la estacion de destino: ")
-            hora = int(input("Define la hora actual (0-23): "))
-            prisa_input = input("¿Tienes prisa? (si/no): ").strip().lower()
-            prisa = prisa_input == 'si'
-            accesibilidad_input = input("¿Necesitas accesibilidad? (si/no): ").strip().lower()
-            accesibilidad = accesibilidad_input == 'si'
-            func(inicio, destino, hora, prisa, accesibilidad)
-        else:
-            print("Linea de destino no valida. Por favor, selecciona una linea entre 1 y 5.")
-    elif linea == '0':
-        print("\n¡Hasta luego!")
-        break  
+# RUTAS EN LOTE
+# Una sola red compilada para todo el lote; la inferencia se hace una vez por
+# (hora, prisa, accesibilidad) y las consultas se agrupan por perfil de costos.
+# Con un oraculo cargado, las consultas de un perfil precalculado no buscan.
+
+def rutas_multiples(consultas, grafo=None, tam_bloque=1024, comp=None, heuristica=None, oraculo=None):
+    # consultas: iterable de (inicio, destino, hora, prisa, accesibilidad)
+    # genera un diccionario por consulta, sin imprimir nada
+    # comp: red ya compilada (p. ej. la de un trabajador del pool, ver POOL DE PROCESOS)
+    medir = sumidero_metricas is not None
+    if medir:
+        inicio_ns = time.perf_counter_ns()
+    if comp is None and grafo is None:
+        comp = obtener_metro_compilado()
+    elif comp is None:
+        comp = compilar_grafo(grafo)
+    if medir:
+        emitir_fase("construccion", time.perf_counter_ns() - inicio_ns)
+    
+    contextos = {}
+    consultas = iter(consultas)
+    indice = 0
+    while True:
+        bloque = list(itertools.islice(consultas, tam_bloque))
+        if not bloque:
+            return
+        
+        # agrupar el bloque por perfil de costos
+        grupos = {}
+        for inicio, destino, hora, prisa, accesibilidad in bloque:
+            clave_contexto = (hora, bool(prisa), bool(accesibilidad))
+            if clave_contexto not in contextos:
+                if medir:
+                    inicio_ns = time.perf_counter_ns()
+                contexto = contexto_precalculado(hora, prisa, accesibilidad)
+                contextos[clave_contexto] = (contexto, crear_perfil_costos(comp["costos"], contexto))
+                if medir:
+                    emitir_fase("inferencia", time.perf_counter_ns() - inicio_ns)
+            contexto, perfil = contextos[clave_contexto]
+            clave_perfil = (perfil["estacion_normal"], perfil["transbordo"])
+            grupos.setdefault(clave_perfil, []).append((indice, inicio, destino, clave_contexto, contexto, perfil))
+            indice = indice + 1
+        
+        for miembros in grupos.values():
+            if heuristica is heuristica_calibrada_vectorizada:
+                # consultas al mismo destino seguidas: reusan sus cotas (ver HEURISTICAS)
+                miembros.sort(key=lambda miembro: miembro[2])
+            for indice_consulta, inicio, destino, clave_contexto, contexto, perfil in miembros:
+                hora = clave_contexto[0]
+                estadisticas = {"error": "Perfil no precalculado"}
+                if oraculo is not None:
+                    camino, estadisticas = consultar_oraculo(oraculo, inicio, destino, *clave_contexto)
+                if estadisticas.get("error") == "Perfil no precalculado":
+                    camino, estadisticas = a_star_compilado(comp, inicio, destino, perfil=perfil,
+                                                            heuristica=heuristica)
+                yield {
+                    "indice": indice_consulta,
+                    "inicio": inicio,
+                    "destino": destino,
+                    "hora": hora,
+                    "ruta": camino,
+                    "costo_total": estadisticas.get("costo_total"),
+                    "condiciones": list(contexto["condiciones_activas"]),
+                    "costos": dict(perfil),
+                    "estadisticas": estadisticas
+                }
+
+# Nombre en ingles usado por los clientes del servicio
+route_many = rutas_multiples
+
+
+# POOL DE PROCESOS CON EL GRAFO EN MEMORIA COMPARTIDA
+# Para repartir consultas entre nucleos sin que cada proceso reconstruya o
+# deserialice la red. El proceso principal copia una sola vez a un bloque de
+# multiprocessing.shared_memory los arreglos del grafo compilado (ARREGLOS_RED),
+# las tablas de landmarks de cada perfil (para heuristica_alt) y, si se da, el
+# oraculo. A los trabajadores solo se les manda un descriptor chico (nombres,
+# lineas, costos y donde empieza cada arreglo); cada uno se adjunta al bloque
+# por nombre y arma su comp con memoryviews de solo lectura, sin copiar.
+# Lo que un trabajador calcula despues (pesos por perfil, heuristicas,
+# cierres) es solo suyo. Quien crea el pool lo cierra con cerrar_pool_rutas,
+# que tambien libera el bloque.
+
+# trabajador del pool: (comp, oraculo, heuristica) adjuntos al bloque compartido
+red_trabajador = None
+
+def publicar_red_compartida(comp, perfiles=(), num_landmarks=NUM_LANDMARKS, oraculo=None):
+    # regresa (memoria, descriptor); perfiles: (estacion_normal, transbordo) con landmarks
+    from multiprocessing import shared_memory
+    
+    # (clave, tipo, datos); cada arreglo empieza alineado a 8 bytes
+    arreglos = [(nombre, tipo, comp[nombre]) for nombre, tipo in ARREGLOS_RED]
+    landmarks = []
+    for normal, transbordo in perfiles:
+        preparados = preparar_landmarks(comp, {"estacion_normal": normal, "transbordo": transbordo},
+                                        num_landmarks)
+        for i, (dist, por_estacion) in enumerate(preparados["tablas"]):
+            arreglos.append((f"landmarks_{len(landmarks)}_{i}_dist", "d", dist))
+            arreglos.append((f"landmarks_{len(landmarks)}_{i}_por_estacion", "d", por_estacion))
+        landmarks.append({"costos": (normal, transbordo), "landmarks": preparados["landmarks"]})
+    if oraculo is not None:
+        arreglos.extend((f"oraculo_{nombre}", tipo, oraculo[nombre])
+                        for nombre, tipo in (("costos", "f"), ("finales", "i"), ("padres", "i")))
+    
+    ubicaciones = []
+    pos = 0
+    for clave, tipo, datos in arreglos:
+        ubicaciones.append((clave, tipo, pos, len(datos)))
+        pos = pos + (len(datos) * array(tipo).itemsize + 7) // 8 * 8
+    memoria = shared_memory.SharedMemory(create=True, size=max(pos, 1))
+    for (clave, tipo, datos), (_, _, inicio, largo) in zip(arreglos, ubicaciones):
+        memoria.buf[inicio:inicio + largo * array(tipo).itemsize] = memoryview(datos).cast("B")
+    
+    descriptor = {
+        "memoria": memoria.name,
+        "nombres": comp["nombres"],
+        "lineas": comp["lineas"],
+        "costos": dict(comp["costos"]),
+        "arreglos": ubicaciones,
+        "num_landmarks": num_landmarks,
+        "landmarks": landmarks,
+        "oraculo": None if oraculo is None else {
+            "costos_base": oraculo["costos_base"],
+            "perfiles": oraculo["perfiles"],
+            "num_estados": oraculo["num_estados"]
+        }
+    }
+    return memoria, descriptor
+
+def adjuntar_red_compartida(descriptor):
+    # regresa (comp, oraculo o None) sobre el bloque publicado, sin copiar arreglos
+    from multiprocessing import shared_memory
+    
+    memoria = shared_memory.SharedMemory(name=descriptor["memoria"])
+    vista = memoria.buf.toreadonly()
+    arreglos = {clave: vista[inicio:inicio + largo * array(tipo).itemsize].cast(tipo)
+                for clave, tipo, inicio, largo in descriptor["arreglos"]}
+    nombres = descriptor["nombres"]
+    comp = {
+        "nombres": nombres,
+        "indice": {nombre: i for i, nombre in enumerate(nombres)},
+        "lineas": descriptor["lineas"],
+        "indice_linea": {linea: i for i, linea in enumerate(descriptor["lineas"])},
+        "costos": descriptor["costos"],
+        "pesos": {}
+    }
+    for nombre, _ in ARREGLOS_RED:
+        comp[nombre] = arreglos[nombre]
+    
+    # las tablas quedan en la cache de preparar_landmarks con los pesos de este proceso
+    cache = comp.setdefault("landmarks", {})
+    for j, publicados in enumerate(descriptor["landmarks"]):
+        normal, transbordo = publicados["costos"]
+        pesos = pesos_arcos(comp, {"estacion_normal": normal, "transbordo": transbordo})
+        tablas = [(arreglos[f"landmarks_{j}_{i}_dist"], arreglos[f"landmarks_{j}_{i}_por_estacion"])
+                  for i in range(len(publicados["landmarks"]))]
+        cache[(id(pesos), descriptor["num_landmarks"])] = {
+            "pesos": pesos, "landmarks": publicados["landmarks"], "tablas": tablas}
+    
+    oraculo = None
+    if descriptor["oraculo"] is not None:
+        oraculo = dict(descriptor["oraculo"],
+                       nombres=nombres,
+                       indice=comp["indice"],
+                       estado_estacion=comp["estado_estacion"],
+                       costos=arreglos["oraculo_costos"],
+                       finales=arreglos["oraculo_finales"],
+                       padres=arreglos["oraculo_padres"])
+    # el bloque vive mientras viva comp; va al final para que al liberar comp
+    # se suelten antes las vistas que lo usan
+    comp["memoria_compartida"] = memoria
+    return comp, oraculo
+
+def iniciar_trabajador_rutas(descriptor, heuristica):
+    global red_trabajador
+    comp, oraculo = adjuntar_red_compartida(descriptor)
+    red_trabajador = (comp, oraculo, heuristica)
+
+def resolver_parte_rutas(parte):
+    # corre en un trabajador; parte: (indice de la primera consulta, consultas)
+    primera, consultas = parte
+    comp, oraculo, heuristica = red_trabajador
+    resultados = []
+    for resultado in rutas_multiples(consultas, comp=comp, heuristica=heuristica, oraculo=oraculo):
+        resultado["indice"] = resultado["indice"] + primera
+        resultados.append(resultado)
+    # rutas_multiples los agrupa por perfil; el pool los regresa en el orden de las consultas
+    resultados.sort(key=lambda resultado: resultado["indice"])
+    return resultados
+
+def crear_pool_rutas(comp=None, procesos=None, heuristica=None, oraculo=None):
+    # publica la red (por defecto la compartida) y arranca los trabajadores;
+    # con heuristica_alt se publican los landmarks de todos los perfiles posibles
+    from concurrent.futures import ProcessPoolExecutor
+    
+    if comp is None:
+        comp = obtener_metro_compilado()
+    perfiles = perfiles_posibles(comp["costos"]) if heuristica is heuristica_alt else ()
+    memoria, descriptor = publicar_red_compartida(comp, perfiles, oraculo=oraculo)
+    procesos = procesos or os.cpu_count() or 1
+    try:
+        ejecutor = ProcessPoolExecutor(max_workers=procesos, initializer=iniciar_trabajador_rutas,
+                                       initargs=(descriptor, heuristica))
+    except Exception:
+        memoria.close()
+        memoria.unlink()
+        raise
+    return {
+        "ejecutor": ejecutor,
+        "memoria": memoria,
+        "procesos": procesos,
+        "bytes_compartidos": memoria.size
+    }
+
+def rutas_en_pool(pool, consultas, tam_parte=256):
+    # como rutas_multiples, repartiendo partes de tam_parte consultas entre los
+    # trabajadores; genera los resultados en el orden de las consultas
+    consultas = iter(consultas)
+    partes = []
+    primera = 0
+    while True:
+        parte = list(itertools.islice(consultas, tam_parte))
+        if not parte:
+            break
+        partes.append((primera, parte))
+        primera = primera + len(parte)
+    for resultados in pool["ejecutor"].map(resolver_parte_rutas, partes):
+        yield from resultados
+
+def cerrar_pool_rutas(pool):
+    pool["ejecutor"].shutdown()
+    pool["memoria"].close()
+    pool["memoria"].unlink()
+
+# Nombre en ingles usado por los clientes del servicio
+route_pool = rutas_en_pool
+
+
+# ASIGNACION DE DEMANDA (MATRICES ORIGEN-DESTINO)
+# Carga estimada por conexion y por estacion de transbordo a partir de
+# matrices origen-destino por hora. Las horas se agrupan por perfil de costos y,
+# dentro de un perfil, se hace un solo arbol de caminos minimos por origen
+# (Dijkstra sobre los estados) que sirve para todos sus destinos y todas sus
+# horas. La demanda se pone en el estado con el que se llega a cada destino y
+# se empuja hacia la raiz por niveles del arbol: con NumPy cada nivel es una
+# sola suma para todos los origenes y horas del perfil; sin NumPy se recorre
+# cada arbol de la hoja a la raiz.
+# Un pasajero transborda en la estacion de un estado cuando sale de el por
+# una linea distinta a la suya (salvo en el origen, donde apenas entra).
+
+def acumular_carga_numpy(np, comp, arboles, raices, viajes, num_horas):
+    # arboles: (dist, padres) por origen del grupo; viajes: columnas (horas,
+    # origenes, destinos, pasajeros) con el indice del origen en el grupo y el id
+    # del destino.
+    # Regresa la carga por par (estado padre, estado) y por estacion de
+    # transbordo, y por hora los pasajeros sin ruta y los pasajeros-minuto.
+    num_estados = len(comp["estado_estacion"])
+    num_origenes = len(arboles)
+    dist = np.array([np.frombuffer(dist_o, dtype=np.float64) for dist_o, _ in arboles])
+    padres = np.array([np.frombuffer(padres_o, dtype=np.intc) for _, padres_o in arboles],
+                      dtype=np.int64).reshape(num_origenes, num_estados)
+    desplazamiento = (np.arange(num_origenes, dtype=np.int64) * num_estados)[:, None]
+    padres_plano = np.where(padres >= 0, padres + desplazamiento, -1).ravel()
+    
+    # estado final de cada (origen, estacion): el primero con la menor distancia
+    estado_offsets = np.frombuffer(comp["estado_offsets"], dtype=np.intc).astype(np.int64)
+    primero = estado_offsets[:-1]
+    por_estacion = np.diff(estado_offsets)
+    final = np.broadcast_to(primero, (num_origenes, len(primero))).copy()
+    dist_final = dist[:, primero]
+    for k in range(1, int(por_estacion.max(initial=1))):
+        columnas = np.flatnonzero(por_estacion > k)
+        candidato = dist[:, primero[columnas] + k]
+        mejora = candidato < dist_final[:, columnas]
+        final[:, columnas] = np.where(mejora, primero[columnas] + k, final[:, columnas])
+        dist_final[:, columnas] = np.where(mejora, candidato, dist_final[:, columnas])
+    
+    # demanda en el estado final; carga[origen * num_estados + estado, hora]
+    carga = np.zeros((num_origenes * num_estados, num_horas))
+    sin_ruta = np.zeros(num_horas)
+    pasajeros_minuto = np.zeros(num_horas)
+    if viajes[0]:
+        horas, origenes, destinos, pasajeros = (np.array(columna) for columna in viajes)
+        costo = dist_final[origenes, destinos]
+        con_ruta = costo < INFINITO
+        np.add.at(sin_ruta, horas[~con_ruta], pasajeros[~con_ruta])
+        horas = horas[con_ruta]
+        pasajeros = pasajeros[con_ruta]
+        np.add.at(pasajeros_minuto, horas, pasajeros * costo[con_ruta])
+        estados = final[origenes[con_ruta], destinos[con_ruta]]
+        np.add.at(carga, (origenes[con_ruta] * num_estados + estados, horas), pasajeros)
+    
+    # profundidad de cada estado en su arbol, siguiendo padres a la vez en todos
+    profundidad = np.zeros(num_origenes * num_estados, dtype=np.int64)
+    ancestro = padres_plano.copy()
+    while True:
+        vivos = ancestro >= 0
+        if not vivos.any():
+            break
+        profundidad += vivos
+        ancestro[vivos] = padres_plano[ancestro[vivos]]
+    
+    # de las hojas a la raiz: un nivel por paso
+    orden = np.argsort(-profundidad, kind="stable")
+    cortes = np.flatnonzero(np.diff(profundidad[orden])) + 1
+    for nivel in np.split(orden, cortes):
+        if profundidad[nivel[0]] == 0:
+            break
+        np.add.at(carga, padres_plano[nivel], carga[nivel])
+    
+    # arcos del arbol: la carga de un estado es la de su arco de entrada
+    con_padre = np.flatnonzero(padres_plano >= 0)
+    estados = con_padre % num_estados
+    previos = padres_plano[con_padre] % num_estados
+    claves, inverso = np.unique(previos * num_estados + estados, return_inverse=True)
+    por_par = np.zeros((len(claves), num_horas))
+    np.add.at(por_par, inverso, carga[con_padre])
+    cargas_pares = {divmod(int(clave), num_estados): por_par[i].tolist()
+                    for i, clave in enumerate(claves) if por_par[i].any()}
+    
+    # transbordos: cambio de linea al salir de un estado que no es la raiz
+    estado_linea = np.frombuffer(comp["estado_linea"], dtype=np.intc)
+    estado_estacion = np.frombuffer(comp["estado_estacion"], dtype=np.intc)
+    raiz = np.array(raices, dtype=np.int64)[con_padre // num_estados]
+    cambia = (estado_linea[estados] != estado_linea[previos]) & (previos != raiz)
+    transbordos = np.zeros((len(comp["nombres"]), num_horas))
+    np.add.at(transbordos, estado_estacion[previos[cambia]], carga[con_padre[cambia]])
+    cargas_transbordos = {int(e): transbordos[e].tolist()
+                          for e in np.flatnonzero(transbordos.any(axis=1))}
+    return cargas_pares, cargas_transbordos, sin_ruta.tolist(), pasajeros_minuto.tolist()
+
+def acumular_carga_python(comp, arboles, raices, viajes, num_horas):
+    # mismo resultado que acumular_carga_numpy, arbol por arbol
+    estado_linea = comp["estado_linea"]
+    estado_estacion = comp["estado_estacion"]
+    sin_ruta = [0.0] * num_horas
+    pasajeros_minuto = [0.0] * num_horas
+    por_origen = {}
+    mejores = {}
+    for hora, origen, destino, pasajeros in zip(*viajes):
+        dist = arboles[origen][0]
+        if origen not in mejores:
+            mejores[origen] = mejor_estado_por_estacion(comp, dist)
+        final = mejores[origen][destino]
+        if final == -1:
+            sin_ruta[hora] += pasajeros
+            continue
+        pasajeros_minuto[hora] += pasajeros * dist[final]
+        carga = por_origen.setdefault(origen, {})
+        carga.setdefault(final, [0.0] * num_horas)[hora] += pasajeros
+    
+    cargas_pares = {}
+    cargas_transbordos = {}
+    for origen, carga in por_origen.items():
+        dist, padres = arboles[origen]
+        # un hijo siempre cuesta mas que su padre: por distancia descendente
+        alcanzados = [s for s in range(len(dist)) if padres[s] != -1]
+        for s in sorted(alcanzados, key=lambda estado: dist[estado], reverse=True):
+            valores = carga.get(s)
+            if valores is None:
+                continue
+            p = padres[s]
+            par = cargas_pares.setdefault((p, s), [0.0] * num_horas)
+            subir = carga.setdefault(p, [0.0] * num_horas)
+            for h in range(num_horas):
+                par[h] += valores[h]
+                subir[h] += valores[h]
+            if p != raices[origen] and estado_linea[s] != estado_linea[p]:
+                cambio = cargas_transbordos.setdefault(estado_estacion[p], [0.0] * num_horas)
+                for h in range(num_horas):
+                    cambio[h] += valores[h]
+    return cargas_pares, cargas_transbordos, sin_ruta, pasajeros_minuto
+
+def asignar_grupo(comp, perfil, matrices):
+    # matrices: una lista de viajes (origen, destino, pasajeros) por hora, todas
+    # con el mismo perfil; regresa un resultado por matriz y cuantos arboles se hicieron
+    num_horas = len(matrices)
+    indice = comp["indice"]
+    pasajeros_hora = [0.0] * num_horas
+    origenes = []
+    indice_origen = {}
+    # viajes por columnas: hora, origen (indice en el grupo), destino (id), pasajeros
+    viajes = ([], [], [], [])
+    horas, origenes_viaje, destinos, pasajeros_viaje = viajes
+    for hora, matriz in enumerate(matrices):
+        for origen, destino, pasajeros in matriz:
+            try:
+                o = indice[origen]
+                d = indice[destino]
+            except KeyError as error:
+                raise ValueError(f"Estacion no encontrada: {error.args[0]}") from None
+            if pasajeros <= 0 or o == d:
+                continue  # sin viaje por la red
+            i = indice_origen.get(o)
+            if i is None:
+                i = indice_origen[o] = len(origenes)
+                origenes.append(o)
+            horas.append(hora)
+            origenes_viaje.append(i)
+            destinos.append(d)
+            pasajeros_viaje.append(pasajeros)
+            pasajeros_hora[hora] += pasajeros
+    
+    # un arbol por origen para todas las horas del grupo
+    pesos = pesos_arcos(comp, perfil)
+    raices = [comp["estado_offsets"][o] for o in origenes]
+    arboles = [dijkstra_compilado(comp, raiz, pesos) for raiz in raices]
+    datos = datos_numpy(comp)
+    if not origenes:
+        cargas_pares, cargas_transbordos = {}, {}
+        sin_ruta = pasajeros_minuto = [0.0] * num_horas
+    elif datos is not None:
+        cargas_pares, cargas_transbordos, sin_ruta, pasajeros_minuto = acumular_carga_numpy(
+            datos["np"], comp, arboles, raices, viajes, num_horas)
     else:
-        print("Linea no valida. Por favor, selecciona una linea entre 1 y 5.")
+        cargas_pares, cargas_transbordos, sin_ruta, pasajeros_minuto = acumular_carga_python(
+            comp, arboles, raices, viajes, num_horas)
+    
+    resultados = [{"conexiones": {}, "transbordos": {}, "pasajeros": pasajeros_hora[h],
+                   "sin_ruta": sin_ruta[h], "pasajeros_minuto": pasajeros_minuto[h]}
+                  for h in range(num_horas)]
+    # a nombres: conexion (origen, destino, linea) en el sentido del viaje
+    nombres = comp["nombres"]
+    estado_estacion = comp["estado_estacion"]
+    for (p, s), valores in cargas_pares.items():
+        clave = (nombres[estado_estacion[p]], nombres[estado_estacion[s]],
+                 comp["lineas"][comp["estado_linea"][s]])
+        for resultado, valor in zip(resultados, valores):
+            if valor:
+                resultado["conexiones"][clave] = resultado["conexiones"].get(clave, 0.0) + valor
+    for e, valores in cargas_transbordos.items():
+        for resultado, valor in zip(resultados, valores):
+            if valor:
+                resultado["transbordos"][nombres[e]] = valor
+    return resultados, len(origenes)
+
+def asignar_demanda(comp, viajes, perfil=None):
+    # una matriz con un solo perfil: viajes es un iterable de (origen, destino, pasajeros)
+    # regresa {"conexiones": {(origen, destino, linea): pasajeros},
+    #          "transbordos": {estacion: pasajeros}, "pasajeros", "sin_ruta",
+    #          "pasajeros_minuto", "arboles", "tiempo_segundos"}
+    start_time = time.time()
+    resultados, num_arboles = asignar_grupo(comp, perfil, [list(viajes)])
+    resultado = resultados[0]
+    resultado["arboles"] = num_arboles
+    resultado["tiempo_segundos"] = time.time() - start_time
+    return resultado
+
+def asignar_matrices_horarias(matrices, prisa=False, accesibilidad=False, comp=None):
+    # matrices: {hora: iterable de (origen, destino, pasajeros)}; regresa
+    # ({hora: resultado como en asignar_demanda, sin tiempos}, estadisticas)
+    start_time = time.time()
+    if comp is None:
+        comp = obtener_metro_compilado()
+    grupos = {}
+    for hora, matriz in matrices.items():
+        perfil = crear_perfil_costos(comp["costos"], contexto_precalculado(hora, prisa, accesibilidad))
+        clave = (perfil["estacion_normal"], perfil["transbordo"])
+        grupo = grupos.setdefault(clave, (perfil, [], []))
+        grupo[1].append(hora)
+        grupo[2].append(list(matriz))
+    
+    por_hora = {}
+    num_arboles = 0
+    for perfil, horas, matrices_grupo in grupos.values():
+        resultados, arboles = asignar_grupo(comp, perfil, matrices_grupo)
+        num_arboles = num_arboles + arboles
+        por_hora.update(zip(horas, resultados))
+    return por_hora, {
+        "horas": len(por_hora),
+        "perfiles": len(grupos),
+        "arboles": num_arboles,
+        "tiempo_segundos": time.time() - start_time
+    }
+
+
+def main():
+    print("MENU - SISTEMA DE NAVEGACIoN DEL METRO CDMX")
+    print("Lineas disponibles: 1 (Rosa), 2 (Azul), 3 (Verde), 4 (Cian), 5 (Amarilla)")
+    metro = obtener_metro()
+    while True: 
+        linea = input("\nSelecciona la linea del metro (1-5) o 0 para salir: ")
+        if linea in ['1', '2', '3', '4', '5']:
+            print(f"\nHas seleccionado la linea {linea}. Estaciones disponibles:")
+            estaciones_linea = [nombre for nombre, est in metro["estaciones"].items() if int(linea) in est["lineas"]]
+            print(", ".join(estaciones_linea))
+            inicio = input("\nIngresa la estacion de origen: ")
+            lineaD = input("Selecciona la linea de destino: ")
+            if lineaD in ['1', '2', '3', '4', '5']:
+                estaciones_lineaD = [nombre for nombre, est in metro["estaciones"].items() if int(lineaD) in est["lineas"]]
+                print(f"\nHas seleccionado la linea {lineaD}. Estaciones disponibles:")
+                print(", ".join(estaciones_lineaD))
+                destino = input("Ingresa la estacion de destino: ")
+                hora = int(input("Define la hora actual (0-23): "))
+                prisa_input = input("¿Tienes prisa? (si/no): ").strip().lower()
+                prisa = prisa_input == 'si'
+                accesibilidad_input = input("¿Necesitas accesibilidad? (si/no): ").strip().lower()
+                accesibilidad = accesibilidad_input == 'si'
+                func(inicio, destino, hora, prisa, accesibilidad)
+            else:
+                print("Linea de destino no valida. Por favor, selecciona una linea entre 1 y 5.")
+        elif linea == '0':
+            print("\n¡Hasta luego!")
+            break  
+        else:
+            print("Linea no valida. Por favor, selecciona una linea entre 1 y 5.")
+
+
+if __name__ == "__main__":
+    main()
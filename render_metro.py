@@ -0,0 +1,241 @@
+## Exportacion de imagenes de rutas del Metro CDMX (sin ventana, backend Agg)
+# Uso:
+#   python render_metro.py --salida imagenes Observatorio:Universidad Zocalo:Tacuba
+#   python render_metro.py --salida imagenes --formato svg --procesos 4 --lote consultas.txt
+# El fondo (aristas, estaciones coloreadas por linea, nombres, leyenda) se dibuja
+# una sola vez por lienzo. En PNG se guardan sus pixeles y cada ruta solo
+# restaura el fondo y pinta su capa encima; en SVG se reusan los mismos
+# artistas y solo se agregan/quitan los de la ruta. Con varios procesos cada
+# uno arma su lienzo una vez y exporta su parte del lote.
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import metro_cdmx
+
+# colores por linea (los mismos que visualizar_grafo_metro); otras lineas usan
+# la paleta de respaldo en el orden en que aparecen
+COLORES_LINEA = {
+    1: '#F54EA2',  # Rosa
+    2: '#0066CC',  # Azul
+    3: '#B5BD00',  # Verde
+    4: '#63C5C7',  # Cian
+    5: '#FFD200',  # Amarillo
+}
+# zlib 1: el PNG pesa algo mas pero se codifica varias veces mas rapido
+NIVEL_COMPRESION_PNG = 1
+PALETA_RESPALDO = ['#8C564B', '#9467BD', '#17BECF', '#7F7F7F', '#BCBD22',
+                   '#E377C2', '#FF7F0E', '#2CA02C', '#1F77B4', '#D62728']
+
+# lienzo de cada proceso del pool (se crea en el inicializador)
+lienzo_proceso = None
+# lienzos por grafo para visualizar_grafo_metro(..., archivo=...)
+lienzos = {}
+
+
+# LIENZO
+
+def color_de_linea(linea, extras):
+    if linea in COLORES_LINEA:
+        return COLORES_LINEA[linea]
+    if linea not in extras:
+        extras[linea] = PALETA_RESPALDO[len(extras) % len(PALETA_RESPALDO)]
+    return extras[linea]
+
+def crear_lienzo(grafo, tam=(16, 12), dpi=100, titulo=None):
+    # figura Agg con el fondo dibujado; no usa pyplot (ni ventanas ni estado global)
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.collections import LineCollection
+    from matplotlib.figure import Figure
+    from matplotlib.patches import Patch
+
+    figura = Figure(figsize=tam, dpi=dpi)
+    lienzo_agg = FigureCanvasAgg(figura)
+    ejes = figura.add_subplot(1, 1, 1)
+    ejes.set_axis_off()
+    pos = {nombre: estacion["coords"] for nombre, estacion in grafo["estaciones"].items()}
+
+    # aristas (cada conexion aparece dos veces en la adyacencia)
+    segmentos = []
+    for origen, conexiones in grafo["conexiones"].items():
+        for destino, _, _ in conexiones:
+            if origen < destino:
+                segmentos.append((pos[origen], pos[destino]))
+    ejes.add_collection(LineCollection(segmentos, colors='gray', linewidths=1, alpha=0.2, zorder=1))
+
+    # estaciones normales por su primera linea, transbordos en rojo
+    extras = {}
+    por_linea = {}
+    for nombre, estacion in grafo["estaciones"].items():
+        if not estacion["es_transbordo"]:
+            por_linea.setdefault(estacion["lineas"][0], []).append(pos[nombre])
+    for linea, puntos in por_linea.items():
+        xs, ys = zip(*puntos)
+        ejes.scatter(xs, ys, s=300, c=color_de_linea(linea, extras), alpha=0.8,
+                     edgecolors='black', linewidths=0.5, zorder=2)
+    transbordos = [pos[n] for n, e in grafo["estaciones"].items() if e["es_transbordo"]]
+    if transbordos:
+        xs, ys = zip(*transbordos)
+        ejes.scatter(xs, ys, s=400, c='red', alpha=0.9, edgecolors='darkred', linewidths=1.5, zorder=2)
+    for nombre, (x, y) in pos.items():
+        ejes.text(x, y, nombre, fontsize=6, fontweight='bold', ha='center', va='center', zorder=4)
+
+    lineas = sorted(por_linea, key=str)
+    leyenda = [Patch(facecolor=color_de_linea(linea, extras), edgecolor='black', label=f'Linea {linea}')
+               for linea in lineas]
+    leyenda.append(Patch(facecolor='red', edgecolor='darkred', label='Transbordo'))
+    ejes.legend(handles=leyenda, loc='upper left', fontsize=10)
+    ejes.autoscale_view()
+    figura.tight_layout()
+    # el titulo de cada ruta ocupa este espacio; se deja fuera del fondo
+    texto_titulo = figura.suptitle(titulo or "", fontsize=14, fontweight='bold')
+
+    lienzo_agg.draw()
+    return {
+        "figura": figura,
+        "lienzo": lienzo_agg,
+        "ejes": ejes,
+        "pos": pos,
+        "titulo": texto_titulo,
+        "fondo": lienzo_agg.copy_from_bbox(figura.bbox),
+    }
+
+def lienzo_de(grafo):
+    # un lienzo por grafo y version de su topologia
+    clave = id(grafo)
+    guardado = lienzos.get(clave)
+    if guardado is None or guardado[0] is not grafo or guardado[1] != grafo["version"]:
+        guardado = (grafo, grafo["version"], crear_lienzo(grafo))
+        lienzos[clave] = guardado
+    return guardado[2]
+
+def capa_ruta(lienzo, ruta):
+    # artistas de la ruta (no se agregan a la figura); para una ruta vacia no hay capa
+    from matplotlib.lines import Line2D
+    from matplotlib.text import Text
+
+    if not ruta:
+        return []
+    pos = lienzo["pos"]
+    xs = [pos[nombre][0] for nombre in ruta]
+    ys = [pos[nombre][1] for nombre in ruta]
+    artistas = [
+        Line2D(xs, ys, color='green', linewidth=4, alpha=0.8, zorder=3),
+        Line2D([xs[0]], [ys[0]], marker='o', markersize=22, color='lime',
+               markeredgecolor='darkgreen', markeredgewidth=2, zorder=3),
+        Line2D([xs[-1]], [ys[-1]], marker='o', markersize=22, color='darkred',
+               markeredgecolor='black', markeredgewidth=2, zorder=3),
+    ]
+    # los nombres del fondo quedan debajo de la capa; se repiten los de la ruta
+    artistas.extend(Text(x, y, nombre, fontsize=6, fontweight='bold', ha='center', va='center', zorder=4)
+                    for nombre, x, y in zip(ruta, xs, ys))
+    for artista in artistas:
+        artista.set_transform(lienzo["ejes"].transData)
+        artista.set_figure(lienzo["figura"])
+        artista.axes = lienzo["ejes"]
+    return artistas
+
+def titulo_ruta(ruta):
+    if not ruta:
+        return "Metro CDMX - sin ruta"
+    return f"Metro CDMX - Ruta: {ruta[0]} → {ruta[-1]} ({len(ruta)} estaciones)"
+
+
+# EXPORTACION
+
+def renderizar_ruta(lienzo, ruta, ruta_archivo):
+    # el formato sale de la extension (.png o .svg)
+    formato = os.path.splitext(ruta_archivo)[1].lower().lstrip(".")
+    artistas = capa_ruta(lienzo, ruta)
+    lienzo["titulo"].set_text(titulo_ruta(ruta))
+    if formato == "png":
+        from matplotlib.image import imsave
+
+        # restaurar los pixeles del fondo y pintar solo la capa de la ruta
+        agg = lienzo["lienzo"]
+        agg.restore_region(lienzo["fondo"])
+        for artista in artistas:
+            lienzo["ejes"].draw_artist(artista)
+        lienzo["figura"].draw_artist(lienzo["titulo"])
+        imsave(ruta_archivo, agg.buffer_rgba(), format="png",
+               pil_kwargs={"compress_level": NIVEL_COMPRESION_PNG})
+    elif formato == "svg":
+        # vectorial: se serializa la figura completa con la capa agregada
+        for artista in artistas:
+            lienzo["ejes"].add_artist(artista)
+        try:
+            lienzo["figura"].savefig(ruta_archivo, format="svg")
+        finally:
+            for artista in artistas:
+                artista.remove()
+    else:
+        raise ValueError(f"Formato no soportado: {formato} (png o svg)")
+    return ruta_archivo
+
+def nombre_archivo(directorio, indice, ruta, formato):
+    if ruta:
+        base = f"{indice:05d}_{ruta[0]}_{ruta[-1]}"
+    else:
+        base = f"{indice:05d}_sin_ruta"
+    base = "".join(c if c.isalnum() or c in "-_" else "_" for c in base)
+    return os.path.join(directorio, f"{base}.{formato}")
+
+def iniciar_proceso(grafo, tam, dpi):
+    global lienzo_proceso
+    lienzo_proceso = crear_lienzo(grafo, tam, dpi)
+
+def exportar_parte(trabajos):
+    return [renderizar_ruta(lienzo_proceso, ruta, archivo) for ruta, archivo in trabajos]
+
+def exportar_rutas(grafo, rutas, directorio, formato="png", procesos=1, tam=(16, 12), dpi=100,
+                   tam_parte=64):
+    # exporta una imagen por ruta (lista de estaciones o None) y regresa los archivos
+    os.makedirs(directorio, exist_ok=True)
+    trabajos = [(ruta, nombre_archivo(directorio, i, ruta, formato)) for i, ruta in enumerate(rutas)]
+    if procesos <= 1:
+        iniciar_proceso(grafo, tam, dpi)
+        return exportar_parte(trabajos)
+
+    partes = [trabajos[i:i + tam_parte] for i in range(0, len(trabajos), tam_parte)]
+    archivos = []
+    with ProcessPoolExecutor(max_workers=procesos, initializer=iniciar_proceso,
+                             initargs=(grafo, tam, dpi)) as pool:
+        for hechos in pool.map(exportar_parte, partes):
+            archivos.extend(hechos)
+    return archivos
+
+
+def leer_pares(argumentos):
+    pares = [par.split(":", 1) for par in argumentos.pares]
+    if argumentos.lote:
+        with open(argumentos.lote, encoding="utf-8") as archivo:
+            for renglon in archivo:
+                renglon = renglon.strip()
+                if renglon and not renglon.startswith("#"):
+                    pares.append(renglon.split(":", 1))
+    return pares
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporta imagenes de rutas del Metro CDMX")
+    parser.add_argument("pares", nargs="*", help="rutas como Origen:Destino")
+    parser.add_argument("--lote", help="archivo con un Origen:Destino por renglon")
+    parser.add_argument("--salida", default="imagenes", help="directorio de salida")
+    parser.add_argument("--formato", choices=["png", "svg"], default="png")
+    parser.add_argument("--procesos", type=int, default=1)
+    parser.add_argument("--hora", type=int, default=12)
+    argumentos = parser.parse_args()
+
+    metro = metro_cdmx.obtener_metro()
+    consultas = [(inicio, destino, argumentos.hora, False, False)
+                 for inicio, destino in leer_pares(argumentos)]
+    rutas = [None] * len(consultas)
+    for resultado in metro_cdmx.rutas_multiples(consultas):
+        rutas[resultado["indice"]] = resultado["ruta"]
+    archivos = exportar_rutas(metro, rutas, argumentos.salida, argumentos.formato, argumentos.procesos)
+    print(f"{len(archivos)} imagenes en {argumentos.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
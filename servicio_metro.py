@@ -0,0 +1,340 @@
+## Servicio HTTP/JSON de rutas del Metro CDMX (asyncio, solo biblioteca estandar)
+# Uso: python servicio_metro.py --puerto 8080
+#   GET /route?inicio=Zocalo&destino=Tacuba&hora=8&prisa=si&accesibilidad=no
+#   GET /stations?linea=3
+#   GET /route?desde=10.5,48&hasta=30,61&hora=8&k=4   (desde/hasta: puntos x,y en unidades de coords)
+#   GET /stations?q=tasq&linea=2&limite=5      (autocompletar, sin acentos ni mayusculas)
+#   GET /nearby?x=10.5&y=48&k=5&radio=8
+#   GET /metrics
+# La red se carga y compila una sola vez al arrancar; las busquedas corren en
+# un pool de hilos acotado para no bloquear el ciclo de eventos.
+import argparse
+import asyncio
+import json
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import metro_cdmx
+
+# limites (ms) de las cubetas del histograma de latencia
+LIMITES_LATENCIA_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500]
+MAX_TAM_ENCABEZADOS = 16384
+ENDPOINTS = ("/route", "/stations", "/nearby", "/metrics")
+
+registro = logging.getLogger("servicio_metro")
+
+ESTADOS_HTTP = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    500: "Internal Server Error",
+    503: "Service Unavailable"
+}
+
+def crear_servicio(hilos=4, max_pendientes=1024):
+    metro = metro_cdmx.obtener_metro()
+    comp = metro_cdmx.obtener_metro_compilado()
+    metro_cdmx.obtener_base_conocimiento()
+    return {
+        "metro": metro,
+        "comp": comp,
+        "nombres": metro_cdmx.obtener_indice_nombres(),
+        "espacial": metro_cdmx.obtener_indice_espacial(),
+        "executor": ThreadPoolExecutor(max_workers=hilos, thread_name_prefix="ruta"),
+        "max_pendientes": max_pendientes,
+        "pendientes": 0,
+        "histogramas": {},
+        "inicio": time.time()
+    }
+
+def registrar_latencia(servicio, endpoint, estado, milisegundos):
+    histograma = servicio["histogramas"].setdefault(endpoint, {
+        "cuentas": [0] * (len(LIMITES_LATENCIA_MS) + 1),
+        "total": 0,
+        "suma_ms": 0.0,
+        "estados": {}
+    })
+    i = 0
+    while i < len(LIMITES_LATENCIA_MS) and milisegundos > LIMITES_LATENCIA_MS[i]:
+        i = i + 1
+    histograma["cuentas"][i] += 1
+    histograma["total"] += 1
+    histograma["suma_ms"] += milisegundos
+    histograma["estados"][estado] = histograma["estados"].get(estado, 0) + 1
+
+def leer_bool(valor):
+    return valor.strip().lower() in ("si", "sí", "true", "1", "yes")
+
+def calcular_ruta(servicio, inicio, destino, hora, prisa, accesibilidad, linea_inicial):
+    # corre en el pool de hilos; la red compartida es de solo lectura
+    # los nombres llegan como los escribio el usuario ("tasquena", "ninos heroes")
+    estaciones = []
+    for texto in (inicio, destino):
+        nombre = metro_cdmx.resolver_estacion(servicio["nombres"], texto)
+        if nombre is None:
+            sugerencias = metro_cdmx.buscar_estaciones(servicio["nombres"], texto, 5)
+            return 404, {"error": f"Estacion no encontrada: {texto}",
+                         "sugerencias": [r["nombre"] for r in sugerencias]}
+        estaciones.append(nombre)
+    inicio, destino = estaciones
+    contexto = metro_cdmx.contexto_precalculado(hora, prisa, accesibilidad)
+    perfil = metro_cdmx.crear_perfil_costos(servicio["metro"]["costos"], contexto)
+    ruta, estadisticas = metro_cdmx.a_star_compilado(
+        servicio["comp"], inicio, destino, linea_inicial, perfil, heuristica=metro_cdmx.heuristica_calibrada)
+    if ruta is None:
+        return 404, {"error": estadisticas["error"]}
+    return 200, {
+        "inicio": inicio,
+        "destino": destino,
+        "ruta": ruta,
+        "costo_total": estadisticas["costo_total"],
+        "longitud_ruta": estadisticas["longitud_ruta"],
+        "nodos_explorados": estadisticas["nodos_explorados"],
+        "condiciones": list(contexto["condiciones_activas"]),
+        "preferencias": list(contexto["preferencias"]),
+        "costos": dict(perfil)
+    }
+
+def leer_finito(texto):
+    # float("nan") y float("inf") se aceptan pero no son coordenadas
+    valor = float(texto)
+    if not math.isfinite(valor):
+        raise ValueError(f"Valor no finito: {texto}")
+    return valor
+
+def leer_punto(texto):
+    x, y = texto.split(",")
+    return leer_finito(x), leer_finito(y)
+
+def leer_k(texto):
+    k = int(texto)
+    if k < 1:
+        raise ValueError(f"k debe ser al menos 1: {texto}")
+    return k
+
+def calcular_ruta_coordenadas(servicio, desde, hasta, hora, prisa, accesibilidad, k, minutos_por_unidad):
+    # una sola busqueda desde las k estaciones cerca de desde hasta las k cerca de hasta
+    contexto = metro_cdmx.contexto_precalculado(hora, prisa, accesibilidad)
+    perfil = metro_cdmx.crear_perfil_costos(servicio["metro"]["costos"], contexto)
+    ruta, estadisticas = metro_cdmx.ruta_entre_coordenadas(
+        servicio["espacial"], desde, hasta, perfil, k, minutos_por_unidad=minutos_por_unidad)
+    if ruta is None:
+        return 404, {"error": estadisticas["error"]}
+    cuerpo = {
+        "desde": desde,
+        "hasta": hasta,
+        "ruta": ruta,
+        "condiciones": list(contexto["condiciones_activas"]),
+        "preferencias": list(contexto["preferencias"]),
+        "costos": dict(perfil)
+    }
+    cuerpo.update((clave, estadisticas[clave]) for clave in (
+        "costo_total", "entrada", "salida", "caminata_inicio", "caminata_fin", "caminata_directa",
+        "longitud_ruta", "nodos_explorados") if clave in estadisticas)
+    return 200, cuerpo
+
+async def atender_ruta(servicio, parametros):
+    if "desde" in parametros or "hasta" in parametros:
+        return await atender_ruta_coordenadas(servicio, parametros)
+    try:
+        inicio = parametros["inicio"][0]
+        destino = parametros["destino"][0]
+        hora = int(parametros.get("hora", [time.localtime().tm_hour])[0])
+        prisa = leer_bool(parametros.get("prisa", ["no"])[0])
+        accesibilidad = leer_bool(parametros.get("accesibilidad", ["no"])[0])
+        linea_inicial = parametros.get("linea_inicial", [None])[0]
+        if linea_inicial is not None:
+            linea_inicial = int(linea_inicial)
+    except (KeyError, ValueError):
+        return 400, {"error": "Parametros: inicio, destino, hora (0-23), prisa, accesibilidad, linea_inicial"}
+
+    if servicio["pendientes"] >= servicio["max_pendientes"]:
+        return 503, {"error": "Servicio saturado"}
+    servicio["pendientes"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            servicio["executor"], calcular_ruta,
+            servicio, inicio, destino, hora, prisa, accesibilidad, linea_inicial)
+    finally:
+        servicio["pendientes"] -= 1
+
+async def atender_ruta_coordenadas(servicio, parametros):
+    try:
+        desde = leer_punto(parametros["desde"][0])
+        hasta = leer_punto(parametros["hasta"][0])
+        hora = int(parametros.get("hora", [time.localtime().tm_hour])[0])
+        prisa = leer_bool(parametros.get("prisa", ["no"])[0])
+        accesibilidad = leer_bool(parametros.get("accesibilidad", ["no"])[0])
+        k = leer_k(parametros.get("k", ["4"])[0])
+        minutos_por_unidad = leer_finito(parametros.get("minutos_por_unidad",
+                                                        [metro_cdmx.MINUTOS_CAMINANDO_POR_UNIDAD])[0])
+        if minutos_por_unidad < 0:
+            raise ValueError(f"minutos_por_unidad negativo: {minutos_por_unidad}")
+    except (KeyError, ValueError):
+        return 400, {"error": "Parametros: desde (x,y), hasta (x,y), hora (0-23), prisa, "
+                              "accesibilidad, k, minutos_por_unidad"}
+
+    if servicio["pendientes"] >= servicio["max_pendientes"]:
+        return 503, {"error": "Servicio saturado"}
+    servicio["pendientes"] += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            servicio["executor"], calcular_ruta_coordenadas,
+            servicio, desde, hasta, hora, prisa, accesibilidad, k, minutos_por_unidad)
+    finally:
+        servicio["pendientes"] -= 1
+
+def atender_estaciones(servicio, parametros):
+    estaciones = servicio["metro"]["estaciones"]
+    if "linea" not in parametros and "q" not in parametros:
+        return 200, {"estaciones": list(estaciones)}
+    try:
+        linea = int(parametros["linea"][0]) if "linea" in parametros else None
+        limite = int(parametros.get("limite", ["10"])[0])
+    except ValueError:
+        return 400, {"error": "linea y limite deben ser numeros"}
+    if "q" in parametros:
+        # rapido (indice en memoria): se atiende en el ciclo de eventos
+        return 200, {
+            "q": parametros["q"][0],
+            "linea": linea,
+            "estaciones": metro_cdmx.buscar_estaciones(servicio["nombres"], parametros["q"][0], limite, linea)
+        }
+    return 200, {
+        "linea": linea,
+        "estaciones": [nombre for nombre, est in estaciones.items() if linea in est["lineas"]]
+    }
+
+def atender_cercanas(servicio, parametros):
+    try:
+        x = leer_finito(parametros["x"][0])
+        y = leer_finito(parametros["y"][0])
+        radio = float(parametros["radio"][0]) if "radio" in parametros else None
+        if radio is not None and not radio >= 0:
+            raise ValueError(f"radio invalido: {radio}")
+        k = leer_k(parametros["k"][0]) if "k" in parametros else (None if radio is not None else 5)
+    except (KeyError, ValueError):
+        return 400, {"error": "Parametros: x, y, k, radio"}
+    cercanas = metro_cdmx.estaciones_cercanas(servicio["espacial"], x, y, k, radio)
+    return 200, {
+        "x": x,
+        "y": y,
+        "estaciones": [{"nombre": nombre, "distancia": distancia} for nombre, distancia in cercanas]
+    }
+
+def atender_metricas(servicio):
+    return 200, {
+        "segundos_activo": time.time() - servicio["inicio"],
+        "pendientes": servicio["pendientes"],
+        "limites_ms": LIMITES_LATENCIA_MS,
+        "histogramas": servicio["histogramas"]
+    }
+
+async def despachar(servicio, metodo, objetivo):
+    url = urlsplit(objetivo)
+    parametros = parse_qs(url.query)
+    if metodo != "GET":
+        return url.path, 405, {"error": "Solo se admite GET"}
+    if url.path == "/route":
+        estado, cuerpo = await atender_ruta(servicio, parametros)
+    elif url.path == "/stations":
+        estado, cuerpo = atender_estaciones(servicio, parametros)
+    elif url.path == "/nearby":
+        estado, cuerpo = atender_cercanas(servicio, parametros)
+    elif url.path == "/metrics":
+        estado, cuerpo = atender_metricas(servicio)
+    else:
+        return "otro", 404, {"error": "Ruta no encontrada"}
+    return url.path, estado, cuerpo
+
+async def responder(escritor, estado, cuerpo, mantener):
+    datos = json.dumps(cuerpo, ensure_ascii=False).encode("utf-8")
+    escritor.write(
+        f"HTTP/1.1 {estado} {ESTADOS_HTTP[estado]}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(datos)}\r\n"
+        f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n".encode("latin-1") + datos)
+    await escritor.drain()
+
+async def atender_conexion(servicio, lector, escritor):
+    # HTTP/1.1 con keep-alive: varias peticiones por conexion
+    try:
+        while True:
+            try:
+                encabezados = await lector.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+            if len(encabezados) > MAX_TAM_ENCABEZADOS:
+                break
+            lineas = encabezados.decode("latin-1").split("\r\n")
+            partes = lineas[0].split()
+            if len(partes) != 3:
+                break
+            metodo, objetivo, version = partes
+            campos = {}
+            for linea in lineas[1:]:
+                if ":" in linea:
+                    nombre, valor = linea.split(":", 1)
+                    campos[nombre.strip().lower()] = valor.strip()
+            try:
+                largo = int(campos.get("content-length", "0") or 0)
+                if largo < 0:
+                    raise ValueError(largo)
+            except ValueError:
+                # sin un largo valido no se sabe donde empieza la siguiente peticion
+                await responder(escritor, 400, {"error": "Content-Length no valido"}, False)
+                break
+            if largo:
+                try:
+                    await lector.readexactly(largo)
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+
+            inicio = time.perf_counter()
+            try:
+                endpoint, estado, cuerpo = await despachar(servicio, metodo, objetivo)
+            except Exception:
+                registro.exception("Error al atender %s %s", metodo, objetivo)
+                ruta = urlsplit(objetivo).path
+                endpoint = ruta if ruta in ENDPOINTS else "otro"
+                estado, cuerpo = 500, {"error": "Error interno"}
+            mantener = (version == "HTTP/1.1" and campos.get("connection", "").lower() != "close")
+            await responder(escritor, estado, cuerpo, mantener)
+            registrar_latencia(servicio, endpoint, estado, (time.perf_counter() - inicio) * 1000)
+            if not mantener:
+                break
+    finally:
+        escritor.close()
+
+async def servir(host="127.0.0.1", puerto=8080, hilos=4, max_pendientes=1024):
+    servicio = crear_servicio(hilos, max_pendientes)
+    servidor = await asyncio.start_server(
+        lambda lector, escritor: atender_conexion(servicio, lector, escritor), host, puerto)
+    print(f"Servicio del Metro CDMX en http://{host}:{puerto} "
+          f"({len(servicio['metro']['estaciones'])} estaciones)")
+    async with servidor:
+        await servidor.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio HTTP de rutas del Metro CDMX")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--hilos", type=int, default=4, help="hilos para las busquedas")
+    parser.add_argument("--max-pendientes", type=int, default=1024,
+                        help="busquedas en espera antes de responder 503")
+    argumentos = parser.parse_args()
+    try:
+        asyncio.run(servir(argumentos.host, argumentos.puerto, argumentos.hilos,
+                           argumentos.max_pendientes))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
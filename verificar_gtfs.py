@@ -0,0 +1,108 @@
+## Verifica el importador GTFS con el feed de muestra (redes/gtfs_muestra)
+# Uso: python verificar_gtfs.py
+# Importa la muestra como directorio y como zip, revisa conteos, transbordos y
+# una ruta entre lineas, y que la fuente editable que escribe se vuelva a cargar.
+import os
+import sys
+import tempfile
+import zipfile
+
+import gtfs_metro
+import metro_cdmx
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+FEED_MUESTRA = os.path.join(DIRECTORIO, "redes", "gtfs_muestra")
+
+# lo que da la muestra hoy; si se cambia el feed hay que actualizarlo
+ESTACIONES = 28
+TRAMOS = 27
+# entradas de adyacencia: cada tramo en los dos sentidos
+CONEXIONES = 54
+# con --tipos 1 (solo Metro)
+ESTACIONES_SOLO_METRO = 19
+TRANSBORDOS = {
+    "Insurgentes": ["1", "MB1"],
+    "Pino Suárez": ["1", "2"],
+    "Tasqueña": ["2", "TL"]
+}
+# linea 1 -> linea 2 en Pino Suarez -> tren ligero en Tasquena
+RUTA = ("Chapultepec", "Xotepingo")
+RUTA_PASA_POR = ["Pino Suárez", "Tasqueña"]
+RUTA_COSTO = 42.0
+
+def revisar(errores, condicion, mensaje):
+    if not condicion:
+        errores.append(mensaje)
+
+def revisar_red(errores, metro, estadisticas, origen):
+    revisar(errores, estadisticas["estaciones"] == ESTACIONES,
+            f"{origen}: {estadisticas['estaciones']} estaciones, se esperaban {ESTACIONES}")
+    revisar(errores, estadisticas["tramos"] == TRAMOS,
+            f"{origen}: {estadisticas['tramos']} tramos, se esperaban {TRAMOS}")
+    conexiones = sum(len(vecinos) for vecinos in metro["conexiones"].values())
+    revisar(errores, conexiones == CONEXIONES,
+            f"{origen}: {conexiones} conexiones, se esperaban {CONEXIONES}")
+    transbordos = {nombre: estacion["lineas"] for nombre, estacion in metro["estaciones"].items()
+                   if estacion["es_transbordo"]}
+    revisar(errores, transbordos == TRANSBORDOS,
+            f"{origen}: transbordos {transbordos}, se esperaban {TRANSBORDOS}")
+
+def revisar_ruta(errores, metro, origen):
+    inicio, destino = RUTA
+    comp = metro_cdmx.compilar_grafo(metro)
+    for motor, (ruta, estadisticas) in (
+            ("a_star", metro_cdmx.a_star(metro, inicio, destino)),
+            ("a_star_compilado", metro_cdmx.a_star_compilado(comp, inicio, destino,
+                                                             heuristica=metro_cdmx.heuristica_calibrada))):
+        if ruta is None:
+            errores.append(f"{origen}/{motor}: sin ruta {inicio} -> {destino}: {estadisticas['error']}")
+            continue
+        revisar(errores, ruta[0] == inicio and ruta[-1] == destino,
+                f"{origen}/{motor}: la ruta va de {ruta[0]} a {ruta[-1]}")
+        revisar(errores, all(estacion in ruta for estacion in RUTA_PASA_POR),
+                f"{origen}/{motor}: la ruta no pasa por {RUTA_PASA_POR}: {ruta}")
+        revisar(errores, abs(estadisticas["costo_total"] - RUTA_COSTO) < 1e-9,
+                f"{origen}/{motor}: costo {estadisticas['costo_total']}, se esperaba {RUTA_COSTO}")
+
+def main():
+    errores = []
+
+    estadisticas = {}
+    metro = gtfs_metro.importar_gtfs(FEED_MUESTRA, estadisticas=estadisticas)
+    print(" ".join(f"{clave}={valor}" for clave, valor in estadisticas.items()))
+    revisar_red(errores, metro, estadisticas, "directorio")
+    revisar_ruta(errores, metro, "directorio")
+
+    solo_metro = {}
+    gtfs_metro.importar_gtfs(FEED_MUESTRA, [1], estadisticas=solo_metro)
+    revisar(errores, solo_metro["estaciones"] == ESTACIONES_SOLO_METRO,
+            f"tipos 1: {solo_metro['estaciones']} estaciones, se esperaban {ESTACIONES_SOLO_METRO}")
+
+    with tempfile.TemporaryDirectory() as temporal:
+        # el mismo feed en zip
+        ruta_zip = os.path.join(temporal, "muestra.zip")
+        with zipfile.ZipFile(ruta_zip, "w") as archivo:
+            for nombre in sorted(os.listdir(FEED_MUESTRA)):
+                archivo.write(os.path.join(FEED_MUESTRA, nombre), nombre)
+        estadisticas_zip = {}
+        metro_zip = gtfs_metro.importar_gtfs(ruta_zip, estadisticas=estadisticas_zip)
+        revisar(errores, estadisticas_zip == estadisticas, f"zip: {estadisticas_zip} distinto del directorio")
+        revisar_red(errores, metro_zip, estadisticas_zip, "zip")
+
+        # fuente editable -> cargar_red (compila y escribe la copia .red)
+        ruta_fuente = os.path.join(temporal, "muestra.json")
+        metro_cdmx.guardar_fuente_red(metro, ruta_fuente, "muestra")
+        cargado, _ = metro_cdmx.cargar_red(ruta_fuente)
+        tramos = sum(len(vecinos) for vecinos in cargado["conexiones"].values()) // 2
+        revisar_red(errores, cargado, {"estaciones": len(cargado["estaciones"]), "tramos": tramos}, "fuente")
+        revisar_ruta(errores, cargado, "fuente")
+
+    for error in errores:
+        print(f"ERROR: {error}")
+    if not errores:
+        print("Importacion GTFS de la muestra correcta")
+    return 1 if errores else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+## Verifica el tiempo de importacion de metro_cdmx con python -X importtime
+# Uso: python verificar_importacion.py [presupuesto_ms]
+import os
+import subprocess
+import sys
+
+PRESUPUESTO_MS = 20
+MODULO = "metro_cdmx"
+# paquetes que no deben cargarse al importar la biblioteca
+PROHIBIDOS = ["matplotlib", "networkx"]
+
+def medir_importacion(modulo=MODULO):
+    # regresa {paquete: (propio_us, acumulado_us)} segun -X importtime
+    # se mide con el bytecode ya compilado, como arrancan los workers
+    entorno = dict(os.environ)
+    entorno.pop("PYTHONDONTWRITEBYTECODE", None)
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    subprocess.run([sys.executable, "-c", f"import {modulo}"],
+                   cwd=directorio, env=entorno, check=True)
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=directorio, env=entorno, capture_output=True, text=True, check=True
+    )
+    tiempos = {}
+    for linea in resultado.stderr.splitlines():
+        if not linea.startswith("import time:") or "[us]" in linea:
+            continue
+        propio, acumulado, paquete = linea[len("import time:"):].split("|")
+        tiempos[paquete.strip()] = (int(propio), int(acumulado))
+    return tiempos
+
+def main():
+    presupuesto = float(sys.argv[1]) if len(sys.argv) > 1 else PRESUPUESTO_MS
+    tiempos = medir_importacion()
+    total_ms = tiempos[MODULO][1] / 1000
+    print(f"import {MODULO}: {total_ms:.1f} ms (presupuesto {presupuesto:.1f} ms)")
+
+    # los paquetes mas lentos, para saber que revisar si se pasa del presupuesto
+    lentos = sorted(tiempos.items(), key=lambda item: item[1][0], reverse=True)[:5]
+    for paquete, (propio, acumulado) in lentos:
+        print(f"  {paquete}: {propio / 1000:.1f} ms")
+
+    ok = True
+    for paquete in PROHIBIDOS:
+        if paquete in tiempos:
+            print(f"ERROR: {paquete} se importa al cargar {MODULO}")
+            ok = False
+    if total_ms > presupuesto:
+        print("ERROR: se excedio el presupuesto de importacion")
+        ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())